@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Depends, Query
+
+from app.api.auth import get_admin_key, get_api_key
+from app.core.query_stats import get_query_stats
+
+router = APIRouter(
+    prefix="/admin",
+    dependencies=[Depends(get_admin_key), Depends(get_api_key)]
+)
+
+@router.get("/db/queries")
+async def query_stats(limit: int = Query(50, ge=1, le=500)):
+    return get_query_stats().snapshot(limit)
+
+@router.get("/db/slow-queries")
+async def slow_queries():
+    stats = get_query_stats()
+    return {"slow_ms": stats.slow_ms, "queries": stats.slow_queries()}
+
+@router.delete("/db/queries")
+async def reset_query_stats():
+    get_query_stats().reset()
+    return {"status": "reset"}
@@ -1,28 +1,92 @@
+import hmac
+from datetime import datetime
 from fastapi import Security, HTTPException, status
 from fastapi.security.api_key import APIKeyHeader
-from app.services.db_service import DatabaseService
+from app.services.db_service import get_db_service
+from app.services.async_db_service import get_async_db_service
+from app.services.api_key_usage import LastUsedBuffer
+from app.core.cache import TTLCache
 from app.core.config import get_settings
 
 settings = get_settings()
-db_service = DatabaseService(
-    host=settings.DB_HOST,
-    user=settings.DB_USER,
-    password=settings.DB_PASSWORD,
-    database=settings.DB_NAME
-)
+db_service = get_db_service()
+async_db_service = get_async_db_service()
 
 API_KEY_NAME = "X-API-Key"
 api_key_header = APIKeyHeader(name=API_KEY_NAME, auto_error=False)
 
+ADMIN_KEY_NAME = "X-Admin-Key"
+admin_key_header = APIKeyHeader(name=ADMIN_KEY_NAME, auto_error=False)
+
+# Verified keys are cached as (enabled, expires_at); unknown keys are cached
+# as False for a shorter time so a flood of bad keys does not hit MySQL either.
+api_key_cache = TTLCache(
+    maxsize=settings.API_KEY_CACHE_SIZE,
+    ttl=settings.API_KEY_CACHE_TTL
+)
+
+# last_used is written behind in batches instead of once per request
+last_used_buffer = LastUsedBuffer(
+    db_service,
+    interval=settings.API_KEY_LAST_USED_FLUSH_INTERVAL
+)
+
+async def _lookup_api_key(api_key: str):
+    entry = api_key_cache.get(api_key)
+    if entry is not None:
+        return entry
+    row = await async_db_service.get_api_key(api_key)
+    if not row:
+        api_key_cache.set(api_key, False, ttl=settings.API_KEY_NEGATIVE_CACHE_TTL)
+        return False
+    _, _, enabled, expires_at = row
+    entry = (bool(enabled), expires_at)
+    ttl = settings.API_KEY_CACHE_TTL
+    if expires_at is not None:
+        ttl = max(0, min(ttl, (expires_at - datetime.now()).total_seconds()))
+    api_key_cache.set(api_key, entry, ttl=ttl)
+    return entry
+
+async def is_api_key_valid(api_key: str) -> bool:
+    entry = await _lookup_api_key(api_key)
+    if not entry:
+        return False
+    enabled, expires_at = entry
+    if not enabled:
+        return False
+    return expires_at is None or expires_at > datetime.now()
+
+def invalidate_api_key(api_key: str = None):
+    if api_key is None:
+        api_key_cache.clear()
+    else:
+        api_key_cache.pop(api_key)
+
+def disable_api_key(api_key: str):
+    db_service.set_api_key_enabled(api_key, False)
+    invalidate_api_key(api_key)
+
 async def get_api_key(api_key_header: str = Security(api_key_header)):
     if api_key_header is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="API Key header is missing"
         )
-    if not db_service.verify_api_key(api_key_header):
+    if not await is_api_key_valid(api_key_header):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid or expired API Key"
         )
-    return api_key_header
\ No newline at end of file
+    last_used_buffer.record(api_key_header)
+    return api_key_header
+
+async def get_admin_key(admin_key_header: str = Security(admin_key_header)):
+    # Sin ADMIN_API_KEY las rutas de administración no existen
+    if not settings.ADMIN_API_KEY:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if admin_key_header is None or not hmac.compare_digest(admin_key_header.encode(), settings.ADMIN_API_KEY.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid admin key"
+        )
+    return admin_key_header
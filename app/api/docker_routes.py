@@ -1,13 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, status
-from uuid import uuid4
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Query, status
+from fastapi.concurrency import run_in_threadpool
+from typing import Optional
 import os
-import tempfile
-import subprocess
 
 from app.core.config import get_settings
 from app.services.docker_service import DockerService
+from app.services.async_db_service import get_async_db_service
+from app.services.job_service import get_job_service
+from app.services.image_cache import get_image_cache
+from app.services.docker_reconciler import get_docker_reconciler
 from app.api.auth import get_api_key
-from app.models import Service, ServiceCreate, ServicioTipo, ServiceAction
+from app.api.utils import save_upload_stream, bulk_ids, ndjson_response
+from app.models import Service, ServiceCreate, ServicioTipo, ServiceAction, JobAccepted, BulkControl
 
 router = APIRouter(
     dependencies=[Depends(get_api_key)]
@@ -15,8 +19,14 @@ router = APIRouter(
 
 settings = get_settings()
 docker_service = DockerService()
+async_db_service = get_async_db_service()
+job_service = get_job_service()
+docker_reconciler = get_docker_reconciler()
 
-@router.post("/service", response_model=Service, status_code=status.HTTP_201_CREATED)
+CREATE_SERVICE_JOB = "docker.create_service"
+job_service.register(CREATE_SERVICE_JOB, docker_service.run_create_job, max_attempts=settings.JOB_MAX_ATTEMPTS)
+
+@router.post("/service", response_model=JobAccepted, status_code=status.HTTP_202_ACCEPTED)
 async def create_service(
     id_user: int = Form(...),
     tipo_servicio: ServicioTipo = Form(...),
@@ -24,7 +34,7 @@ async def create_service(
     archivo: UploadFile = File(None),
     git_repo_url: str = Form(None)
 ):
-    zip_path = None
+    zip_path = zip_size = zip_sha256 = None
     try:
         if archivo:
             if not archivo.filename.endswith(".zip"):
@@ -32,52 +42,30 @@ async def create_service(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="File must be a .zip"
                 )
-            temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".zip")
-            temp_file.close()
-            with open(temp_file.name, "wb") as f:
-                f.write(await archivo.read())
-            zip_path = temp_file.name
-
-        result = docker_service.create_service(
-            userid=id_user,
-            webname=nombre_servicio,
-            tipo_servicio=tipo_servicio.value,
-            zip_path=zip_path
-        )
-
-        if git_repo_url and git_repo_url.strip():
-            try:
-                user = docker_service.db_service.get_user_by_userid_or_username(id_user, "")
-                if not user:
-                    raise HTTPException(
-                        status_code=status.HTTP_404_NOT_FOUND,
-                        detail="Username not found for the given user ID"
-                    )
-                _, username = user
-                project_path = f"/srv/users/{username}/{nombre_servicio}/data"
-                os.makedirs(project_path, exist_ok=True)
-                result_clone = subprocess.run(
-                    ["git", "clone", git_repo_url, project_path],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True
-                )
-                if result_clone.returncode != 0:
-                    raise Exception(f"Git clone failed: {result_clone.stderr}")
-            except Exception as e:
-                raise HTTPException(
-                    status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    detail=f"Failed to clone git repository: {str(e)}"
-                )
+            zip_path, zip_size, zip_sha256 = await save_upload_stream(
+                archivo,
+                max_bytes=settings.MAX_UPLOAD_SIZE,
+                chunk_size=settings.UPLOAD_CHUNK_SIZE
+            )
 
-        service_create = ServiceCreate(
-            id_user=id_user,
-            tipo_servicio=[tipo_servicio],
-            nombre_servicio=nombre_servicio
+        job_id = await run_in_threadpool(
+            job_service.enqueue,
+            CREATE_SERVICE_JOB,
+            {
+                "userid": id_user,
+                "webname": nombre_servicio,
+                "tipo_servicio": tipo_servicio.value,
+                "zip_path": zip_path,
+                "zip_size": zip_size,
+                "zip_sha256": zip_sha256,
+                "git_repo_url": git_repo_url.strip() if git_repo_url and git_repo_url.strip() else None
+            },
+            userid=id_user
         )
-        service_id = str(uuid4())
-        return Service(id_service=service_id, info=service_create, status=result["status"])
+        return JobAccepted(job_id=job_id, status_url=f"/jobs/{job_id}")
 
+    except HTTPException:
+        raise
     except Exception as e:
         if zip_path and os.path.exists(zip_path):
             os.unlink(zip_path)
@@ -86,6 +74,22 @@ async def create_service(
             detail=f"Error creating service: {str(e)}"
         )
 
+@router.get("/images")
+async def get_images():
+    return {"images": get_image_cache().status()}
+
+@router.get("/services")
+async def list_services(
+    after: int = Query(0, ge=0),
+    limit: int = Query(settings.LIST_PAGE_SIZE, ge=1, le=settings.LIST_MAX_PAGE_SIZE),
+    status_filter: Optional[str] = Query(None, alias="status"),
+    webtype: Optional[ServicioTipo] = None,
+    userid: Optional[int] = None
+):
+    return await async_db_service.list_services(
+        after, limit, status_filter, webtype.value if webtype else None, userid
+    )
+
 @router.get("/service/{service_id}", response_model=Service)
 async def get_service(service_id: str):
     try:
@@ -95,10 +99,13 @@ async def get_service(service_id: str):
         JOIN webtypes wt ON ds.webtype_id = wt.id
         WHERE ds.id = %s
         """
-        result = docker_service.db_service.fetch_one(query, (service_id,))
+        result = await async_db_service.fetch_one(query, (service_id,))
         if not result:
             raise HTTPException(status_code=404, detail="Service not found")
         userid, webname, webtype_id, status, webtype_name = result
+        live = docker_reconciler.live_status(userid, webname)
+        if live and status != "deleted":
+            status = live["status"]
         tipo_servicio = next((tipo for tipo in ServicioTipo if tipo.value == webtype_name), ServicioTipo.STATIC)
         service_create = ServiceCreate(
             id_user=userid,
@@ -120,14 +127,19 @@ async def control_service(id_service: str, action: ServiceAction):
         FROM docker_services
         WHERE id = %s
         """
-        result = docker_service.db_service.fetch_one(query, (id_service,))
+        result = await async_db_service.fetch_one(query, (id_service,))
         if not result:
             raise HTTPException(status_code=404, detail="Service not found")
         userid, webname = result
-        docker_service.control_service(userid, webname, action.value)
+        await run_in_threadpool(docker_service.control_service, userid, webname, action.value)
         return {"id_service": id_service, "status": action.value}
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error controlling service: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+@router.post("/control-services/{action}")
+def control_services(action: ServiceAction, request: BulkControl):
+    ids = bulk_ids(request, settings.BULK_CONTROL_MAX)
+    return ndjson_response(docker_service.control_services(ids, action.value))
@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List
+
+from app.api.auth import get_api_key
+from app.services import queries
+from app.services.async_db_service import get_async_db_service
+from app.models import JobStatus, BatchStatus
+
+router = APIRouter(
+    dependencies=[Depends(get_api_key)]
+)
+
+async_db_service = get_async_db_service()
+
+@router.get("/jobs/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str):
+    row = await async_db_service.fetch_one(queries.JOB_BY_ID, (job_id,))
+    if not row:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return queries.job_row_to_dict(row)
+
+@router.get("/batches/{batch_id}", response_model=BatchStatus)
+async def get_batch(batch_id: str):
+    rows = await async_db_service.fetch_all(queries.JOBS_BY_BATCH, (batch_id,))
+    if not rows:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return queries.batch_status(batch_id, [queries.job_row_to_dict(row) for row in rows])
+
+@router.get("/jobs", response_model=List[JobStatus])
+async def list_jobs(userid: int, limit: int = Query(20, ge=1, le=100)):
+    rows = await async_db_service.fetch_all(queries.JOBS_BY_USERID, (userid, limit))
+    return [queries.job_row_to_dict(row) for row in rows]
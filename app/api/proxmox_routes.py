@@ -1,46 +1,96 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Form
+from fastapi import APIRouter, Depends, HTTPException, Query, status, Form
+from fastapi.concurrency import run_in_threadpool
 from typing import Optional
 
 from app.core.config import get_settings
 from app.api.auth import get_api_key
 from app.services.proxmox_service import ProxmoxService
-from app.models import Sistema, VMAction, VMCreate, VM, TEMPLATE_IDS
+from app.services.async_db_service import get_async_db_service
+from app.services.job_service import get_job_service, PROXMOX_QUEUE
+from app.services.proxmox_cluster import get_cluster_state
+from app.services.warm_pool import get_warm_pool
+from app.models import (
+    Sistema, VMAction, VMCreate, VM, JobAccepted, CloneMode, BulkVMCreate, BatchAccepted, BulkControl, TEMPLATE_IDS
+)
+from app.api.utils import bulk_ids, ndjson_response
 
 router = APIRouter(
     dependencies=[Depends(get_api_key)]
 )
 
 settings = get_settings()
+async_db_service = get_async_db_service()
+job_service = get_job_service()
+cluster_state = get_cluster_state()
+
+PROVISION_VM_JOB = "proxmox.provision_vm"
+job_service.register(PROVISION_VM_JOB, ProxmoxService().run_provision_job, done_stage="ready", queue=PROXMOX_QUEUE)
+
+def provision_payload(vm_data: VMCreate):
+    return {
+        "userid": int(vm_data.userid),
+        "node": None,
+        "template_id": TEMPLATE_IDS.get(vm_data.sistema, 103),
+        "vm_name": vm_data.vm_name,
+        "os": vm_data.sistema.value,
+        "cores": vm_data.cores,
+        "memory": vm_data.memory,
+        "ssh_pub_key": vm_data.ssh_pub_key,
+        "clone_mode": vm_data.clone_mode.value if vm_data.clone_mode else None
+    }
+
+@router.get("/warm-pool")
+async def get_warm_pool_status():
+    counts = await run_in_threadpool(get_warm_pool().counts)
+    return [dict(template_id=template_id, **count) for template_id, count in counts.items()]
+
+@router.get("/vms")
+async def list_all_vms(
+    after: int = Query(0, ge=0),
+    limit: int = Query(settings.LIST_PAGE_SIZE, ge=1, le=settings.LIST_MAX_PAGE_SIZE),
+    status_filter: Optional[str] = Query(None, alias="status"),
+    os: Optional[Sistema] = None,
+    userid: Optional[int] = None
+):
+    return await async_db_service.list_vms(after, limit, status_filter, os.value if os else None, userid)
+
+@router.get("/vm")
+async def list_vms(userid: int):
+    vms = await async_db_service.get_vms_by_userid(userid)
+    for vm in vms:
+        vm["live"] = cluster_state.get(vm["vm_id"])
+    return vms
 
 @router.get("/vm/{vm_id}", response_model=VM)
 async def get_vm(vm_id: str):
     try:
-        proxmox_service = ProxmoxService()
         query = """
-        SELECT userid, vm_name, os, status
+        SELECT userid, vm_name, os, status, clone_mode
         FROM proxmox_vms
         WHERE vm_id = %s
         """
-        result = proxmox_service.db_service.fetch_one(query, (vm_id,))
+        result = await async_db_service.fetch_one(query, (vm_id,))
         if not result:
             raise HTTPException(status_code=404, detail="VM not found")
-        userid, vm_name, os, status = result
+        userid, vm_name, os, status, clone_mode = result
         vm_create = VMCreate(
-            userid=userid,
+            userid=str(userid),
+            vm_name=vm_name,
             sistema=Sistema(os),
             disksize=40,
             cores=2,
             memory=2048,
-            ssh_pub_key=None
+            ssh_pub_key=None,
+            clone_mode=clone_mode
         )
-        return VM(id_vm=vm_id, info=vm_create, status=status)
+        return VM(id_vm=vm_id, info=vm_create, status=status, live=cluster_state.get(vm_id))
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error getting VM: {str(e)}"
         )
 
-@router.post("/vm", response_model=VM, status_code=status.HTTP_201_CREATED)
+@router.post("/vm", response_model=JobAccepted, status_code=status.HTTP_202_ACCEPTED)
 async def create_vm(
     userid: int = Form(...),
     vm_name: str = Form(...),
@@ -48,7 +98,8 @@ async def create_vm(
     disksize: int = Form(40),
     cores: int = Form(2),
     memory: int = Form(2048),
-    ssh_pub_key: Optional[str] = Form(None)
+    ssh_pub_key: Optional[str] = Form(None),
+    clone_mode: Optional[CloneMode] = Form(None)
 ):
     vm_data = VMCreate(
         userid=str(userid),
@@ -57,23 +108,39 @@ async def create_vm(
         disksize=disksize,
         cores=cores,
         memory=memory,
-        ssh_pub_key=ssh_pub_key
+        ssh_pub_key=ssh_pub_key,
+        clone_mode=clone_mode
     )
-    proxmox_service = ProxmoxService()
-    template_id = TEMPLATE_IDS.get(vm_data.sistema, 103)
-    result = proxmox_service.clone_vm_atomic(
-        userid=userid,
-        node="jormundongor",
-        template_id=template_id,
-        vm_name=vm_name,
-        os=vm_data.sistema.value,
-        cores=vm_data.cores,
-        memory=vm_data.memory,
-        ssh_pub_key=vm_data.ssh_pub_key
+    job_id = await run_in_threadpool(
+        job_service.enqueue,
+        PROVISION_VM_JOB,
+        provision_payload(vm_data),
+        userid=userid
     )
-    if result["status"] != "success":
-        raise HTTPException(status_code=500, detail=result["message"])
-    return VM(id_vm=str(result["vm_id"]), info=vm_data, status="active")
+    return JobAccepted(job_id=job_id, status_url=f"/jobs/{job_id}")
+
+@router.post("/vm/bulk", response_model=BatchAccepted, status_code=status.HTTP_202_ACCEPTED)
+async def create_vms_bulk(request: BulkVMCreate):
+    try:
+        specs = request.specs()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if len(specs) > settings.BULK_VM_MAX:
+        raise HTTPException(status_code=400, detail=f"A batch can hold at most {settings.BULK_VM_MAX} VMs")
+    payloads = [provision_payload(vm_data) for vm_data in specs]
+    proxmox_service = ProxmoxService()
+    vm_ids = await run_in_threadpool(proxmox_service.reserve_batch, payloads)
+    try:
+        batch_id, job_ids = await run_in_threadpool(
+            job_service.enqueue_batch,
+            PROVISION_VM_JOB,
+            [(dict(payload, vm_id=vm_id), payload["userid"]) for payload, vm_id in zip(payloads, vm_ids)],
+            max_attempts=1
+        )
+    except Exception:
+        await run_in_threadpool(proxmox_service.release_batch, vm_ids)
+        raise
+    return BatchAccepted(batch_id=batch_id, total=len(job_ids), job_ids=job_ids, status_url=f"/batches/{batch_id}")
 
 @router.post("/control-vm/{id_vm}/{action}")
 async def control_vm(id_vm: str, action: VMAction):
@@ -87,7 +154,7 @@ async def control_vm(id_vm: str, action: VMAction):
                 detail="VM ID must be a valid integer."
             )
         proxmox_service = ProxmoxService()
-        result = proxmox_service.control_vm(int(clean_id_vm), action.value)
+        result = await run_in_threadpool(proxmox_service.control_vm, int(clean_id_vm), action.value)
         if result["status"] != "success":
             raise HTTPException(
                 status_code=500,
@@ -98,4 +165,9 @@ async def control_vm(id_vm: str, action: VMAction):
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error controlling VM: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+@router.post("/control-vms/{action}")
+def control_vms(action: VMAction, request: BulkControl):
+    ids = bulk_ids(request, settings.BULK_CONTROL_MAX)
+    return ndjson_response(ProxmoxService().control_vms(ids, action.value))
@@ -1,17 +1,13 @@
 from fastapi import APIRouter, HTTPException, Depends, Form
-from app.services.db_service import DatabaseService
+from app.services.async_db_service import get_async_db_service
+from app.services.user_overview import get_user_overview
 from app.api.auth import get_api_key
 from app.core.config import get_settings
 
 router = APIRouter()
 settings = get_settings()
 
-db_service = DatabaseService(
-    host=settings.DB_HOST,
-    user=settings.DB_USER,
-    password=settings.DB_PASSWORD,
-    database=settings.DB_NAME
-)
+db_service = get_async_db_service()
 
 @router.post("/users")
 async def create_user(
@@ -19,10 +15,10 @@ async def create_user(
     username: str = Form(...),
     api_key: str = Depends(get_api_key)
 ):
-    existing = db_service.get_user_by_userid_or_username(userid, username)
+    existing = await db_service.get_user_by_userid_or_username(userid, username)
     if existing:
         raise HTTPException(status_code=400, detail="Usuario ya existe")
-    db_service.create_user(userid, username)
+    await db_service.create_user(userid, username)
     return {
         "status": "success",
         "message": "Usuario creado correctamente",
@@ -31,17 +27,8 @@ async def create_user(
     }
 
 @router.get("/users/{userid}")
-async def get_user(userid: str, api_key: str = Depends(get_api_key)):
-    user = db_service.get_user_by_userid(userid)
-    if not user:
+async def get_user(userid: int, api_key: str = Depends(get_api_key)):
+    overview = await get_user_overview(userid)
+    if not overview:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
-    user_id, username, created_at = user
-    services = db_service.get_services_by_userid(userid)
-    vms = db_service.get_vms_by_userid(userid)
-    return {
-        "userid": user_id,
-        "username": username,
-        "created_at": created_at,
-        "services": services,
-        "vms": vms
-    }
\ No newline at end of file
+    return overview
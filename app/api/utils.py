@@ -1,8 +1,13 @@
 import os
+import hashlib
+import json
 import tempfile
 import zipfile
-from pathlib import Path
-from typing import Optional
+from typing import Optional, Tuple
+from fastapi import HTTPException, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from app.services.zip_extractor import get_zip_extractor, ZipExtractionError
 
 def save_uploaded_file(file_data, suffix=".zip") -> Optional[str]:
     if not file_data:
@@ -13,18 +18,49 @@ def save_uploaded_file(file_data, suffix=".zip") -> Optional[str]:
         f.write(file_data.read())
     return temp_file.name
 
+def _write_chunk(f, hasher, chunk):
+    hasher.update(chunk)
+    f.write(chunk)
+
+async def save_upload_stream(upload: UploadFile, max_bytes: int, chunk_size: int = 1024 * 1024,
+                             suffix=".zip") -> Tuple[str, int, str]:
+    """
+    Copia el fichero subido a disco por trozos, sin cargarlo entero en
+    memoria, cortando en cuanto supera max_bytes y calculando su SHA-256.
+    La escritura y el hash se hacen fuera del event loop.
+
+    Streams the uploaded file to disk in chunks without buffering it in
+    memory, aborting as soon as it exceeds max_bytes and computing its
+    SHA-256. Writing and hashing run off the event loop.
+
+    Returns (path, size, sha256).
+    """
+    hasher = hashlib.sha256()
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"File exceeds the maximum size of {max_bytes} bytes"
+                    )
+                await run_in_threadpool(_write_chunk, f, hasher, chunk)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path, size, hasher.hexdigest()
+
 def validate_zip_file(file_path: str) -> bool:
     try:
-        with zipfile.ZipFile(file_path) as zf:
-            if zf.testzip() is not None:
-                return False
-            base_path = Path(os.path.dirname(file_path))
-            for member in zf.infolist():
-                target_path = base_path / member.filename
-                if not str(target_path.resolve()).startswith(str(base_path.resolve())):
-                    return False
+        get_zip_extractor().validate(file_path, os.path.dirname(file_path))
         return True
-    except zipfile.BadZipFile:
+    except (zipfile.BadZipFile, ZipExtractionError):
         return False
     except Exception:
         return False
@@ -34,4 +70,19 @@ def generate_unique_id(prefix: str = "", length: int = 8) -> str:
     import base64
     random_id = base64.urlsafe_b64encode(uuid.uuid4().bytes).decode('utf-8')
     random_id = ''.join(c for c in random_id if c.isalnum())[:length]
-    return f"{prefix}{random_id}"
\ No newline at end of file
+    return f"{prefix}{random_id}"
+
+def bulk_ids(request, max_items):
+    ids = request.unique_ids()
+    if not ids:
+        raise HTTPException(status_code=400, detail="No ids given")
+    if len(ids) > max_items:
+        raise HTTPException(status_code=400, detail=f"At most {max_items} ids per request")
+    return ids
+
+def ndjson_response(results):
+    # Un objeto JSON por línea, enviado según termina cada elemento
+    return StreamingResponse(
+        (json.dumps(result, default=str) + "\n" for result in results),
+        media_type="application/x-ndjson"
+    )
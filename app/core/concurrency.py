@@ -0,0 +1,128 @@
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Límites compartidos por todo el proceso, no por petición
+# Limits shared by the whole process, not per request
+_limits = {}
+_limits_lock = threading.Lock()
+
+
+def shared_limit(name, limit):
+    with _limits_lock:
+        if name not in _limits:
+            _limits[name] = threading.BoundedSemaphore(limit)
+        return _limits[name]
+
+
+class BatchWriter:
+    """
+    Agrupa los resultados por clave (p. ej. el status nuevo) y llama a
+    write(clave, items) una vez por clave: cada `interval` segundos desde un
+    hilo propio y al cerrar. Así un lote de N acciones son unos pocos
+    UPDATE ... WHERE id IN (...) en lugar de N. Si write falla, los items se
+    reintentan en la siguiente escritura.
+
+    Groups results by key (e.g. the new status) and calls write(key, items)
+    once per key: every `interval` seconds from its own thread and on close.
+    A batch of N actions thus becomes a few UPDATE ... WHERE id IN (...)
+    statements instead of N. If write fails, the items are retried on the
+    next write.
+    """
+
+    def __init__(self, write, interval=1.0, name="batch-writer"):
+        self._write = write
+        self._interval = interval
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._closed = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def add(self, key, item):
+        with self._lock:
+            self._pending.setdefault(key, []).append(item)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for key, items in pending.items():
+            try:
+                self._write(key, items)
+            except Exception as e:
+                logger.error(f"Error writing {len(items)} results for {key}: {e}")
+                with self._lock:
+                    self._pending.setdefault(key, []).extend(items)
+
+    def _run(self):
+        while not self._closed.wait(self._interval):
+            self.flush()
+
+    def close(self):
+        self._closed.set()
+        self.flush()
+
+
+def run_concurrently(items, fn, workers=8, name="batch", limit=None, on_result=None, on_done=None):
+    """
+    Ejecuta fn(item) en un pool de hilos y va devolviendo
+    (item, resultado, error) según termina cada uno. on_result(item,
+    resultado, error) se llama en el hilo que ejecutó fn, así que el
+    resultado se guarda aunque nadie consuma el generador; si se cierra
+    antes de tiempo, las tareas ya enviadas terminan en segundo plano.
+    on_done() se llama una vez, desde el último hilo que termina.
+    limit es un semáforo compartido (shared_limit) que acota cuántas
+    acciones corren a la vez en todo el proceso.
+
+    Runs fn(item) on a thread pool and yields (item, result, error) as each
+    one finishes. on_result(item, result, error) is called on the thread
+    that ran fn, so the result is stored even if nobody consumes the
+    generator; if it is closed early, the tasks already submitted finish in
+    the background. on_done() is called once, from the last thread to
+    finish. limit is a shared semaphore (shared_limit) bounding how
+    many actions run at once across the whole process.
+    """
+    items = list(items)
+    if not items:
+        if on_done is not None:
+            on_done()
+        return
+    results = queue.Queue()
+    remaining = [len(items)]
+    remaining_lock = threading.Lock()
+
+    def run(item):
+        try:
+            if limit is None:
+                result = fn(item)
+            else:
+                with limit:
+                    result = fn(item)
+            error = None
+        except Exception as e:
+            result, error = None, e
+        if on_result is not None:
+            try:
+                on_result(item, result, error)
+            except Exception as e:
+                logger.error(f"Error recording the result for {item}: {e}")
+                result, error = None, error or e
+        results.put((item, result, error))
+        with remaining_lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last and on_done is not None:
+            on_done()
+
+    pool = ThreadPoolExecutor(max_workers=max(1, min(workers, len(items))), thread_name_prefix=name)
+    try:
+        for item in items:
+            pool.submit(run, item)
+        for _ in items:
+            yield results.get()
+    finally:
+        # No se espera a las tareas pendientes: cada una guarda su resultado
+        pool.shutdown(wait=False)
@@ -10,11 +10,75 @@ class Settings(BaseSettings):
     DB_USER: str = os.getenv("DB_USER", "cloudfaster")
     DB_PASSWORD: str = os.getenv("DB_PASSWORD", "qwerty-1234")
     DB_NAME: str = os.getenv("DB_NAME", "cloudfaster")
+    DB_POOL_NAME: str = os.getenv("DB_POOL_NAME", "cloudfaster_pool")
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+    DB_POOL_PING_INTERVAL: float = float(os.getenv("DB_POOL_PING_INTERVAL", "30"))
+    DB_QUERY_STATS: bool = os.getenv("DB_QUERY_STATS", "true").lower() == "true"
+    DB_SLOW_QUERY_MS: float = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+    DB_SLOW_QUERY_LOG_SIZE: int = int(os.getenv("DB_SLOW_QUERY_LOG_SIZE", "100"))
+    DB_QUERY_STATS_MAX_FINGERPRINTS: int = int(os.getenv("DB_QUERY_STATS_MAX_FINGERPRINTS", "500"))
+    # Clave de /admin/*; vacía, esas rutas no existen / empty disables them
+    ADMIN_API_KEY: str = os.getenv("ADMIN_API_KEY", "")
+    DB_MIGRATE_ON_STARTUP: bool = os.getenv("DB_MIGRATE_ON_STARTUP", "true").lower() == "true"
     PROXMOX_HOST: str = os.getenv("PROXMOX_HOST", "mercuriosftp.sytes.net")
     PROXMOX_USER: str = os.getenv("PROXMOX_USER", "root@pam")
     PROXMOX_PASSWORD: str = os.getenv("PROXMOX_PASSWORD", "Xugvzkm05.")
     PROXMOX_VERIFY_SSL: bool = False
+    PROXMOX_TIMEOUT: int = int(os.getenv("PROXMOX_TIMEOUT", "30"))
+    PROXMOX_POOL_MAXSIZE: int = int(os.getenv("PROXMOX_POOL_MAXSIZE", "10"))
+    PROXMOX_TICKET_RENEW_AGE: int = int(os.getenv("PROXMOX_TICKET_RENEW_AGE", "3000"))
+    PROXMOX_TASK_TIMEOUT: float = float(os.getenv("PROXMOX_TASK_TIMEOUT", "900"))
+    PROXMOX_TASK_INITIAL_DELAY: float = float(os.getenv("PROXMOX_TASK_INITIAL_DELAY", "0.25"))
+    PROXMOX_TASK_MAX_DELAY: float = float(os.getenv("PROXMOX_TASK_MAX_DELAY", "5"))
+    PROXMOX_NODE_CONCURRENCY: int = int(os.getenv("PROXMOX_NODE_CONCURRENCY", "2"))
+    PROXMOX_STORAGE_CONCURRENCY: int = int(os.getenv("PROXMOX_STORAGE_CONCURRENCY", "4"))
+    BULK_VM_MAX: int = int(os.getenv("BULK_VM_MAX", "100"))
+    PROXMOX_CONTROL_CONCURRENCY: int = int(os.getenv("PROXMOX_CONTROL_CONCURRENCY", "8"))
+    DOCKER_CONTROL_CONCURRENCY: int = int(os.getenv("DOCKER_CONTROL_CONCURRENCY", "8"))
+    BULK_CONTROL_MAX: int = int(os.getenv("BULK_CONTROL_MAX", "500"))
+    BULK_CONTROL_FLUSH_INTERVAL: float = float(os.getenv("BULK_CONTROL_FLUSH_INTERVAL", "1"))
+    PROXMOX_DEFAULT_NODE: str = os.getenv("PROXMOX_DEFAULT_NODE", "jormundongor")
+    PROXMOX_PLACEMENT_STRATEGY: str = os.getenv("PROXMOX_PLACEMENT_STRATEGY", "least-loaded")
+    PROXMOX_VM_STORAGE: str = os.getenv("PROXMOX_VM_STORAGE", "local-lvm")
+    PROXMOX_CLUSTER_POLL: bool = os.getenv("PROXMOX_CLUSTER_POLL", "true").lower() == "true"
+    PROXMOX_CLUSTER_POLL_INTERVAL: float = float(os.getenv("PROXMOX_CLUSTER_POLL_INTERVAL", "5"))
+    PROXMOX_CLONE_MODE: str = os.getenv("PROXMOX_CLONE_MODE", "full")
+    PROXMOX_LINKED_CLONE_TEMPLATES: str = os.getenv("PROXMOX_LINKED_CLONE_TEMPLATES", "")
+    WARM_POOL_SIZES: str = os.getenv("WARM_POOL_SIZES", "")
+    WARM_POOL_REFILL_INTERVAL: int = int(os.getenv("WARM_POOL_REFILL_INTERVAL", "60"))
+    VMID_RANGE_START: int = int(os.getenv("VMID_RANGE_START", "1000"))
+    VMID_RANGE_END: int = int(os.getenv("VMID_RANGE_END", "9999"))
+    VMID_RESYNC_INTERVAL: int = int(os.getenv("VMID_RESYNC_INTERVAL", "300"))
     DOCKER_BASE_PATH: str = os.getenv("DOCKER_BASE_PATH", "/srv")
+    DOCKER_BACKEND: str = os.getenv("DOCKER_BACKEND", "engine")
+    MAX_UPLOAD_SIZE: int = int(os.getenv("MAX_UPLOAD_SIZE", str(500 * 1024 * 1024)))
+    UPLOAD_CHUNK_SIZE: int = int(os.getenv("UPLOAD_CHUNK_SIZE", str(1024 * 1024)))
+    ZIP_MAX_FILES: int = int(os.getenv("ZIP_MAX_FILES", "100000"))
+    ZIP_MAX_TOTAL_SIZE: int = int(os.getenv("ZIP_MAX_TOTAL_SIZE", str(5 * 1024 ** 3)))
+    ZIP_MAX_RATIO: int = int(os.getenv("ZIP_MAX_RATIO", "200"))
+    ZIP_EXTRACT_WORKERS: int = int(os.getenv("ZIP_EXTRACT_WORKERS", "8"))
+    ZIP_WRITE_BUFFER: int = int(os.getenv("ZIP_WRITE_BUFFER", str(1024 * 1024)))
+    IMAGE_PREPULL: bool = os.getenv("IMAGE_PREPULL", "true").lower() == "true"
+    IMAGE_REFRESH_INTERVAL: int = int(os.getenv("IMAGE_REFRESH_INTERVAL", "21600"))
+    DOCKER_RECONCILER_ENABLED: bool = os.getenv("DOCKER_RECONCILER_ENABLED", "true").lower() == "true"
+    DOCKER_RECONCILER_FLUSH_INTERVAL: float = float(os.getenv("DOCKER_RECONCILER_FLUSH_INTERVAL", "5"))
+    FILEBROWSER_CACHE_DIR: str = os.getenv("FILEBROWSER_CACHE_DIR", "/srv/.cache/filebrowser")
+    LIST_PAGE_SIZE: int = int(os.getenv("LIST_PAGE_SIZE", "50"))
+    LIST_MAX_PAGE_SIZE: int = int(os.getenv("LIST_MAX_PAGE_SIZE", "500"))
+    SERVICE_DOMAIN: str = os.getenv("SERVICE_DOMAIN", "cloudfaster.app")
+    USER_OVERVIEW_CACHE_SIZE: int = int(os.getenv("USER_OVERVIEW_CACHE_SIZE", "4096"))
+    USER_OVERVIEW_CACHE_TTL: int = int(os.getenv("USER_OVERVIEW_CACHE_TTL", "15"))
+    API_KEY_CACHE_SIZE: int = int(os.getenv("API_KEY_CACHE_SIZE", "4096"))
+    API_KEY_CACHE_TTL: int = int(os.getenv("API_KEY_CACHE_TTL", "60"))
+    API_KEY_NEGATIVE_CACHE_TTL: int = int(os.getenv("API_KEY_NEGATIVE_CACHE_TTL", "10"))
+    API_KEY_LAST_USED_FLUSH_INTERVAL: int = int(os.getenv("API_KEY_LAST_USED_FLUSH_INTERVAL", "30"))
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", "4"))
+    PROXMOX_JOB_WORKERS: int = int(os.getenv("PROXMOX_JOB_WORKERS", "4"))
+    JOB_POLL_INTERVAL: float = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+    JOB_LEASE_TIMEOUT: int = int(os.getenv("JOB_LEASE_TIMEOUT", "300"))
+    JOB_MAX_ATTEMPTS: int = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+    JOB_RETRY_BACKOFF: int = int(os.getenv("JOB_RETRY_BACKOFF", "10"))
     API_TITLE: str = "Cloudfaster API"
     API_DESCRIPTION: str = "API intermediaria para gestionar VMs y servicios Docker"
     API_VERSION: str = "1.0.0"
@@ -1,30 +1,38 @@
 # /app/core/db.py
 import mysql.connector
-from mysql.connector import Error, pooling
+from mysql.connector import Error
 import logging
+import time
 from contextlib import contextmanager
 from typing import Optional, List, Dict, Any, Tuple
 from app.core.config import get_settings
+from app.core.pool import get_pool
+from app.core.query_stats import TimedConnection, get_query_stats
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
-# Crear un pool de conexiones para mejorar el rendimiento
+# Pool compartido del proceso (ver app/core/pool.py)
 try:
-    connection_pool = pooling.MySQLConnectionPool(
-        pool_name="cloudfaster_pool",
-        pool_size=5,
+    connection_pool = get_pool()
+except Error as e:
+    logger.error(f"Error creating connection pool: {e}")
+    # Crear una variable None para manejar este caso
+    connection_pool = None
+
+def _direct_connection():
+    started = time.perf_counter()
+    conn = mysql.connector.connect(
         host=settings.DB_HOST,
         user=settings.DB_USER,
         password=settings.DB_PASSWORD,
         database=settings.DB_NAME,
         auth_plugin='mysql_native_password'
     )
-    logger.info("Connection pool created successfully")
-except Error as e:
-    logger.error(f"Error creating connection pool: {e}")
-    # Crear una variable None para manejar este caso
-    connection_pool = None
+    if settings.DB_QUERY_STATS:
+        # Sin pool también se miden las consultas / queries are timed without the pool too
+        return TimedConnection(conn, time.perf_counter() - started, get_query_stats())
+    return conn
 
 @contextmanager
 def get_connection():
@@ -34,29 +42,19 @@ def get_connection():
 
     with get_connection() as conn:
         # usar conn
+
+    Si el pool está agotado, PoolTimeoutError se propaga: abrir conexiones
+    directas justo cuando MySQL está saturado sólo lo empeora. La conexión
+    directa queda para cuando no se pudo crear el pool.
     """
-    conn = None
-    try:
+    if connection_pool is None:
+        conn = _direct_connection()
+    else:
         conn = connection_pool.get_connection()
+    try:
         yield conn
-    except Error as e:
-        logger.error(f"Error getting connection from pool: {e}")
-        # Si hay un error con el pool, intentar crear una conexión directa
-        try:
-            conn = mysql.connector.connect(
-                host=settings.DB_HOST,
-                user=settings.DB_USER,
-                password=settings.DB_PASSWORD,
-                database=settings.DB_NAME,
-                auth_plugin='mysql_native_password'
-            )
-            yield conn
-        except Error as e2:
-            logger.error(f"Error creating direct connection: {e2}")
-            raise
     finally:
-        if conn:
-            conn.close()
+        conn.close()
 
 def execute_query(query: str, params: Tuple = None) -> bool:
     """
@@ -3,6 +3,8 @@ from mysql.connector import Error
 import sys
 import os
 from app.core.config import get_settings
+from app.core.migrations import run_migrations
+from app.services.db_service import get_db_service
 
 def create_connection():
     settings = get_settings()
@@ -29,98 +31,13 @@ def execute_query(connection, query):
         cursor.close()
 
 def initialize_database():
+    settings = get_settings()
     connection = create_connection()
-    create_database(connection, "CREATE DATABASE IF NOT EXISTS cloudfaster")
-    execute_query(connection, "USE cloudfaster")
-
-    create_users_table = """
-    CREATE TABLE IF NOT EXISTS users (
-        userid INT PRIMARY KEY,
-        username VARCHAR(100) NOT NULL UNIQUE,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-        INDEX idx_username (username)
-    );
-    """
-    execute_query(connection, create_users_table)
-
-    create_webtypes_table = """
-    CREATE TABLE IF NOT EXISTS webtypes (
-        id INT PRIMARY KEY AUTO_INCREMENT,
-        name VARCHAR(100) UNIQUE NOT NULL,
-        description TEXT,
-        is_active BOOLEAN DEFAULT TRUE,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
-    );
-    """
-    execute_query(connection, create_webtypes_table)
-
-    create_docker_services_table = """
-    CREATE TABLE IF NOT EXISTS docker_services (
-        id INT PRIMARY KEY AUTO_INCREMENT,
-        userid INT NOT NULL,
-        webname VARCHAR(255) NOT NULL,
-        webtype_id INT NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        status VARCHAR(50) DEFAULT 'active',
-        last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-        UNIQUE(userid, webname),
-        FOREIGN KEY (userid) REFERENCES users(userid),
-        FOREIGN KEY (webtype_id) REFERENCES webtypes(id),
-        INDEX idx_status (status),
-        INDEX idx_webtype (webtype_id),
-        INDEX idx_userid (userid)
-    );
-    """
-    execute_query(connection, create_docker_services_table)
-
-    create_proxmox_vms_table = """
-    CREATE TABLE IF NOT EXISTS proxmox_vms (
-        id INT PRIMARY KEY AUTO_INCREMENT,
-        userid INT NOT NULL,
-        vm_id INT NOT NULL,
-        vm_name VARCHAR(255) NOT NULL,
-        os ENUM('WINDOWS_11', 'WINDOWS_SERVER_2025', 'WINDOWS_SERVER_2022',
-        'UBUNTU24_CLIENT', 'UBUNTU24_SERVER', 'FEDORA', 'REDHAT 9.5') NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        status ENUM('enabled', 'disabled') DEFAULT 'enabled',
-        UNIQUE(vm_id),
-        FOREIGN KEY (userid) REFERENCES users(userid),
-        INDEX idx_status (status),
-        INDEX idx_userid (userid)
-    );
-    """
-    execute_query(connection, create_proxmox_vms_table)
+    create_database(connection, f"CREATE DATABASE IF NOT EXISTS `{settings.DB_NAME}`")
+    execute_query(connection, f"USE `{settings.DB_NAME}`")
 
-    create_api_keys_table = """
-    CREATE TABLE IF NOT EXISTS api_keys (
-        id INT PRIMARY KEY AUTO_INCREMENT,
-        name VARCHAR(255) NOT NULL,
-        api_key VARCHAR(64) NOT NULL UNIQUE,
-        userid INT NOT NULL,
-        enabled BOOLEAN NOT NULL DEFAULT TRUE,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-        last_used TIMESTAMP NULL,
-        expires_at TIMESTAMP NULL,
-        FOREIGN KEY (userid) REFERENCES users(userid),
-        INDEX idx_enabled (enabled),
-        INDEX idx_expiry (expires_at)
-    );
-    """
-    execute_query(connection, create_api_keys_table)
-
-    insert_default_webtypes = """
-    INSERT IGNORE INTO webtypes (id, name, description) VALUES
-        (1, 'Static', 'Static website with Apache'),
-        (2, 'PHP', 'PHP website with Apache'),
-        (3, 'Laravel', 'Laravel PHP Framework'),
-        (4, 'Node.js', 'Node.js application'),
-        (5, 'MySQL', 'MySQL database'),
-        (6, 'MariaDB', 'MariaDB database'),
-        (7, 'Python', 'Python application with FastAPI or Flask');
-    """
-    execute_query(connection, insert_default_webtypes)
+    # Las tablas e índices los crean las migraciones (app/core/migrations.py)
+    run_migrations(get_db_service())
 
     insert_default_user = """
     INSERT IGNORE INTO users (userid, username)
@@ -0,0 +1,46 @@
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+
+
+class BodySizeLimitMiddleware:
+    """
+    Corta las peticiones cuyo cuerpo supera max_body_size: primero por la
+    cabecera Content-Length y, si no la hay o miente, contando los bytes a
+    medida que llegan, antes de que el parser multipart los acumule.
+
+    Rejects requests whose body exceeds max_body_size: first from the
+    Content-Length header and, when it is missing or wrong, by counting
+    bytes as they arrive, before the multipart parser spools them.
+    """
+
+    def __init__(self, app, max_body_size: int):
+        self.app = app
+        self.max_body_size = max_body_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_body_size:
+            response = JSONResponse(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                content={"detail": f"Request body exceeds {self.max_body_size} bytes"}
+            )
+            await response(scope, receive, send)
+            return
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_size:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"Request body exceeds {self.max_body_size} bytes"
+                    )
+            return message
+
+        await self.app(scope, limited_receive, send)
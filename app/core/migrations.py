@@ -0,0 +1,441 @@
+"""
+Migraciones versionadas del esquema. Cada migración se aplica una sola vez,
+en orden, y queda registrada en schema_migrations; un GET_LOCK evita que
+dos procesos migren a la vez. Todas son idempotentes, porque en MySQL el
+DDL hace commit implícito y una migración cortada a medias se repite
+entera en el siguiente arranque.
+
+Versioned schema migrations. Each one is applied once, in order, and
+recorded in schema_migrations; a GET_LOCK keeps two processes from
+migrating at the same time. They are all idempotent, because DDL commits
+implicitly in MySQL and a migration interrupted halfway is rerun in full on
+the next start.
+
+Uso / usage:
+    python -m app.core.migrations            # aplica / apply
+    python -m app.core.migrations --check    # aplica y comprueba planes / apply and check plans
+"""
+import logging
+
+from app.services import queries
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INT PRIMARY KEY,
+    name VARCHAR(100) NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+MIGRATION_LOCK = "cloudfaster_schema_migrations"
+
+DOCKER_SERVICE_STATUSES = ("enabled", "disabled", "active", "stopped", "deleted")
+VM_STATUSES = ("enabled", "disabled")
+
+DEFAULT_WEBTYPES = [
+    ("Static", "Static website files"),
+    ("PHP", "PHP application"),
+    ("Laravel", "Laravel PHP framework"),
+    ("Node.js", "Node.js application"),
+    ("Mysql", "MySQL database"),
+    ("Mariadb", "MariaDB database"),
+    ("Python", "Python application")
+]
+
+MIGRATIONS = []
+
+
+class QueryPlanError(Exception):
+    pass
+
+
+def migration(version, name):
+    def decorator(fn):
+        MIGRATIONS.append((version, name, fn))
+        return fn
+    return decorator
+
+
+def _enum(values):
+    # Mismo formato que information_schema.columns.COLUMN_TYPE, para poder compararlos
+    return "ENUM(" + ",".join(f"'{value}'" for value in values) + ")"
+
+
+def _column_type(db, table, column):
+    row = db.fetch_one(
+        """
+        SELECT COLUMN_TYPE FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+        """,
+        (table, column)
+    )
+    return row[0].decode() if row and isinstance(row[0], bytes) else (row[0] if row else None)
+
+
+def _has_index_on(db, table, columns, unique=False):
+    # Busca por columnas y no por nombre: las UNIQUE sin nombre se llaman como su primera columna
+    rows = db.fetch_all(
+        """
+        SELECT index_name, GROUP_CONCAT(column_name ORDER BY seq_in_index), MIN(non_unique)
+        FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s
+        GROUP BY index_name
+        """,
+        (table,)
+    )
+    wanted = ",".join(columns)
+    return any(cols == wanted and (not unique or not non_unique) for _, cols, non_unique in rows)
+
+
+def _require_not_null(db, table, column, fill=None):
+    """
+    Deja la columna NOT NULL con su tipo actual. Antes, las filas con NULL
+    se rellenan con la expresión SQL `fill` o, sin ella, se borran: en modo
+    estricto el MODIFY fallaría con ellas.
+
+    Makes the column NOT NULL keeping its current type. Rows holding NULL
+    are first filled with the SQL expression `fill` or, without one,
+    deleted: in strict mode the MODIFY would fail on them.
+    """
+    row = db.fetch_one(
+        """
+        SELECT COLUMN_TYPE, IS_NULLABLE FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+        """,
+        (table, column)
+    )
+    if not row or row[1] == "NO":
+        return
+    column_type = row[0].decode() if isinstance(row[0], bytes) else row[0]
+    if fill is None:
+        db.execute_query(f"DELETE FROM {table} WHERE {column} IS NULL")
+    else:
+        db.execute_query(f"UPDATE {table} SET {column} = {fill} WHERE {column} IS NULL")
+    db.execute_query(f"ALTER TABLE {table} MODIFY {column} {column_type} NOT NULL")
+
+
+@migration(1, "base tables")
+def base_tables(db):
+    db.execute_query("""
+    CREATE TABLE IF NOT EXISTS users (
+        userid INT PRIMARY KEY,
+        username VARCHAR(100) NOT NULL UNIQUE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    db.execute_query("""
+    CREATE TABLE IF NOT EXISTS webtypes (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        name VARCHAR(50) NOT NULL UNIQUE,
+        description VARCHAR(255)
+    )
+    """)
+    db.execute_query(f"""
+    CREATE TABLE IF NOT EXISTS docker_services (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        userid INT NOT NULL,
+        webname VARCHAR(100) NOT NULL,
+        webtype_id INT NOT NULL,
+        status {_enum(DOCKER_SERVICE_STATUSES)} NOT NULL DEFAULT 'enabled',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        FOREIGN KEY (webtype_id) REFERENCES webtypes(id),
+        UNIQUE (userid, webname)
+    )
+    """)
+    db.execute_query(f"""
+    CREATE TABLE IF NOT EXISTS proxmox_vms (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        userid INT NOT NULL,
+        vm_id INT NOT NULL UNIQUE,
+        vm_name VARCHAR(100) NOT NULL,
+        os VARCHAR(50) NOT NULL,
+        status {_enum(VM_STATUSES)} NOT NULL DEFAULT 'enabled',
+        node VARCHAR(64) NULL,
+        clone_mode VARCHAR(10) NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    )
+    """)
+    db.execute_query("""
+    CREATE TABLE IF NOT EXISTS api_keys (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        userid INT NOT NULL,
+        name VARCHAR(255) NULL,
+        api_key VARCHAR(64) NOT NULL UNIQUE,
+        enabled BOOLEAN NOT NULL DEFAULT TRUE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_used TIMESTAMP NULL,
+        expires_at TIMESTAMP NULL
+    )
+    """)
+    db.execute_query("""
+    CREATE TABLE IF NOT EXISTS jobs (
+        id CHAR(36) PRIMARY KEY,
+        kind VARCHAR(64) NOT NULL,
+        userid INT NULL,
+        batch_id CHAR(36) NULL,
+        status VARCHAR(20) NOT NULL DEFAULT 'queued',
+        stage VARCHAR(64) NOT NULL DEFAULT 'queued',
+        progress TINYINT UNSIGNED NOT NULL DEFAULT 0,
+        payload TEXT NOT NULL,
+        result TEXT NULL,
+        error TEXT NULL,
+        attempts INT NOT NULL DEFAULT 0,
+        max_attempts INT NOT NULL DEFAULT 1,
+        run_after TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        locked_by VARCHAR(100) NULL,
+        locked_at TIMESTAMP NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        finished_at TIMESTAMP NULL,
+        INDEX idx_status_run_after (status, run_after)
+    )
+    """)
+    db.execute_query("""
+    CREATE TABLE IF NOT EXISTS warm_vms (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        template_id INT NOT NULL,
+        vm_id INT NOT NULL UNIQUE,
+        node VARCHAR(64) NOT NULL,
+        clone_mode VARCHAR(10) NULL,
+        status ENUM('cloning', 'ready') NOT NULL DEFAULT 'cloning',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        INDEX idx_template_status (template_id, status)
+    )
+    """)
+    if not db.fetch_one("SELECT COUNT(*) FROM webtypes")[0]:
+        db.execute_many("INSERT INTO webtypes (name, description) VALUES (%s, %s)", DEFAULT_WEBTYPES)
+
+
+@migration(2, "converge legacy columns")
+def converge_legacy_columns(db):
+    """
+    Lleva a este esquema las tablas creadas por app/core/db_init.py o por
+    SQL/cloudfasterDB.py: mismos ENUM de status, os como VARCHAR, las
+    columnas que usa la aplicación y NOT NULL donde el código lo supone.
+    SQL/cloudfasterDB.py dejaba casi todo nullable: las filas sin dueño o
+    sin VMID/nombre se borran (no se pueden gestionar) y el resto de NULL se
+    rellena.
+
+    Brings tables created by app/core/db_init.py or SQL/cloudfasterDB.py to
+    this schema: same status ENUMs, os as VARCHAR, the columns the
+    application uses and NOT NULL wherever the code assumes it.
+    SQL/cloudfasterDB.py left almost everything nullable: rows without an
+    owner or a VMID/name are deleted (they cannot be managed) and the other
+    NULLs are filled in.
+    """
+    docker_status = _enum(DOCKER_SERVICE_STATUSES)
+    if _column_type(db, "docker_services", "status") != docker_status.lower():
+        db.execute_query(
+            f"UPDATE docker_services SET status = 'enabled' "
+            f"WHERE status IS NULL OR status NOT IN {tuple(DOCKER_SERVICE_STATUSES)}"
+        )
+        db.execute_query(f"ALTER TABLE docker_services MODIFY status {docker_status} NOT NULL DEFAULT 'enabled'")
+    db.add_column_if_missing("docker_services", "updated_at",
+                             "TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP")
+    _require_not_null(db, "docker_services", "userid")
+    _require_not_null(db, "docker_services", "webname")
+
+    _require_not_null(db, "proxmox_vms", "userid")
+    _require_not_null(db, "proxmox_vms", "vm_id")
+    _require_not_null(db, "proxmox_vms", "vm_name", "CONCAT('vm-', vm_id)")
+    if _column_type(db, "proxmox_vms", "os") != "varchar(50)":
+        db.execute_query("ALTER TABLE proxmox_vms MODIFY os VARCHAR(50) NULL")
+    _require_not_null(db, "proxmox_vms", "os", "'UNKNOWN'")
+    db.execute_query("UPDATE proxmox_vms SET status = 'enabled' WHERE status IS NULL")
+    db.execute_query(f"ALTER TABLE proxmox_vms MODIFY status {_enum(VM_STATUSES)} NOT NULL DEFAULT 'enabled'")
+    db.add_column_if_missing("proxmox_vms", "node", "VARCHAR(64) NULL AFTER status")
+    db.add_column_if_missing("proxmox_vms", "clone_mode", "VARCHAR(10) NULL AFTER node")
+    db.add_column_if_missing("proxmox_vms", "updated_at",
+                             "TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP")
+    if not _has_index_on(db, "proxmox_vms", ["vm_id"], unique=True):
+        # Sin UNIQUE pudo quedar el mismo VMID repetido: se conserva la fila más antigua
+        db.execute_query(
+            "DELETE newer FROM proxmox_vms newer "
+            "JOIN proxmox_vms older ON older.vm_id = newer.vm_id AND older.id < newer.id"
+        )
+        db.execute_query("ALTER TABLE proxmox_vms ADD UNIQUE INDEX vm_id (vm_id)")
+
+    # SQL/cloudfasterDB.py guardaba la clave en `key` y el estado en is_active
+    legacy_key = _column_type(db, "api_keys", "key") is not None
+    db.add_column_if_missing("api_keys", "api_key", "VARCHAR(64) NULL")
+    db.add_column_if_missing("api_keys", "enabled", "BOOLEAN NOT NULL DEFAULT TRUE")
+    # Las claves sin dueño pasan al usuario inicial que crea db_init
+    db.add_column_if_missing("api_keys", "userid", "INT NOT NULL DEFAULT 1 AFTER id")
+    db.add_column_if_missing("api_keys", "name", "VARCHAR(255) NULL AFTER userid")
+    if legacy_key:
+        db.execute_query(
+            "UPDATE api_keys SET api_key = LEFT(`key`, 64), enabled = (is_active <=> 'enabled') "
+            "WHERE api_key IS NULL"
+        )
+    db.execute_query("ALTER TABLE api_keys MODIFY name VARCHAR(255) NULL")
+    db.execute_query("ALTER TABLE api_keys ALTER COLUMN userid DROP DEFAULT")
+    if not _has_index_on(db, "api_keys", ["api_key"], unique=True):
+        db.execute_query("ALTER TABLE api_keys ADD UNIQUE INDEX api_key (api_key)")
+
+    db.add_column_if_missing("jobs", "batch_id", "CHAR(36) NULL AFTER userid")
+
+
+@migration(3, "hot query indexes")
+def hot_query_indexes(db):
+    """
+    Índices (columna, id) para las consultas por usuario y los listados con
+    filtro; InnoDB añade la clave primaria a cada índice secundario, así que
+    también sirven para ordenar por id. Se quitan los índices de una sola
+    columna de db_init que quedan cubiertos por estos.
+
+    (column, id) indexes for the per-user lookups and the filtered listings;
+    InnoDB appends the primary key to every secondary index, so they also
+    serve the ORDER BY id. The single-column db_init indexes they cover are
+    dropped.
+    """
+    if not _has_index_on(db, "docker_services", ["userid", "webname"], unique=True):
+        db.execute_query("ALTER TABLE docker_services ADD UNIQUE INDEX userid (userid, webname)")
+    for table, index, columns in (
+        ("docker_services", "idx_userid_id", "userid, id"),
+        ("docker_services", "idx_status_id", "status, id"),
+        ("docker_services", "idx_webtype_id", "webtype_id, id"),
+        ("proxmox_vms", "idx_userid_id", "userid, id"),
+        ("proxmox_vms", "idx_status_id", "status, id"),
+        ("proxmox_vms", "idx_os_id", "os, id"),
+        ("api_keys", "idx_key_enabled_expiry", "api_key, enabled, expires_at"),
+        ("jobs", "idx_userid_created", "userid, created_at"),
+        ("jobs", "idx_batch_id", "batch_id"),
+    ):
+        db.add_index_if_missing(table, index, columns)
+    for table, index in (
+        ("docker_services", "idx_userid"),
+        ("docker_services", "idx_status"),
+        ("docker_services", "idx_webtype"),
+        ("proxmox_vms", "idx_userid"),
+        ("proxmox_vms", "idx_status"),
+        ("api_keys", "idx_enabled"),
+        ("jobs", "idx_userid"),
+    ):
+        db.drop_index_if_exists(table, index)
+
+
+def applied_versions(db):
+    db.execute_query(MIGRATIONS_TABLE)
+    return {row[0] for row in db.fetch_all("SELECT version FROM schema_migrations")}
+
+
+def pending_migrations(db):
+    done = applied_versions(db)
+    return [version for version, _, _ in sorted(MIGRATIONS, key=lambda m: m[0]) if version not in done]
+
+
+def run_migrations(db, lock_timeout=60):
+    """
+    Aplica las migraciones pendientes y devuelve sus versiones.
+
+    Applies pending migrations and returns their versions.
+    """
+    connection = db.get_connection()
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (MIGRATION_LOCK, lock_timeout))
+        if not cursor.fetchone()[0]:
+            raise TimeoutError("Timed out waiting for the schema migration lock")
+        try:
+            done = applied_versions(db)
+            applied = []
+            for version, name, apply in sorted(MIGRATIONS, key=lambda m: m[0]):
+                if version in done:
+                    continue
+                logger.info(f"Applying schema migration {version}: {name}")
+                apply(db)
+                db.execute_query(
+                    "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                    (version, name)
+                )
+                applied.append(version)
+            return applied
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK,))
+            cursor.fetchone()
+    finally:
+        cursor.close()
+        connection.close()
+
+
+# Tablas pequeñas de consulta en las que un recorrido completo es lo esperado
+SCAN_ALLOWED_TABLES = {"webtypes", "wt"}
+
+HOT_QUERIES = [
+    ("user by userid", queries.USER_BY_USERID, (1,)),
+    ("services by userid", queries.SERVICES_BY_USERID, (1,)),
+    ("vms by userid", queries.VMS_BY_USERID, (1,)),
+    ("service by user and name", queries.DOCKER_SERVICE_BY_USER_AND_NAME, (1, "web")),
+    ("vm target", queries.VM_TARGET_BY_ID, (100,)),
+    ("api key", queries.API_KEY_BY_KEY, ("0" * 32,)),
+    ("jobs by userid", queries.JOBS_BY_USERID, (1, 20)),
+    ("jobs by batch", queries.JOBS_BY_BATCH, ("0" * 36,)),
+    ("services page", *queries.services_page_query()),
+    ("services page by status", *queries.services_page_query(status="active")),
+    ("services page by webtype", *queries.services_page_query(webtype="PHP")),
+    ("services page by userid", *queries.services_page_query(userid=1)),
+    ("vms page", *queries.vms_page_query()),
+    ("vms page by status", *queries.vms_page_query(status="enabled")),
+    ("vms page by os", *queries.vms_page_query(os="WINDOWS_11")),
+    ("vms page by userid", *queries.vms_page_query(userid=1)),
+]
+
+
+def explain(db, query, params):
+    with db.transaction() as cursor:
+        cursor.execute("EXPLAIN " + query, params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def full_scans(db, hot_queries=None):
+    """
+    EXPLAIN de cada consulta caliente; devuelve (nombre, tabla, filas) de
+    los pasos que recorren la tabla entera (type = ALL). Sólo es
+    significativo contra una base con datos de tamaño real: con tablas
+    vacías el optimizador puede elegir cualquier plan.
+
+    EXPLAINs every hot query and returns (name, table, rows) for the steps
+    that read the whole table (type = ALL). Only meaningful against a
+    database with realistic data: on empty tables the optimizer may pick
+    any plan.
+    """
+    scans = []
+    for name, query, params in hot_queries or HOT_QUERIES:
+        for step in explain(db, query, params):
+            if step.get("type") == "ALL" and step.get("table") not in SCAN_ALLOWED_TABLES:
+                scans.append((name, step.get("table"), step.get("rows")))
+    return scans
+
+
+def check_query_plans(db, hot_queries=None):
+    scans = full_scans(db, hot_queries)
+    if scans:
+        details = ", ".join(f"{name} ({table}, ~{rows} rows)" for name, table, rows in scans)
+        raise QueryPlanError(f"Hot queries fall back to a full table scan: {details}")
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    from app.services.db_service import get_db_service
+
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--check", action="store_true", help="fail if a hot query does a full table scan")
+    args = parser.parse_args()
+    db_service = get_db_service()
+    print(f"applied: {run_migrations(db_service) or 'nothing to do'}")
+    if args.check:
+        try:
+            check_query_plans(db_service)
+        except QueryPlanError as e:
+            print(e)
+            sys.exit(1)
+        print("query plans OK")
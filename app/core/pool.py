@@ -0,0 +1,194 @@
+import logging
+import queue
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import mysql.connector
+from mysql.connector import Error
+from mysql.connector.errors import PoolError
+
+from app.core.config import get_settings
+from app.core.query_stats import TimedCursor, get_query_stats
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class PoolTimeoutError(PoolError):
+    pass
+
+
+class PooledConnection:
+    """
+    Envoltorio de una conexión prestada por el pool: close() la devuelve
+    al pool en lugar de cerrarla.
+
+    Wraps a connection borrowed from the pool: close() hands it back to the
+    pool instead of closing the socket.
+    """
+
+    def __init__(self, pool, connection, wait=0.0):
+        self._pool = pool
+        self._cnx = connection
+        self._wait = wait
+
+    def take_wait(self):
+        # Tiempo de espera del checkout; sólo se cuenta una vez
+        wait, self._wait = self._wait, 0.0
+        return wait
+
+    def cursor(self, *args, **kwargs):
+        if self._cnx is None:
+            raise PoolError("Connection already returned to the pool")
+        cursor = self._cnx.cursor(*args, **kwargs)
+        if settings.DB_QUERY_STATS:
+            return TimedCursor(cursor, self, get_query_stats())
+        return cursor
+
+    def close(self):
+        if self._cnx is not None:
+            cnx, self._cnx = self._cnx, None
+            self._pool._release(cnx)
+
+    def __getattr__(self, name):
+        if self._cnx is None:
+            raise PoolError("Connection already returned to the pool")
+        return getattr(self._cnx, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones MySQL con límite de tamaño, cola de espera con timeout
+    cuando está agotado y comprobación de salud de las conexiones inactivas.
+
+    MySQL connection pool with a size bound, timed queueing when exhausted
+    and health checks on connections that have been idle for a while.
+    """
+
+    def __init__(self, name: str, size: int, timeout: float, ping_interval: float, **config):
+        self.name = name
+        self.size = size
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self.config = config
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._closed = False
+
+    def get_connection(self, timeout: Optional[float] = None) -> PooledConnection:
+        wait = self.timeout if timeout is None else timeout
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=wait):
+            raise PoolTimeoutError(
+                f"Pool '{self.name}' exhausted: no connection available after {wait}s"
+            )
+        try:
+            cnx = self._checkout()
+            return PooledConnection(self, cnx, time.perf_counter() - started)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _checkout(self):
+        while True:
+            try:
+                cnx, idle_since = self._idle.get_nowait()
+            except queue.Empty:
+                return mysql.connector.connect(**self.config)
+            if time.monotonic() - idle_since < self.ping_interval:
+                return cnx
+            try:
+                cnx.ping(reconnect=False)
+                return cnx
+            except Error:
+                logger.warning(f"Discarding dead connection from pool '{self.name}'")
+                self._discard(cnx)
+
+    def _release(self, cnx):
+        try:
+            if self._closed:
+                self._discard(cnx)
+                return
+            if cnx.in_transaction:
+                cnx.rollback()
+            self._idle.put((cnx, time.monotonic()))
+        except Error:
+            self._discard(cnx)
+        finally:
+            self._slots.release()
+
+    def _discard(self, cnx):
+        try:
+            cnx.close()
+        except Error:
+            pass
+
+    def healthcheck(self) -> bool:
+        try:
+            with self.get_connection() as cnx:
+                cursor = cnx.cursor()
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+                cursor.close()
+            return True
+        except Error as e:
+            logger.error(f"Health check failed for pool '{self.name}': {e}")
+            return False
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                cnx, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(cnx)
+
+
+_pools: Dict[Tuple, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(host: str = None, user: str = None, password: str = None, database: str = None) -> ConnectionPool:
+    """
+    Devuelve el pool compartido del proceso para esas credenciales,
+    creándolo la primera vez.
+
+    Returns the process-wide pool for these credentials, creating it on
+    first use.
+    """
+    config = {
+        'host': host or settings.DB_HOST,
+        'user': user or settings.DB_USER,
+        'password': password or settings.DB_PASSWORD,
+        'database': database or settings.DB_NAME,
+        'auth_plugin': 'mysql_native_password'
+    }
+    key = (config['host'], config['user'], config['database'])
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(
+                name=f"{settings.DB_POOL_NAME}_{len(_pools)}",
+                size=settings.DB_POOL_SIZE,
+                timeout=settings.DB_POOL_TIMEOUT,
+                ping_interval=settings.DB_POOL_PING_INTERVAL,
+                **config
+            )
+            _pools[key] = pool
+            logger.info(f"Connection pool '{pool.name}' created (size={pool.size})")
+        return pool
+
+
+def close_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
@@ -0,0 +1,349 @@
+"""
+Tiempos por sentencia SQL: espera por una conexión del pool, ejecución y
+lectura de filas, agregados por huella de la consulta (literales y
+parámetros sustituidos por ?) con un histograma por huella y un registro
+de consultas lentas. Los datos son del proceso; cada worker tiene los suyos.
+
+Per-statement SQL timings: wait for a pooled connection, execution and
+row fetching, aggregated by query fingerprint (literals and parameters
+replaced with ?) with a histogram per fingerprint and a slow-query log.
+The data is per process; each worker keeps its own.
+"""
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
+from functools import lru_cache
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Límites superiores de los cubos del histograma, en ms / histogram bucket upper bounds, ms
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+OTHER_FINGERPRINT = "<other>"
+
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.|\"\")*\"")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_ROWS = re.compile(r"\(\?\+\)(?:\s*,\s*\(\?\+\))+")
+_CASES = re.compile(r"(?:when \? then \? )+")
+_SPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(query: str) -> str:
+    """
+    "SELECT * FROM t WHERE id IN (%s, %s) AND name = 'x'"
+        -> "select * from t where id in (?+) and name = ?"
+    """
+    text = _STRING.sub("?", query).replace("%s", "?")
+    text = _SPACE.sub(" ", _NUMBER.sub("?", text)).strip().lower()
+    text = _ROWS.sub("(?+)", _LIST.sub("(?+)", text))
+    return _CASES.sub("when ? then ? ", text)
+
+
+class QueryStats:
+    """
+    Agregados por huella (número de sentencias y de errores, filas, tiempos
+    de espera, ejecución y lectura, e histograma del tiempo total) y las
+    últimas consultas que superaron slow_ms, también las que fallaron.
+    Nunca guarda los parámetros, que pueden llevar claves de API.
+
+    Per-fingerprint aggregates (statement and error counts, rows, wait,
+    execution and fetch times, and a histogram of the total time) plus the
+    latest queries above slow_ms, failed ones included. Parameters are never stored, since they may
+    carry API keys.
+    """
+
+    def __init__(self, slow_ms=200, slow_log_size=100, max_fingerprints=500):
+        self.slow_ms = slow_ms
+        self.max_fingerprints = max_fingerprints
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._slow = deque(maxlen=slow_log_size)
+        self._since = datetime.now()
+
+    def record(self, query, wait, execution, fetch, rows, source="sync", error=False):
+        wait_ms, execution_ms, fetch_ms = wait * 1000, execution * 1000, fetch * 1000
+        total_ms = wait_ms + execution_ms + fetch_ms
+        key = fingerprint(query)
+        with self._lock:
+            entry = self._stats.get(key)
+            if entry is None:
+                if len(self._stats) >= self.max_fingerprints:
+                    key = OTHER_FINGERPRINT
+                    entry = self._stats.get(key)
+                if entry is None:
+                    entry = self._stats[key] = {
+                        "count": 0, "errors": 0, "rows": 0,
+                        "wait_ms": 0.0, "execution_ms": 0.0, "fetch_ms": 0.0,
+                        "max_ms": 0.0, "histogram": [0] * (len(BUCKETS_MS) + 1)
+                    }
+            entry["count"] += 1
+            entry["errors"] += int(error)
+            entry["rows"] += rows
+            entry["wait_ms"] += wait_ms
+            entry["execution_ms"] += execution_ms
+            entry["fetch_ms"] += fetch_ms
+            entry["max_ms"] = max(entry["max_ms"], total_ms)
+            entry["histogram"][bisect_left(BUCKETS_MS, total_ms)] += 1
+            if total_ms >= self.slow_ms:
+                self._slow.append({
+                    "at": datetime.now(),
+                    "fingerprint": key,
+                    "query": _SPACE.sub(" ", query).strip()[:1000],
+                    "source": source,
+                    "error": error,
+                    "rows": rows,
+                    "wait_ms": round(wait_ms, 2),
+                    "execution_ms": round(execution_ms, 2),
+                    "fetch_ms": round(fetch_ms, 2),
+                    "total_ms": round(total_ms, 2)
+                })
+        if total_ms >= self.slow_ms:
+            logger.warning(
+                f"Slow {'failed ' if error else ''}query ({total_ms:.1f} ms: wait={wait_ms:.1f} exec={execution_ms:.1f} "
+                f"fetch={fetch_ms:.1f}, {rows} rows): {key}"
+            )
+
+    def snapshot(self, limit=None):
+        with self._lock:
+            items = [(key, dict(entry, histogram=list(entry["histogram"]))) for key, entry in self._stats.items()]
+        queries = []
+        for key, entry in items:
+            count = entry["count"]
+            total = entry["wait_ms"] + entry["execution_ms"] + entry["fetch_ms"]
+            queries.append({
+                "fingerprint": key,
+                "count": count,
+                "errors": entry["errors"],
+                "rows": entry["rows"],
+                "total_ms": round(total, 2),
+                "mean_ms": round(total / count, 2),
+                "max_ms": round(entry["max_ms"], 2),
+                "wait_ms": round(entry["wait_ms"], 2),
+                "execution_ms": round(entry["execution_ms"], 2),
+                "fetch_ms": round(entry["fetch_ms"], 2),
+                "histogram": {
+                    (f"le_{bound}" if i < len(BUCKETS_MS) else "inf"): hits
+                    for i, (bound, hits) in enumerate(zip(BUCKETS_MS + (None,), entry["histogram"]))
+                    if hits
+                }
+            })
+        queries.sort(key=lambda item: item["total_ms"], reverse=True)
+        return {"since": self._since, "slow_ms": self.slow_ms, "queries": queries[:limit] if limit else queries}
+
+    def slow_queries(self):
+        with self._lock:
+            return list(reversed(self._slow))
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._slow.clear()
+            self._since = datetime.now()
+
+
+class TimedCursor:
+    """
+    Cursor de mysql.connector que mide cada sentencia. La ejecución se mide
+    en execute(); la lectura, en los fetch siguientes. La sentencia se
+    registra al ejecutar la siguiente o al cerrar el cursor. La espera por
+    la conexión se atribuye a la primera sentencia que la usa.
+
+    mysql.connector cursor that times every statement. Execution is timed in
+    execute(); fetching, in the fetch calls after it. The statement is
+    recorded when the next one runs or the cursor closes. The wait for the
+    connection is attributed to the first statement that uses it.
+    """
+
+    def __init__(self, cursor, connection, stats):
+        self._cursor = cursor
+        self._connection = connection
+        self._stats = stats
+        self._pending = None
+
+    def _flush(self):
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            self._stats.record(*pending)
+
+    def _run(self, method, query, *args, **kwargs):
+        self._flush()
+        wait = self._connection.take_wait()
+        started = time.perf_counter()
+        try:
+            result = method(query, *args, **kwargs)
+        except Exception:
+            # Timeouts, deadlocks y consultas matadas también cuentan
+            self._stats.record(query, wait, time.perf_counter() - started, 0.0, 0, error=True)
+            raise
+        execution = time.perf_counter() - started
+        self._pending = [query, wait, execution, 0.0, max(self._cursor.rowcount or 0, 0)]
+        return result
+
+    def execute(self, query, params=None, *args, **kwargs):
+        return self._run(self._cursor.execute, query, params, *args, **kwargs)
+
+    def executemany(self, query, params_list):
+        return self._run(self._cursor.executemany, query, params_list)
+
+    def _fetch(self, method, many, *args):
+        started = time.perf_counter()
+        result = method(*args)
+        if self._pending is not None:
+            self._pending[3] += time.perf_counter() - started
+            self._pending[4] = max(self._pending[4], len(result) if many else int(result is not None))
+        return result
+
+    def fetchone(self):
+        return self._fetch(self._cursor.fetchone, False)
+
+    def fetchall(self):
+        return self._fetch(self._cursor.fetchall, True)
+
+    def fetchmany(self, size=1):
+        return self._fetch(self._cursor.fetchmany, True, size)
+
+    def close(self):
+        self._flush()
+        return self._cursor.close()
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class AsyncTimedCursor:
+    """
+    Lo mismo para los cursores de aiomysql, usados con "async with".
+
+    Same for aiomysql cursors, used with "async with".
+    """
+
+    def __init__(self, cursor_context, wait, stats):
+        self._context = cursor_context
+        self._cursor = None
+        self._wait = wait
+        self._stats = stats
+        self._pending = None
+
+    def _flush(self):
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            self._stats.record(*pending, source="async")
+
+    async def _run(self, method, query, *args):
+        self._flush()
+        wait, self._wait = self._wait, 0.0
+        started = time.perf_counter()
+        try:
+            result = await method(query, *args)
+        except Exception:
+            self._stats.record(query, wait, time.perf_counter() - started, 0.0, 0, source="async", error=True)
+            raise
+        execution = time.perf_counter() - started
+        self._pending = [query, wait, execution, 0.0, max(self._cursor.rowcount or 0, 0)]
+        return result
+
+    async def execute(self, query, params=None):
+        return await self._run(self._cursor.execute, query, params)
+
+    async def executemany(self, query, params_list):
+        return await self._run(self._cursor.executemany, query, params_list)
+
+    async def _fetch(self, method, many, *args):
+        started = time.perf_counter()
+        result = await method(*args)
+        if self._pending is not None:
+            self._pending[3] += time.perf_counter() - started
+            self._pending[4] = max(self._pending[4], len(result) if many else int(result is not None))
+        return result
+
+    async def fetchone(self):
+        return await self._fetch(self._cursor.fetchone, False)
+
+    async def fetchall(self):
+        return await self._fetch(self._cursor.fetchall, True)
+
+    async def fetchmany(self, size=None):
+        return await self._fetch(self._cursor.fetchmany, True, size)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    async def __aenter__(self):
+        self._cursor = await self._context.__aenter__()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._flush()
+        return await self._context.__aexit__(exc_type, exc, tb)
+
+
+class TimedConnection:
+    """
+    Conexión de mysql.connector abierta fuera del pool cuyos cursores se
+    miden. La espera es lo que tardó en conectar.
+
+    mysql.connector connection opened outside the pool whose cursors are
+    timed. The wait is how long it took to connect.
+    """
+
+    def __init__(self, connection, wait, stats):
+        self._connection = connection
+        self._wait = wait
+        self._stats = stats
+
+    def take_wait(self):
+        wait, self._wait = self._wait, 0.0
+        return wait
+
+    def cursor(self, *args, **kwargs):
+        return TimedCursor(self._connection.cursor(*args, **kwargs), self, self._stats)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+class TimedAsyncConnection:
+    """
+    Conexión de aiomysql cuyos cursores se miden.
+
+    aiomysql connection whose cursors are timed.
+    """
+
+    def __init__(self, connection, wait, stats):
+        self._connection = connection
+        self._wait = wait
+        self._stats = stats
+
+    def cursor(self, *args):
+        wait, self._wait = self._wait, 0.0
+        return AsyncTimedCursor(self._connection.cursor(*args), wait, self._stats)
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+@lru_cache()
+def get_query_stats() -> QueryStats:
+    return QueryStats(
+        slow_ms=settings.DB_SLOW_QUERY_MS,
+        slow_log_size=settings.DB_SLOW_QUERY_LOG_SIZE,
+        max_fingerprints=settings.DB_QUERY_STATS_MAX_FINGERPRINTS
+    )
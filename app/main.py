@@ -3,8 +3,20 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.api.docker_routes import router as docker_router
 from app.api.proxmox_routes import router as proxmox_router
 from app.api.user_routes import router as user_router
-from app.api.auth import get_api_key
+from app.api.job_routes import router as job_router
+from app.api.admin_routes import router as admin_router
+from app.api.auth import get_api_key, last_used_buffer
 from app.core.config import get_settings
+from app.core.pool import close_pools
+from app.core.migrations import pending_migrations, run_migrations
+from app.core.middleware import BodySizeLimitMiddleware
+from app.services.async_db_service import get_async_db_service
+from app.services.db_service import get_db_service
+from app.services.job_service import get_job_service
+from app.services.image_cache import get_image_cache
+from app.services.docker_reconciler import get_docker_reconciler
+from app.services.proxmox_cluster import get_cluster_state
+from app.services.warm_pool import get_warm_pool
 from datetime import datetime
 
 settings = get_settings()
@@ -23,9 +35,47 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Margen de 1 MiB para los campos del formulario y las cabeceras multipart
+app.add_middleware(BodySizeLimitMiddleware, max_body_size=settings.MAX_UPLOAD_SIZE + 1024 * 1024)
+
 app.include_router(user_router, tags=["User Registration"])
 app.include_router(docker_router, tags=["Docker Services"])
 app.include_router(proxmox_router, tags=["Proxmox VMs"])
+app.include_router(job_router, tags=["Jobs"])
+app.include_router(admin_router, tags=["Admin"])
+
+@app.on_event("startup")
+async def startup():
+    if settings.DB_MIGRATE_ON_STARTUP:
+        run_migrations(get_db_service())
+    else:
+        # Sin migrar, las consultas fallarían más tarde (p. ej. proxmox_vms.node)
+        pending = pending_migrations(get_db_service())
+        if pending:
+            raise RuntimeError(
+                f"Schema migrations {pending} are pending; run 'python -m app.core.migrations' "
+                "or enable DB_MIGRATE_ON_STARTUP"
+            )
+    last_used_buffer.start()
+    get_job_service().start()
+    if settings.IMAGE_PREPULL:
+        get_image_cache().start()
+    if settings.DOCKER_RECONCILER_ENABLED:
+        get_docker_reconciler().start()
+    if settings.PROXMOX_CLUSTER_POLL:
+        get_cluster_state().start()
+    get_warm_pool().start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    get_job_service().stop()
+    get_image_cache().stop()
+    get_docker_reconciler().stop()
+    get_warm_pool().stop()
+    get_cluster_state().stop()
+    last_used_buffer.stop()
+    close_pools()
+    await get_async_db_service().close()
 
 @app.get("/")
 async def root():
@@ -1,6 +1,8 @@
 from pydantic import BaseModel, Field
 from enum import Enum
-from typing import Optional, List
+from typing import Optional, List, Any
+from datetime import datetime
+from app.core.config import get_settings
 
 class Sistema(str, Enum):
     WINDOWS_11 = "WINDOWS_11"
@@ -32,6 +34,10 @@ class ServiceAction(str, Enum):
     encender = "encender"
     eliminar = "eliminar"
 
+class CloneMode(str, Enum):
+    full = "full"
+    linked = "linked"
+
 class VMCreate(BaseModel):
     userid: str
     vm_name: str
@@ -40,11 +46,44 @@ class VMCreate(BaseModel):
     cores: int = Field(2, ge=1, le=8)
     memory: int = Field(2048, ge=1024, le=16384)
     ssh_pub_key: Optional[str] = None
+    clone_mode: Optional[CloneMode] = None
+
+class BulkVMCreate(BaseModel):
+    # O una lista de VMs, o `count` VMs iguales nombradas con `name_pattern`
+    vms: Optional[List[VMCreate]] = None
+    userid: Optional[int] = None
+    count: Optional[int] = Field(None, ge=1, le=get_settings().BULK_VM_MAX)
+    name_pattern: str = "vm-{n}"
+    sistema: Optional[Sistema] = None
+    cores: int = Field(2, ge=1, le=8)
+    memory: int = Field(2048, ge=1024, le=16384)
+    ssh_pub_key: Optional[str] = None
+    clone_mode: Optional[CloneMode] = None
+
+    def specs(self) -> List[VMCreate]:
+        if self.vms:
+            return self.vms
+        if not (self.userid and self.count and self.sistema):
+            raise ValueError("Either 'vms' or 'userid', 'count' and 'sistema' are required")
+        return [
+            VMCreate(
+                userid=str(self.userid),
+                # Sustitución literal: otras llaves del patrón se dejan tal cual
+                vm_name=self.name_pattern.replace("{n}", str(n)),
+                sistema=self.sistema,
+                cores=self.cores,
+                memory=self.memory,
+                ssh_pub_key=self.ssh_pub_key,
+                clone_mode=self.clone_mode
+            )
+            for n in range(1, self.count + 1)
+        ]
 
 class VM(BaseModel):
     id_vm: str
     info: VMCreate
     status: str = "encendido"
+    live: Optional[dict] = None
 
 class ServiceCreate(BaseModel):
     id_user: int
@@ -56,6 +95,46 @@ class Service(BaseModel):
     info: ServiceCreate
     status: str = "encendido"
 
+class BulkControl(BaseModel):
+    ids: List[int]
+
+    def unique_ids(self) -> List[int]:
+        return list(dict.fromkeys(self.ids))
+
+class JobAccepted(BaseModel):
+    job_id: str
+    status: str = "queued"
+    status_url: str
+
+class JobStatus(BaseModel):
+    job_id: str
+    kind: str
+    userid: Optional[int] = None
+    status: str
+    stage: str
+    progress: int
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    attempts: int
+    max_attempts: int
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    batch_id: Optional[str] = None
+
+class BatchAccepted(BaseModel):
+    batch_id: str
+    total: int
+    job_ids: List[str]
+    status_url: str
+
+class BatchStatus(BaseModel):
+    batch_id: str
+    total: int
+    counts: dict
+    done: bool
+    jobs: List[JobStatus]
+
 TEMPLATE_IDS = {
     Sistema.WINDOWS_11: 101,
     Sistema.WINDOWS_SERVER_2025: 104,
@@ -64,4 +143,9 @@ TEMPLATE_IDS = {
     Sistema.UBUNTU24_SERVER: 105,
     Sistema.FEDORA: 106,
     Sistema.REDHAT: 107
-}
\ No newline at end of file
+}
+
+def template_id_for(name: str) -> int:
+    # Acepta el nombre del miembro (REDHAT) o su valor ("REDHAT 9.5")
+    sistema = Sistema[name] if name in Sistema.__members__ else Sistema(name)
+    return TEMPLATE_IDS[sistema]
\ No newline at end of file
@@ -0,0 +1,63 @@
+import logging
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Upper bound of keys written per UPDATE statement
+FLUSH_BATCH_SIZE = 500
+
+
+class LastUsedBuffer:
+    """
+    Acumula en memoria el último uso de cada API key y lo vuelca a MySQL
+    periódicamente en una sola sentencia.
+
+    Buffers the latest use time of each API key in memory and writes all
+    dirty keys to MySQL periodically in a single statement.
+    """
+
+    def __init__(self, db_service, interval: float = 30.0):
+        self.db_service = db_service
+        self.interval = interval
+        self._dirty = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def record(self, api_key: str):
+        with self._lock:
+            self._dirty[api_key] = datetime.now()
+
+    def flush(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+        items = list(dirty.items())
+        for i in range(0, len(items), FLUSH_BATCH_SIZE):
+            batch = dict(items[i:i + FLUSH_BATCH_SIZE])
+            try:
+                self.db_service.update_api_keys_last_used(batch)
+            except Exception as e:
+                logger.error(f"Error flushing api_keys.last_used: {e}")
+                with self._lock:
+                    for api_key, used_at in batch.items():
+                        self._dirty.setdefault(api_key, used_at)
+        return len(items)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="api-key-last-used", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval)
+            self._thread = None
+        self.flush()
@@ -0,0 +1,161 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+import aiomysql
+
+from app.core.config import get_settings
+from app.core.query_stats import TimedAsyncConnection, get_query_stats
+from app.services import queries
+
+settings = get_settings()
+
+
+class AsyncDatabaseService:
+    """
+    Equivalente asíncrono de DatabaseService sobre un pool de aiomysql, para
+    que las rutas no bloqueen el event loop mientras esperan a MySQL.
+
+    Asyncio counterpart of DatabaseService backed by an aiomysql pool, so
+    routes do not block the event loop while waiting on MySQL.
+    """
+
+    def __init__(self, host, user, password, database, pool_size=10, pool_timeout=5.0):
+        self.config = {
+            'host': host,
+            'user': user,
+            'password': password,
+            'db': database
+        }
+        self.pool_size = pool_size
+        self.pool_timeout = pool_timeout
+        self._pool = None
+        self._pool_lock = asyncio.Lock()
+
+    async def get_pool(self):
+        if self._pool is None:
+            async with self._pool_lock:
+                if self._pool is None:
+                    self._pool = await aiomysql.create_pool(
+                        minsize=1,
+                        maxsize=self.pool_size,
+                        autocommit=True,
+                        **self.config
+                    )
+        return self._pool
+
+    @asynccontextmanager
+    async def get_connection(self):
+        pool = await self.get_pool()
+        started = time.perf_counter()
+        connection = await asyncio.wait_for(pool.acquire(), self.pool_timeout)
+        wait = time.perf_counter() - started
+        try:
+            if settings.DB_QUERY_STATS:
+                yield TimedAsyncConnection(connection, wait, get_query_stats())
+            else:
+                yield connection
+        finally:
+            pool.release(connection)
+
+    async def execute_query(self, query, params=None):
+        async with self.get_connection() as connection:
+            async with connection.cursor() as cursor:
+                try:
+                    await connection.begin()
+                    await cursor.execute(query, params or ())
+                    await connection.commit()
+                    return cursor.lastrowid
+                except Exception:
+                    await connection.rollback()
+                    raise
+
+    async def fetch_one(self, query, params=None):
+        async with self.get_connection() as connection:
+            async with connection.cursor() as cursor:
+                await cursor.execute(query, params or ())
+                return await cursor.fetchone()
+
+    async def fetch_all(self, query, params=None):
+        async with self.get_connection() as connection:
+            async with connection.cursor() as cursor:
+                await cursor.execute(query, params or ())
+                return await cursor.fetchall()
+
+    async def create_user(self, userid: int, username: str):
+        userid_int = int(userid)
+        await self.execute_query(queries.CREATE_USER, (userid_int, username))
+        return userid_int
+
+    async def get_user_by_userid(self, userid: int):
+        return await self.fetch_one(queries.USER_BY_USERID, (userid,))
+
+    async def get_user_by_userid_or_username(self, userid: int, username: str):
+        return await self.fetch_one(queries.USER_BY_USERID_OR_USERNAME, (userid, username))
+
+    async def get_services_by_userid(self, userid: int):
+        services = await self.fetch_all(queries.SERVICES_BY_USERID, (userid,))
+        return queries.service_rows_to_dicts(services)
+
+    async def get_vms_by_userid(self, userid: int):
+        vms = await self.fetch_all(queries.VMS_BY_USERID, (userid,))
+        return queries.vm_rows_to_dicts(vms)
+
+    async def get_user_overview(self, userid: int):
+        """
+        Usuario, servicios y VMs con una sola conexión del pool.
+
+        User, services and VMs over a single pooled connection.
+        """
+        async with self.get_connection() as connection:
+            async with connection.cursor() as cursor:
+                await cursor.execute(queries.USER_BY_USERID, (userid,))
+                user = await cursor.fetchone()
+                if not user:
+                    return None
+                await cursor.execute(queries.SERVICES_BY_USERID, (userid,))
+                services = await cursor.fetchall()
+                await cursor.execute(queries.VMS_BY_USERID, (userid,))
+                vms = await cursor.fetchall()
+        return queries.overview_to_dict(user, services, vms)
+
+    async def list_services(self, after=0, limit=50, status=None, webtype=None, userid=None):
+        query, params = queries.services_page_query(after, limit, status, webtype, userid)
+        rows = await self.fetch_all(query, params)
+        return queries.page_from_rows(rows, limit, queries.service_list_row_to_dict)
+
+    async def list_vms(self, after=0, limit=50, status=None, os=None, userid=None):
+        query, params = queries.vms_page_query(after, limit, status, os, userid)
+        rows = await self.fetch_all(query, params)
+        return queries.page_from_rows(rows, limit, queries.vm_list_row_to_dict)
+
+    async def get_webtype_id(self, webtype_name: str):
+        result = await self.fetch_one(queries.WEBTYPE_ID_BY_NAME, (webtype_name,))
+        if result:
+            return result[0]
+        return None
+
+    async def get_docker_service(self, userid: int, webname: str):
+        return await self.fetch_one(queries.DOCKER_SERVICE_BY_USER_AND_NAME, (userid, webname))
+
+    async def get_api_key(self, api_key: str):
+        return await self.fetch_one(queries.API_KEY_BY_KEY, (api_key,))
+
+    async def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            await self._pool.wait_closed()
+            self._pool = None
+
+
+@lru_cache()
+def get_async_db_service() -> AsyncDatabaseService:
+    return AsyncDatabaseService(
+        host=settings.DB_HOST,
+        user=settings.DB_USER,
+        password=settings.DB_PASSWORD,
+        database=settings.DB_NAME,
+        pool_size=settings.DB_POOL_SIZE,
+        pool_timeout=settings.DB_POOL_TIMEOUT
+    )
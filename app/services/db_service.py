@@ -1,6 +1,11 @@
 import mysql.connector
-from mysql.connector import pooling
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache
 from app.core.config import get_settings
+from app.core.migrations import run_migrations
+from app.core.pool import get_pool
+from app.services import queries
 
 settings = get_settings()
 
@@ -12,15 +17,15 @@ class DatabaseService:
             'password': password,
             'database': database
         }
-        self.pool = pooling.MySQLConnectionPool(
-            pool_name="cloudfaster_pool",
-            pool_size=5,
-            **self.config
-        )
+        self.pool = get_pool(**self.config)
 
     def get_connection(self):
         return self.pool.get_connection()
 
+    def dedicated_connection(self):
+        # Fuera del pool, para sesiones largas (p. ej. un GET_LOCK que dura minutos)
+        return mysql.connector.connect(**self.config)
+
     def execute_query(self, query, params=None):
         connection = None
         cursor = None
@@ -40,6 +45,39 @@ class DatabaseService:
             if connection:
                 connection.close()
 
+    def execute_many(self, query, params_list):
+        connection = None
+        cursor = None
+        try:
+            connection = self.get_connection()
+            cursor = connection.cursor()
+            cursor.executemany(query, params_list)
+            connection.commit()
+            return cursor.rowcount
+        except Exception:
+            if connection:
+                connection.rollback()
+            raise
+        finally:
+            if cursor:
+                cursor.close()
+            if connection:
+                connection.close()
+
+    @contextmanager
+    def transaction(self):
+        connection = self.get_connection()
+        cursor = connection.cursor()
+        try:
+            yield cursor
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            cursor.close()
+            connection.close()
+
     def fetch_one(self, query, params=None):
         connection = None
         cursor = None
@@ -74,30 +112,47 @@ class DatabaseService:
 
     def verify_api_key(self, api_key: str) -> bool:
         result = self.get_api_key(api_key)
-        if result and result[2]:
-            self.execute_query(
-                "UPDATE api_keys SET last_used = CURRENT_TIMESTAMP WHERE api_key = %s",
-                (api_key,)
-            )
+        if result and result[2] and (result[3] is None or result[3] > datetime.now()):
+            self.touch_api_key(api_key)
             return True
         return False
 
-    def create_user(self, userid: int, username: str):
-        userid_int = int(userid)
+    def touch_api_key(self, api_key: str):
+        self.execute_query(
+            "UPDATE api_keys SET last_used = CURRENT_TIMESTAMP WHERE api_key = %s",
+            (api_key,)
+        )
+
+    def update_api_keys_last_used(self, last_used: dict):
+        if not last_used:
+            return 0
+        items = list(last_used.items())
+        cases = " ".join(["WHEN %s THEN %s"] * len(items))
+        placeholders = ", ".join(["%s"] * len(items))
+        query = f"""
+        UPDATE api_keys
+        SET last_used = CASE api_key {cases} ELSE last_used END
+        WHERE api_key IN ({placeholders})
+        """
+        params = [value for item in items for value in item]
+        params.extend(api_key for api_key, _ in items)
+        return self.execute_query(query, tuple(params))
+
+    def set_api_key_enabled(self, api_key: str, enabled: bool):
         query = """
-        INSERT INTO users (userid, username)
-        VALUES (%s, %s)
+        UPDATE api_keys
+        SET enabled = %s
+        WHERE api_key = %s
         """
-        self.execute_query(query, (userid_int, username))
+        return self.execute_query(query, (enabled, api_key))
+
+    def create_user(self, userid: int, username: str):
+        userid_int = int(userid)
+        self.execute_query(queries.CREATE_USER, (userid_int, username))
         return userid_int
 
     def get_user_by_userid(self, userid: int):
-        query = """
-        SELECT userid, username, created_at
-        FROM users
-        WHERE userid = %s
-        """
-        return self.fetch_one(query, (userid,))
+        return self.fetch_one(queries.USER_BY_USERID, (userid,))
 
     def get_user_by_username(self, username: str):
         query = """
@@ -108,61 +163,49 @@ class DatabaseService:
         return self.fetch_one(query, (username,))
 
     def get_user_by_userid_or_username(self, userid: int, username: str):
-        query = """
-        SELECT userid, username
-        FROM users
-        WHERE userid = %s OR username = %s
-        """
-        return self.fetch_one(query, (userid, username))
+        return self.fetch_one(queries.USER_BY_USERID_OR_USERNAME, (userid, username))
 
     def get_services_by_userid(self, userid: int):
-        query = """
-        SELECT ds.id, ds.webname, wt.name as webtype, ds.status,
-        CONCAT('http://', ds.webname, '.cloudfaster.app') as website_url,
-        CONCAT('http://fb-', ds.webname, '.cloudfaster.app') as filebrowser_url
-        FROM docker_services ds
-        JOIN webtypes wt ON ds.webtype_id = wt.id
-        WHERE ds.userid = %s
-        """
-        services = self.fetch_all(query, (userid,))
-        result = []
-        for service in services:
-            result.append({
-                "id": service[0],
-                "webname": service[1],
-                "webtype": service[2],
-                "status": service[3],
-                "urls": {
-                    "website": service[4],
-                    "filebrowser": service[5]
-                }
-            })
-        return result
+        services = self.fetch_all(queries.SERVICES_BY_USERID, (userid,))
+        return queries.service_rows_to_dicts(services)
 
     def get_vms_by_userid(self, userid: int):
-        query = """
-        SELECT id, vm_id, vm_name, os, status
-        FROM proxmox_vms
-        WHERE userid = %s
+        vms = self.fetch_all(queries.VMS_BY_USERID, (userid,))
+        return queries.vm_rows_to_dicts(vms)
+
+    def log_proxmox_vm_creation(self, userid: int, vm_id: int, vm_name: str, os: str, node: str = None, clone_mode: str = None):
+        return self.execute_query(queries.INSERT_PROXMOX_VM, (userid, vm_id, vm_name, os, node, clone_mode))
+
+    def set_vm_placement(self, vm_id: int, node: str, clone_mode: str):
+        self.execute_query(
+            "UPDATE proxmox_vms SET node = %s, clone_mode = %s WHERE vm_id = %s",
+            (node, clone_mode, vm_id)
+        )
+
+    def reserve_vms(self, vms):
         """
-        vms = self.fetch_all(query, (userid,))
-        result = []
-        for vm in vms:
-            result.append({
-                "id": vm[0],
-                "vm_id": vm[1],
-                "vm_name": vm[2],
-                "os": vm[3],
-                "status": vm[4]
-            })
-        return result
-
-    def log_proxmox_vm_creation(self, userid: int, vm_id: int, vm_name: str, os: str):
-        query = """
-        INSERT INTO proxmox_vms (userid, vm_id, vm_name, os, status)
-        VALUES (%s, %s, %s, %s, %s)
+        Inserta de una vez las filas de proxmox_vms de un lote: o se reservan
+        todos los VMIDs o ninguno.
+
+        Inserts a whole batch of proxmox_vms rows at once: either every VMID
+        is reserved or none is.
+        """
+        with self.transaction() as cursor:
+            cursor.executemany(queries.INSERT_PROXMOX_VM, vms)
+
+    def delete_vms_by_id(self, vm_ids):
+        if not vm_ids:
+            return
+        placeholders = ", ".join(["%s"] * len(vm_ids))
+        return self.execute_query(f"DELETE FROM proxmox_vms WHERE vm_id IN ({placeholders})", tuple(vm_ids))
+
+    def get_vm_target(self, vm_id: int):
         """
-        return self.execute_query(query, (userid, vm_id, vm_name, os, 'enabled'))
+        (node, userid) de la VM, o (None, None) si no está registrada.
+
+        The VM's (node, userid), or (None, None) when it is not recorded.
+        """
+        return self.fetch_one(queries.VM_TARGET_BY_ID, (vm_id,)) or (None, None)
 
     def update_proxmox_vm_status(self, vm_id: int, status: str):
         query = """
@@ -179,6 +222,16 @@ class DatabaseService:
         """
         self.execute_query(query, (userid, webname, webtype_id, status))
 
+    def update_docker_service_statuses(self, statuses):
+        query = """
+        UPDATE docker_services
+        SET status = %s
+        WHERE userid = %s AND webname = %s AND status <> 'deleted'
+        """
+        return self.execute_many(query, [
+            (status, userid, webname) for (userid, webname), status in statuses.items()
+        ])
+
     def update_docker_service_status(self, service_id: int, status: str):
         query = """
         UPDATE docker_services
@@ -187,98 +240,98 @@ class DatabaseService:
         """
         return self.execute_query(query, (status, service_id))
 
+    def get_docker_service_targets(self, service_ids):
+        placeholders = ", ".join(["%s"] * len(service_ids))
+        return self.fetch_all(
+            f"""
+            SELECT ds.id, ds.userid, ds.webname, u.username
+            FROM docker_services ds
+            LEFT JOIN users u ON u.userid = ds.userid
+            WHERE ds.id IN ({placeholders})
+            """,
+            tuple(service_ids)
+        )
+
+    def set_docker_services_status(self, service_ids, status: str):
+        placeholders = ", ".join(["%s"] * len(service_ids))
+        return self.execute_query(
+            f"UPDATE docker_services SET status = %s WHERE id IN ({placeholders})",
+            (status, *service_ids)
+        )
+
+    def get_vm_targets(self, vm_ids):
+        placeholders = ", ".join(["%s"] * len(vm_ids))
+        rows = self.fetch_all(
+            f"SELECT vm_id, node, userid FROM proxmox_vms WHERE vm_id IN ({placeholders})",
+            tuple(vm_ids)
+        )
+        return {vm_id: (node, userid) for vm_id, node, userid in rows}
+
+    def set_proxmox_vms_status(self, vm_ids, status: str):
+        placeholders = ", ".join(["%s"] * len(vm_ids))
+        return self.execute_query(
+            f"UPDATE proxmox_vms SET status = %s WHERE vm_id IN ({placeholders})",
+            (status, *vm_ids)
+        )
+
     def get_webtype_id(self, webtype_name: str):
-        query = """
-        SELECT id FROM webtypes WHERE name = %s
-        """
-        result = self.fetch_one(query, (webtype_name,))
+        result = self.fetch_one(queries.WEBTYPE_ID_BY_NAME, (webtype_name,))
         if result:
             return result[0]
         return None
 
     def get_docker_service(self, userid: int, webname: str):
-        query = """
-        SELECT id, webtype_id, status
-        FROM docker_services
-        WHERE userid = %s AND webname = %s
-        """
-        return self.fetch_one(query, (userid, webname))
+        return self.fetch_one(queries.DOCKER_SERVICE_BY_USER_AND_NAME, (userid, webname))
 
     def get_api_key(self, api_key: str):
-        query = """
-        SELECT id, userid, enabled
-        FROM api_keys
-        WHERE api_key = %s
-        """
-        return self.fetch_one(query, (api_key,))
+        return self.fetch_one(queries.API_KEY_BY_KEY, (api_key,))
         
     def delete_vm_by_id(self, vm_id):
         query = "DELETE FROM proxmox_vms WHERE vm_id = %s"
         self.execute_query(query, (vm_id,))    
 
+    def add_column_if_missing(self, table, column, definition):
+        exists = self.fetch_one(
+            """
+            SELECT COUNT(*) FROM information_schema.columns
+            WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+            """,
+            (table, column)
+        )[0]
+        if not exists:
+            self.execute_query(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    def add_index_if_missing(self, table, index, columns):
+        exists = self.fetch_one(
+            """
+            SELECT COUNT(*) FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+            """,
+            (table, index)
+        )[0]
+        if not exists:
+            self.execute_query(f"ALTER TABLE {table} ADD INDEX {index} ({columns})")
+
+    def drop_index_if_exists(self, table, index):
+        exists = self.fetch_one(
+            """
+            SELECT COUNT(*) FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+            """,
+            (table, index)
+        )[0]
+        if exists:
+            self.execute_query(f"ALTER TABLE {table} DROP INDEX {index}")
+
     def create_tables_if_not_exists(self):
-        self.execute_query("""
-        CREATE TABLE IF NOT EXISTS users (
-            userid INT PRIMARY KEY,
-            username VARCHAR(100) NOT NULL UNIQUE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
-        self.execute_query("""
-        CREATE TABLE IF NOT EXISTS webtypes (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            name VARCHAR(50) NOT NULL UNIQUE,
-            description VARCHAR(255)
-        )
-        """)
-        self.execute_query("""
-        CREATE TABLE IF NOT EXISTS docker_services (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            userid INT NOT NULL,
-            webname VARCHAR(100) NOT NULL,
-            webtype_id INT NOT NULL,
-            status ENUM('enabled', 'disabled', 'active', 'stopped', 'deleted') NOT NULL DEFAULT 'enabled',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
-            FOREIGN KEY (webtype_id) REFERENCES webtypes(id),
-            UNIQUE (userid, webname)
-        )
-        """)
-        self.execute_query("""
-        CREATE TABLE IF NOT EXISTS proxmox_vms (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            userid INT NOT NULL,
-            vm_id INT NOT NULL UNIQUE,
-            vm_name VARCHAR(100) NOT NULL,
-            os VARCHAR(50) NOT NULL,
-            status ENUM('enabled', 'disabled') NOT NULL DEFAULT 'enabled',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
-        )
-        """)
-        self.execute_query("""
-        CREATE TABLE IF NOT EXISTS api_keys (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            userid INT NOT NULL,
-            api_key VARCHAR(64) NOT NULL UNIQUE,
-            enabled BOOLEAN NOT NULL DEFAULT TRUE,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            last_used TIMESTAMP NULL,
-            expires_at TIMESTAMP NULL
-        )
-        """)
-        if not self.fetch_one("SELECT COUNT(*) FROM webtypes")[0]:
-            webtypes = [
-                ("Static", "Static website files"),
-                ("PHP", "PHP application"),
-                ("Laravel", "Laravel PHP framework"),
-                ("Node.js", "Node.js application"),
-                ("Mysql", "MySQL database"),
-                ("Mariadb", "MariaDB database"),
-                ("Python", "Python application")
-            ]
-            for webtype in webtypes:
-                self.execute_query(
-                    "INSERT INTO webtypes (name, description) VALUES (%s, %s)",
-                    webtype
-                )
\ No newline at end of file
+        # El esquema vive en app/core/migrations.py
+        return run_migrations(self)
+
+@lru_cache()
+def get_db_service() -> DatabaseService:
+    return DatabaseService(
+        host=settings.DB_HOST,
+        user=settings.DB_USER,
+        password=settings.DB_PASSWORD,
+        database=settings.DB_NAME
+    )
@@ -0,0 +1,134 @@
+import logging
+import pathlib
+import re
+from functools import lru_cache
+
+import docker
+import yaml
+from docker.errors import NotFound
+
+logger = logging.getLogger(__name__)
+
+PROJECT_LABEL = "com.docker.compose.project"
+SERVICE_LABEL = "com.docker.compose.service"
+
+
+@lru_cache()
+def get_docker_client():
+    # Un único cliente de la Engine API (y su pool de conexiones) por proceso
+    return docker.from_env()
+
+
+def project_name(target) -> str:
+    # Mismo nombre de proyecto que docker-compose deriva del directorio
+    return re.sub(r"[^a-z0-9_-]", "", pathlib.Path(target).name.lower())
+
+
+class DockerEngineBackend:
+    """
+    Crea, arranca, para y elimina los contenedores de un servicio hablando
+    directamente con la Engine API mediante un único cliente persistente.
+    El docker-compose.yml generado desde DOCKER_TEMPLATES sigue siendo la
+    fuente de verdad, y los contenedores llevan las mismas etiquetas que
+    pondría docker-compose, así que ambos backends son intercambiables.
+
+    Creates, starts, stops and removes the containers of a service by
+    talking to the Engine API through a single persistent client. The
+    docker-compose.yml rendered from DOCKER_TEMPLATES remains the source of
+    truth, and containers carry the same labels docker-compose would set,
+    so both backends are interchangeable.
+    """
+
+    @property
+    def client(self):
+        return get_docker_client()
+
+    def _containers(self, project):
+        return self.client.containers.list(all=True, filters={"label": f"{PROJECT_LABEL}={project}"})
+
+    def _network_name(self, project, name, spec):
+        spec = spec or {}
+        if spec.get("external"):
+            return spec.get("name", name)
+        return spec.get("name", f"{project}_{name}")
+
+    def _ensure_network(self, network_name, external):
+        try:
+            self.client.networks.get(network_name)
+        except NotFound:
+            if external:
+                raise RuntimeError(f"External network '{network_name}' does not exist")
+            self.client.networks.create(network_name, driver="bridge")
+
+    def _volumes(self, target, volumes):
+        binds = {}
+        for volume in volumes or []:
+            source, dest, *mode = volume.split(":")
+            if source.startswith("."):
+                source = str((pathlib.Path(target) / source).resolve())
+            binds[source] = {"bind": dest, "mode": mode[0] if mode else "rw"}
+        return binds
+
+    def up(self, target, compose_text, labels=None):
+        target = pathlib.Path(target)
+        project = project_name(target)
+        compose = yaml.safe_load(compose_text)
+        networks = {
+            name: self._network_name(project, name, spec)
+            for name, spec in (compose.get("networks") or {}).items()
+        }
+        for name, spec in (compose.get("networks") or {}).items():
+            self._ensure_network(networks[name], bool((spec or {}).get("external")))
+        existing = {c.labels.get(SERVICE_LABEL): c for c in self._containers(project)}
+        for service, spec in compose["services"].items():
+            container = existing.get(service)
+            if container is not None:
+                if container.status != "running":
+                    container.start()
+                continue
+            service_networks = [networks[n] for n in spec.get("networks", [])]
+            container_labels = dict(spec.get("labels") or {})
+            container_labels.update(labels or {})
+            container_labels.update({
+                PROJECT_LABEL: project,
+                SERVICE_LABEL: service,
+                "com.docker.compose.container-number": "1",
+                "com.docker.compose.oneoff": "False",
+                "com.docker.compose.project.working_dir": str(target),
+                "com.docker.compose.project.config_files": str(target / "docker-compose.yml"),
+            })
+            restart = spec.get("restart")
+            container = self.client.containers.run(
+                image=spec["image"],
+                command=spec.get("command"),
+                name=f"{project}-{service}-1",
+                detach=True,
+                labels=container_labels,
+                volumes=self._volumes(target, spec.get("volumes")),
+                working_dir=spec.get("working_dir"),
+                environment=spec.get("environment"),
+                restart_policy={"Name": restart} if restart and restart != "no" else None,
+                network=service_networks[0] if service_networks else None
+            )
+            for network_name in service_networks[1:]:
+                self.client.networks.get(network_name).connect(container)
+
+    def start(self, target):
+        for container in self._containers(project_name(target)):
+            container.start()
+
+    def stop(self, target):
+        for container in self._containers(project_name(target)):
+            container.stop()
+
+    def restart(self, target):
+        for container in self._containers(project_name(target)):
+            container.restart()
+
+    def down(self, target, volumes=True):
+        project = project_name(target)
+        for container in self._containers(project):
+            container.remove(v=volumes, force=True)
+        for network in self.client.networks.list(filters={"name": f"{project}_"}):
+            if network.name.startswith(f"{project}_"):
+                network.remove()
@@ -0,0 +1,165 @@
+import logging
+import pathlib
+import threading
+from datetime import datetime
+from functools import lru_cache
+
+from app.core.config import get_settings
+from app.services.db_service import get_db_service
+from app.services.docker_engine import get_docker_client, PROJECT_LABEL, SERVICE_LABEL
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Docker event -> docker_services.status
+EVENT_STATUS = {
+    "start": "active",
+    "restart": "active",
+    "unpause": "active",
+    "die": "stopped",
+    "stop": "stopped",
+    "kill": "stopped",
+    "oom": "stopped",
+    "pause": "stopped",
+}
+
+# Contenedores auxiliares que no deciden el estado del servicio
+AUXILIARY_SERVICES = {"filebrowser"}
+
+
+class DockerStatusReconciler:
+    """
+    Escucha el stream de eventos de Docker, traduce las etiquetas de cada
+    contenedor a (userid, webname) y mantiene un mapa en memoria con el
+    estado real de cada servicio. Los cambios se vuelcan a docker_services
+    por lotes cada pocos segundos.
+
+    Listens to the Docker events stream, maps each container's labels back
+    to (userid, webname) and keeps an in-memory map with the real state of
+    every service. Changes are written to docker_services in batches every
+    few seconds.
+    """
+
+    def __init__(self, db_service, base_path, flush_interval=5.0):
+        self.db_service = db_service
+        self.base_path = pathlib.Path(base_path)
+        self.flush_interval = flush_interval
+        self._live = {}
+        self._dirty = {}
+        self._userids = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._events = None
+        self._threads = []
+
+    def _service_key(self, labels):
+        if "cloudfaster.userid" in labels and "cloudfaster.webname" in labels:
+            return int(labels["cloudfaster.userid"]), labels["cloudfaster.webname"]
+        # Contenedores creados por docker-compose: <base>/users/<username|userid>/<webname>
+        working_dir = labels.get("com.docker.compose.project.working_dir")
+        if not working_dir:
+            return None
+        path = pathlib.Path(working_dir)
+        if path.parent.parent != self.base_path / "users":
+            return None
+        owner, webname = path.parent.name, path.name
+        if owner not in self._userids:
+            user = self.db_service.get_user_by_username(owner)
+            if user:
+                self._userids[owner] = user[0]
+            elif owner.isdigit():
+                self._userids[owner] = int(owner)
+            else:
+                return None
+        return self._userids[owner], webname
+
+    def _apply(self, labels, status, action):
+        key = self._service_key(labels)
+        if key is None:
+            return
+        service = labels.get(SERVICE_LABEL)
+        with self._lock:
+            entry = self._live.setdefault(key, {"status": None, "containers": {}})
+            entry["containers"][service] = status
+            entry["updated_at"] = datetime.now()
+            entry["event"] = action
+            if service in AUXILIARY_SERVICES and len(entry["containers"]) > 1:
+                return
+            if entry["status"] != status:
+                entry["status"] = status
+                self._dirty[key] = status
+
+    def sync(self):
+        containers = get_docker_client().containers.list(all=True, filters={"label": PROJECT_LABEL})
+        for container in containers:
+            status = "active" if container.status == "running" else "stopped"
+            self._apply(container.labels, status, "sync")
+
+    def live_status(self, userid, webname):
+        with self._lock:
+            entry = self._live.get((int(userid), webname))
+            return dict(entry, containers=dict(entry["containers"])) if entry else None
+
+    def flush(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+        if not dirty:
+            return 0
+        try:
+            self.db_service.update_docker_service_statuses(dirty)
+        except Exception as e:
+            logger.error(f"Error writing docker_services statuses: {e}")
+            with self._lock:
+                for key, status in dirty.items():
+                    self._dirty.setdefault(key, status)
+        return len(dirty)
+
+    def _listen(self):
+        while not self._stop.is_set():
+            try:
+                self.sync()
+                self._events = get_docker_client().events(
+                    decode=True,
+                    filters={"type": "container", "label": PROJECT_LABEL}
+                )
+                for event in self._events:
+                    action = event.get("Action", "").split(":")[0]
+                    if action == "destroy":
+                        continue
+                    status = EVENT_STATUS.get(action)
+                    if status:
+                        self._apply(event.get("Actor", {}).get("Attributes", {}), status, action)
+            except Exception as e:
+                if self._stop.is_set():
+                    break
+                logger.error(f"Docker events stream interrupted: {e}")
+                self._stop.wait(5)
+
+    def _flusher(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def start(self):
+        if self._threads:
+            return
+        self._stop.clear()
+        for target in (self._listen, self._flusher):
+            thread = threading.Thread(target=target, name=f"docker-{target.__name__[1:]}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        if self._events is not None:
+            self._events.close()
+        self._threads = []
+        self.flush()
+
+
+@lru_cache()
+def get_docker_reconciler() -> DockerStatusReconciler:
+    return DockerStatusReconciler(
+        get_db_service(),
+        settings.DOCKER_BASE_PATH,
+        flush_interval=settings.DOCKER_RECONCILER_FLUSH_INTERVAL
+    )
@@ -1,74 +1,81 @@
+import logging
 import os
 import pathlib
-import zipfile
+import shutil
 import subprocess
 import textwrap
 from app.core.config import get_settings
-from app.services.db_service import DatabaseService
+from app.services.db_service import get_db_service
 from app.services.docker_templates import DOCKER_TEMPLATES
+from app.services.filebrowser_seed import FilebrowserSeeder, init_filebrowser_db
+from app.services.docker_engine import DockerEngineBackend
+from app.services.zip_extractor import get_zip_extractor
+from app.services.image_cache import get_image_cache
+from app.core.concurrency import BatchWriter, run_concurrently, shared_limit
+from app.services.user_overview import invalidate_user_overview
 
+logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# action -> (docker-compose arguments, docker_services.status)
+# The first argument is also the DockerEngineBackend method name.
+SERVICE_ACTIONS = {
+    "encender": (["start"], "active"),
+    "apagar": (["stop"], "stopped"),
+    "reiniciar": (["restart"], "active"),
+    "eliminar": (["down", "-v"], "deleted"),
+}
+
 class DockerService:
     def __init__(self):
         self.base_path = pathlib.Path(settings.DOCKER_BASE_PATH)
-        self.db_service = DatabaseService(
-            host=settings.DB_HOST,
-            user=settings.DB_USER,
-            password=settings.DB_PASSWORD,
-            database=settings.DB_NAME
-        )
+        self.db_service = get_db_service()
+        self.filebrowser_seeder = FilebrowserSeeder(settings.FILEBROWSER_CACHE_DIR)
+        self.engine = DockerEngineBackend() if settings.DOCKER_BACKEND == "engine" else None
+
+    def _target_path(self, userid, username, webname):
+        return self.base_path / "users" / str(username or userid) / str(webname)
 
     def _ensure_path(self, userid, webname):
         user_info = self.db_service.get_user_by_userid(userid)
-        if user_info:
-            username = user_info[1]
-            target = self.base_path / "users" / str(username) / str(webname)
-        else:
-            target = self.base_path / "users" / str(userid) / str(webname)
+        target = self._target_path(userid, user_info[1] if user_info else None, webname)
         (target / "data").mkdir(parents=True, exist_ok=True)
         (target / "filebrowser_data").mkdir(exist_ok=True)
         return target
 
     def _safe_extract(self, zip_path, dest_path):
-        with zipfile.ZipFile(zip_path) as zf:
-            for member in zf.infolist():
-                member_path = dest_path / member.filename
-                if not str(member_path.resolve()).startswith(str(dest_path.resolve())):
-                    raise RuntimeError("Zip traversal detected!")
-            zf.extractall(dest_path)
+        return get_zip_extractor().extract(zip_path, dest_path)
 
     def _init_filebrowser(self, target, admin_pass="admin123"):
         filebrowser_db = target / "filebrowser_data" / "filebrowser.db"
-        if not filebrowser_db.exists():
-            subprocess.run([
-                "docker", "run", "--rm",
-                "-v", f"{str(target / 'filebrowser_data')}:/srv",
-                "filebrowser/filebrowser",
-                "config", "init", "--database", "/srv/filebrowser.db"
-            ], check=True)
-            subprocess.run([
-                "docker", "run", "--rm",
-                "-v", f"{str(target / 'filebrowser_data')}:/srv",
-                "filebrowser/filebrowser",
-                "users", "add", "admin", admin_pass,
-                "--database", "/srv/filebrowser.db", "--perm.admin"
-            ], check=True)
-
-    def create_service(self, userid, webname, tipo_servicio, zip_path=None, admin_pass="admin123"):
+        if filebrowser_db.exists():
+            return
+        try:
+            self.filebrowser_seeder.seed(target / "filebrowser_data", admin_pass)
+        except Exception as e:
+            logger.warning(f"Golden filebrowser.db unavailable, falling back to containers: {e}")
+            init_filebrowser_db(target / "filebrowser_data", admin_pass)
+
+    def create_service(self, userid, webname, tipo_servicio, zip_path=None, admin_pass="admin123", progress=None):
+        progress = progress or (lambda stage, percent=None: None)
         target = self._ensure_path(userid, webname)
-        if zip_path:
-            self._safe_extract(zip_path, target / "data")
+        extract_stats = None
+        if zip_path and os.path.exists(zip_path):
+            progress("extracting", 10)
+            extract_stats = self._safe_extract(zip_path, target / "data")
             os.remove(zip_path)
+        progress("filebrowser", 40)
         self._init_filebrowser(target, admin_pass)
         template = DOCKER_TEMPLATES.get(tipo_servicio)
         if not template:
             raise ValueError("Service type not supported")
-        compose_text = textwrap.dedent(template.format(webname=webname))
+        compose_text = get_image_cache().pin(textwrap.dedent(template.format(webname=webname)))
         (target / "docker-compose.yml").write_text(compose_text)
-        subprocess.run(["docker-compose", "up", "-d"], cwd=target, check=True)
-        webtype_id = self.db_service.get_webtype_id(tipo_servicio)
-        self.db_service.log_docker_service_creation(userid, webname, webtype_id)
+        progress("starting", 60)
+        self._compose_up(target, compose_text, userid, webname)
+        if not self.db_service.get_docker_service(userid, webname):
+            webtype_id = self.db_service.get_webtype_id(tipo_servicio)
+            self.db_service.log_docker_service_creation(userid, webname, webtype_id)
         return {
             "status": "success",
             "userid": userid,
@@ -77,25 +84,67 @@ class DockerService:
             "urls": {
                 "website": f"http://{webname}.cloudfaster.app",
                 "filebrowser": f"http://fb-{webname}.cloudfaster.app"
-            }
+            },
+            "extract": extract_stats
         }
 
+    def _compose_up(self, target, compose_text, userid, webname):
+        if self.engine:
+            self.engine.up(target, compose_text, labels={
+                "cloudfaster.userid": str(userid),
+                "cloudfaster.webname": str(webname)
+            })
+        else:
+            subprocess.run(["docker-compose", "up", "-d"], cwd=target, check=True)
+
+    def clone_git_repo(self, userid, webname, git_repo_url, replace=False):
+        project_path = self._ensure_path(userid, webname) / "data"
+        if replace:
+            # Un reintento encuentra el clon a medias del intento anterior. Se vacía
+            # el contenido, no el directorio, que está montado en el contenedor.
+            for entry in project_path.iterdir():
+                if entry.is_dir() and not entry.is_symlink():
+                    shutil.rmtree(entry)
+                else:
+                    entry.unlink()
+        result_clone = subprocess.run(
+            ["git", "clone", git_repo_url, str(project_path)],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True
+        )
+        if result_clone.returncode != 0:
+            raise Exception(f"Git clone failed: {result_clone.stderr}")
+
+    def run_create_job(self, payload, job):
+        zip_path = payload.get("zip_path")
+        try:
+            result = self.create_service(
+                userid=payload["userid"],
+                webname=payload["webname"],
+                tipo_servicio=payload["tipo_servicio"],
+                zip_path=zip_path,
+                progress=job.progress
+            )
+            if payload.get("git_repo_url"):
+                job.progress("cloning", 80)
+                self.clone_git_repo(
+                    payload["userid"], payload["webname"], payload["git_repo_url"], replace=job.attempt > 1
+                )
+            return result
+        except Exception:
+            if job.is_last_attempt and zip_path and os.path.exists(zip_path):
+                os.remove(zip_path)
+            raise
+        finally:
+            invalidate_user_overview(payload["userid"])
+
     def control_service(self, userid, webname, action):
         target = self._ensure_path(userid, webname)
-        if action == "encender":
-            subprocess.run(["docker-compose", "start"], cwd=target, check=True)
-            status = "active"
-        elif action == "apagar":
-            subprocess.run(["docker-compose", "stop"], cwd=target, check=True)
-            status = "stopped"
-        elif action == "reiniciar":
-            subprocess.run(["docker-compose", "restart"], cwd=target, check=True)
-            status = "active"
-        elif action == "eliminar":
-            subprocess.run(["docker-compose", "down", "-v"], cwd=target, check=True)
-            status = "deleted"
-        else:
+        if action not in SERVICE_ACTIONS:
             raise ValueError("Invalid action")
+        compose_command, status = SERVICE_ACTIONS[action]
+        self._run_action(target, compose_command)
         result = self.db_service.fetch_one(
             "SELECT id FROM docker_services WHERE userid = %s AND webname = %s",
             (userid, webname)
@@ -103,10 +152,64 @@ class DockerService:
         if result:
             service_id = result[0]
             self.db_service.update_docker_service_status(service_id, status)
+        invalidate_user_overview(userid)
         return {
             "status": "success",
             "userid": userid,
             "webname": webname,
             "action": action,
             "message": f"Service {action} operation completed successfully"
-        }
\ No newline at end of file
+        }
+
+    def _run_action(self, target, compose_command):
+        if self.engine:
+            getattr(self.engine, compose_command[0])(target)
+        else:
+            subprocess.run(["docker-compose", *compose_command], cwd=target, check=True)
+
+    def control_services(self, service_ids, action):
+        """
+        Aplica una acción a varios servicios: una sola consulta para
+        resolverlos y acciones en paralelo, como mucho
+        DOCKER_CONTROL_CONCURRENCY en todo el proceso. El status de los
+        servicios terminados se guarda con un único UPDATE por tanda
+        (BatchWriter), aunque el cliente se desconecte. Va devolviendo el
+        resultado de cada servicio.
+
+        Applies an action to several services: a single query to resolve
+        them and actions run concurrently, at most DOCKER_CONTROL_CONCURRENCY
+        across the whole process. Finished services get their status stored
+        with a single UPDATE per round (BatchWriter), even if the client
+        disconnects. Yields each service's result as it finishes.
+        """
+        if action not in SERVICE_ACTIONS:
+            raise ValueError("Invalid action")
+        compose_command, status = SERVICE_ACTIONS[action]
+        rows = self.db_service.get_docker_service_targets(service_ids)
+        targets = {
+            service_id: self._target_path(userid, username, webname)
+            for service_id, userid, webname, username in rows
+        }
+        owners = {row[0]: row[1] for row in rows}
+        for service_id in service_ids:
+            if service_id not in targets:
+                yield {"id": service_id, "status": "error", "message": "Service not found"}
+
+        def write(status, done):
+            self.db_service.set_docker_services_status(done, status)
+            invalidate_user_overview(*{owners[service_id] for service_id in done})
+
+        writer = BatchWriter(write, settings.BULK_CONTROL_FLUSH_INTERVAL, name="service-control-writer")
+        for service_id, _, error in run_concurrently(
+            targets,
+            lambda service_id: self._run_action(targets[service_id], compose_command),
+            workers=settings.DOCKER_CONTROL_CONCURRENCY,
+            name="service-control",
+            limit=shared_limit("docker-control", settings.DOCKER_CONTROL_CONCURRENCY),
+            on_result=lambda service_id, _, error: error or writer.add(status, service_id),
+            on_done=writer.close
+        ):
+            if error:
+                yield {"id": service_id, "status": "error", "message": str(error)}
+            else:
+                yield {"id": service_id, "status": "success", "action": action}
\ No newline at end of file
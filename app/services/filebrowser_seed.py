@@ -0,0 +1,117 @@
+import base64
+import logging
+import os
+import pathlib
+import re
+import secrets
+import shutil
+import subprocess
+import tempfile
+import threading
+
+import bcrypt
+
+logger = logging.getLogger(__name__)
+
+GOLDEN_ADMIN_PASSWORD = "cloudfaster-golden-seed"
+
+# filebrowser guarda la base de datos con storm (BoltDB + JSON). Tanto el hash
+# bcrypt del admin (60 bytes) como la clave de firma JWT de settings (64 bytes
+# en base64) tienen longitud fija, así que se pueden sustituir in situ sin
+# tocar la estructura de páginas de Bolt.
+# filebrowser stores its database with storm (BoltDB + JSON). Both the admin
+# bcrypt hash (60 bytes) and the JWT signing key in settings (64 bytes, base64)
+# have a fixed length, so they can be replaced in place without touching the
+# Bolt page layout.
+BCRYPT_HASH_RE = re.compile(rb"\$2[aby]\$(\d{2})\$[./A-Za-z0-9]{53}")
+SIGNING_KEY_RE = re.compile(rb'"key":"([A-Za-z0-9+/]{86}==)"')
+
+
+class FilebrowserSeeder:
+    """
+    Genera una sola vez un filebrowser.db "golden" con los contenedores de
+    filebrowser y lo copia a cada servicio parcheando las credenciales del
+    admin y la clave de firma, sin arrancar contenedores.
+
+    Builds a golden filebrowser.db once with the filebrowser containers and
+    copies it into each service, patching the admin credentials and the
+    signing key, without starting any container.
+    """
+
+    def __init__(self, cache_dir, image="filebrowser/filebrowser"):
+        self.cache_dir = pathlib.Path(cache_dir)
+        self.image = image
+        self._golden = None
+        self._lock = threading.Lock()
+
+    @property
+    def golden_path(self):
+        return self.cache_dir / "filebrowser.db"
+
+    def _build_golden(self):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        workdir = pathlib.Path(tempfile.mkdtemp(dir=self.cache_dir))
+        try:
+            init_filebrowser_db(workdir, GOLDEN_ADMIN_PASSWORD, self.image)
+            data = (workdir / "filebrowser.db").read_bytes()
+            check_golden(data)
+            os.replace(workdir / "filebrowser.db", self.golden_path)
+            logger.info(f"Golden filebrowser database written to {self.golden_path}")
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def golden(self) -> bytes:
+        if self._golden is None:
+            with self._lock:
+                if self._golden is None:
+                    if not self.golden_path.exists():
+                        self._build_golden()
+                    data = self.golden_path.read_bytes()
+                    check_golden(data)
+                    self._golden = data
+        return self._golden
+
+    def seed(self, filebrowser_data, admin_pass):
+        db_path = pathlib.Path(filebrowser_data) / "filebrowser.db"
+        tmp_path = db_path.with_suffix(".db.tmp")
+        tmp_path.write_bytes(patch_database(self.golden(), admin_pass))
+        os.replace(tmp_path, db_path)
+        return db_path
+
+
+def init_filebrowser_db(filebrowser_data, admin_pass, image="filebrowser/filebrowser"):
+    subprocess.run([
+        "docker", "run", "--rm",
+        "-v", f"{str(filebrowser_data)}:/srv",
+        image,
+        "config", "init", "--database", "/srv/filebrowser.db"
+    ], check=True)
+    subprocess.run([
+        "docker", "run", "--rm",
+        "-v", f"{str(filebrowser_data)}:/srv",
+        image,
+        "users", "add", "admin", admin_pass,
+        "--database", "/srv/filebrowser.db", "--perm.admin"
+    ], check=True)
+
+
+def check_golden(data: bytes):
+    hashes = BCRYPT_HASH_RE.findall(data)
+    keys = SIGNING_KEY_RE.findall(data)
+    if len(hashes) != 1 or len(keys) != 1:
+        raise ValueError(
+            f"Unexpected golden filebrowser.db layout "
+            f"({len(hashes)} password hashes, {len(keys)} signing keys)"
+        )
+
+
+def patch_database(golden: bytes, admin_pass: str) -> bytes:
+    match = BCRYPT_HASH_RE.search(golden)
+    cost = int(match.group(1))
+    new_hash = bcrypt.hashpw(admin_pass.encode(), bcrypt.gensalt(rounds=cost))
+    # Go (x/crypto/bcrypt) escribe $2a$; es el mismo algoritmo que $2b$
+    new_hash = b"$2a$" + new_hash[4:]
+    data = golden[:match.start()] + new_hash + golden[match.end():]
+    key = SIGNING_KEY_RE.search(data)
+    new_key = base64.b64encode(secrets.token_bytes(64))
+    return data[:key.start(1)] + new_key + data[key.end(1):]
@@ -0,0 +1,105 @@
+import logging
+import re
+import threading
+from datetime import datetime
+from functools import lru_cache
+
+from app.core.config import get_settings
+from app.services.docker_engine import get_docker_client
+from app.services.docker_templates import DOCKER_TEMPLATES
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+IMAGE_RE = re.compile(r"^(\s*image:\s*)(\S+)\s*$", re.MULTILINE)
+
+
+def template_images():
+    images = set()
+    for template in DOCKER_TEMPLATES.values():
+        images.update(match.group(2) for match in IMAGE_RE.finditer(template))
+    return sorted(images)
+
+
+def split_reference(image):
+    repository, sep, tag = image.rpartition(":")
+    if not sep or "/" in tag:
+        return image, "latest"
+    return repository, tag
+
+
+class ImageCache:
+    """
+    Mantiene descargadas las imágenes de DOCKER_TEMPLATES y las fija por
+    digest, para que crear un servicio nunca espere a un pull del registro
+    ni a resolver de nuevo ":latest".
+
+    Keeps the DOCKER_TEMPLATES images pulled and pins them by digest, so
+    service creation never waits on a registry pull or on re-resolving
+    ":latest".
+    """
+
+    def __init__(self, images, refresh_interval=21600):
+        self.images = list(images)
+        self.refresh_interval = refresh_interval
+        self._state = {image: {"digest": None, "pulled_at": None, "error": None} for image in self.images}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def pull(self, image):
+        repository, tag = split_reference(image)
+        try:
+            pulled = get_docker_client().images.pull(repository, tag=tag)
+            digests = pulled.attrs.get("RepoDigests") or []
+            digest = next((d for d in digests if d.split("@")[0] == repository), digests[0] if digests else None)
+            state = {"digest": digest, "pulled_at": datetime.now(), "error": None}
+            logger.info(f"Image {image} warm at {digest}")
+        except Exception as e:
+            logger.error(f"Error pulling image {image}: {e}")
+            with self._lock:
+                state = dict(self._state[image], error=str(e))
+        with self._lock:
+            self._state[image] = state
+
+    def refresh(self):
+        for image in self.images:
+            if self._stop.is_set():
+                break
+            self.pull(image)
+
+    def pin(self, compose_text):
+        with self._lock:
+            digests = {image: state["digest"] for image, state in self._state.items() if state["digest"]}
+
+        def replace(match):
+            return match.group(1) + digests.get(match.group(2), match.group(2))
+
+        return IMAGE_RE.sub(replace, compose_text)
+
+    def status(self):
+        with self._lock:
+            return [
+                dict(state, image=image, warm=state["digest"] is not None)
+                for image, state in self._state.items()
+            ]
+
+    def _run(self):
+        self.refresh()
+        while not self._stop.wait(self.refresh_interval):
+            self.refresh()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="image-cache", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+@lru_cache()
+def get_image_cache() -> ImageCache:
+    return ImageCache(template_images(), refresh_interval=settings.IMAGE_REFRESH_INTERVAL)
@@ -0,0 +1,315 @@
+import json
+import logging
+import os
+import socket
+import threading
+import traceback
+from functools import lru_cache
+from uuid import uuid4
+
+from app.core.config import get_settings
+from app.services import queries
+from app.services.db_service import get_db_service
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+DEFAULT_QUEUE = "default"
+# Los clones esperan en los semáforos de nodo y storage; tienen sus propios workers
+PROXMOX_QUEUE = "proxmox"
+
+
+class JobContext:
+    """
+    Lo recibe cada handler: datos del intento actual y forma de reportar
+    progreso.
+
+    Handed to every handler: details of the current attempt and a way to
+    report progress.
+    """
+
+    def __init__(self, service, job_id, attempt, max_attempts):
+        self.service = service
+        self.job_id = job_id
+        self.attempt = attempt
+        self.max_attempts = max_attempts
+
+    @property
+    def is_last_attempt(self):
+        return self.attempt >= self.max_attempts
+
+    def progress(self, stage: str, percent: int = None):
+        self.service.update_progress(self.job_id, stage, percent)
+
+
+class JobService:
+    """
+    Cola de trabajos persistente en MySQL con un pool de hilos trabajadores.
+    Los trabajos se reclaman con SELECT ... FOR UPDATE SKIP LOCKED, se
+    reintentan con espera exponencial y, si un proceso muere, se recuperan
+    cuando caduca su lease.
+
+    MySQL-backed persistent job queue with a pool of worker threads. Jobs are
+    claimed with SELECT ... FOR UPDATE SKIP LOCKED, retried with exponential
+    backoff and recovered once the lease of a crashed process expires.
+    """
+
+    def __init__(self, db_service, workers=4, poll_interval=1.0, lease_timeout=300, retry_backoff=10, queues=None):
+        self.db_service = db_service
+        self.workers = workers
+        # Cada cola tiene sus propios hilos, así un tipo de trabajo lento no deja sin workers a los demás
+        self.queues = {DEFAULT_QUEUE: workers, **(queues or {})}
+        self.poll_interval = poll_interval
+        self.lease_timeout = lease_timeout
+        self.retry_backoff = retry_backoff
+        self.instance_id = f"{socket.gethostname()}-{os.getpid()}-{uuid4().hex[:8]}"
+        self._handlers = {}
+        self._threads = []
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        # Trabajos que este proceso está ejecutando; el heartbeat sólo renueva estos
+        self._running = set()
+
+    def register(self, kind: str, handler, max_attempts: int = 1, done_stage: str = SUCCEEDED,
+                 queue: str = DEFAULT_QUEUE):
+        if queue not in self.queues:
+            raise ValueError(f"Unknown job queue '{queue}'")
+        self._handlers[kind] = (handler, max_attempts, done_stage, queue)
+
+    def enqueue(self, kind: str, payload: dict, userid: int = None, max_attempts: int = None) -> str:
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+        if max_attempts is None:
+            max_attempts = self._handlers[kind][1]
+        job_id = str(uuid4())
+        self.db_service.execute_query(
+            """
+            INSERT INTO jobs (id, kind, userid, payload, max_attempts)
+            VALUES (%s, %s, %s, %s, %s)
+            """,
+            (job_id, kind, userid, json.dumps(payload), max_attempts)
+        )
+        self._wakeup.set()
+        return job_id
+
+    def enqueue_batch(self, kind: str, items, max_attempts: int = None):
+        """
+        Encola varios trabajos con un solo INSERT; `items` son pares
+        (payload, userid). Devuelve el batch_id y los ids de los trabajos.
+
+        Enqueues several jobs with a single INSERT; `items` are (payload,
+        userid) pairs. Returns the batch_id and the job ids.
+        """
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+        if max_attempts is None:
+            max_attempts = self._handlers[kind][1]
+        batch_id = str(uuid4())
+        rows = [(str(uuid4()), kind, userid, batch_id, json.dumps(payload), max_attempts) for payload, userid in items]
+        self.db_service.execute_many(
+            """
+            INSERT INTO jobs (id, kind, userid, batch_id, payload, max_attempts)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            """,
+            rows
+        )
+        self._wakeup.set()
+        return batch_id, [row[0] for row in rows]
+
+    def get_batch(self, batch_id: str):
+        rows = self.db_service.fetch_all(queries.JOBS_BY_BATCH, (batch_id,))
+        return queries.batch_status(batch_id, [queries.job_row_to_dict(row) for row in rows]) if rows else None
+
+    def get_job(self, job_id: str):
+        row = self.db_service.fetch_one(queries.JOB_BY_ID, (job_id,))
+        return queries.job_row_to_dict(row) if row else None
+
+    def update_progress(self, job_id: str, stage: str, percent: int = None):
+        self.db_service.execute_query(
+            """
+            UPDATE jobs
+            SET stage = %s, progress = COALESCE(%s, progress), locked_at = CURRENT_TIMESTAMP
+            WHERE id = %s
+            """,
+            (stage, percent, job_id)
+        )
+
+    def _claim(self, queue=DEFAULT_QUEUE):
+        kinds = [kind for kind, (*_, kind_queue) in self._handlers.items() if kind_queue == queue]
+        if not kinds:
+            return None
+        placeholders = ", ".join(["%s"] * len(kinds))
+        with self.db_service.transaction() as cursor:
+            cursor.execute(
+                f"""
+                SELECT id, kind, payload, attempts, max_attempts
+                FROM jobs
+                WHERE status = %s AND run_after <= CURRENT_TIMESTAMP
+                AND kind IN ({placeholders})
+                ORDER BY run_after, created_at
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+                """,
+                (QUEUED, *kinds)
+            )
+            row = cursor.fetchone()
+            if not row:
+                return None
+            cursor.execute(
+                """
+                UPDATE jobs
+                SET status = %s, stage = %s, attempts = attempts + 1,
+                    locked_by = %s, locked_at = CURRENT_TIMESTAMP
+                WHERE id = %s
+                """,
+                (RUNNING, RUNNING, self.instance_id, row[0])
+            )
+        job_id, kind, payload, attempts, max_attempts = row
+        return job_id, kind, json.loads(payload), attempts + 1, max_attempts
+
+    def _finish(self, job_id, result, stage=SUCCEEDED):
+        self.db_service.execute_query(
+            """
+            UPDATE jobs
+            SET status = %s, stage = %s, progress = 100, result = %s, error = NULL,
+                locked_by = NULL, finished_at = CURRENT_TIMESTAMP
+            WHERE id = %s
+            """,
+            (SUCCEEDED, stage, json.dumps(result, default=str), job_id)
+        )
+
+    def _fail(self, job_id, error, attempt, max_attempts):
+        if attempt < max_attempts:
+            delay = self.retry_backoff * (2 ** (attempt - 1))
+            self.db_service.execute_query(
+                """
+                UPDATE jobs
+                SET status = %s, stage = 'retrying', error = %s, locked_by = NULL,
+                    run_after = CURRENT_TIMESTAMP + INTERVAL %s SECOND
+                WHERE id = %s
+                """,
+                (QUEUED, error, delay, job_id)
+            )
+        else:
+            self.db_service.execute_query(
+                """
+                UPDATE jobs
+                SET status = %s, stage = %s, error = %s, locked_by = NULL,
+                    finished_at = CURRENT_TIMESTAMP
+                WHERE id = %s
+                """,
+                (FAILED, FAILED, error, job_id)
+            )
+
+    def recover_stale(self):
+        """
+        Devuelve a la cola (o marca como fallidos si no quedan intentos) los
+        trabajos cuyo worker dejó de renovar el lease.
+
+        Requeues, or fails when out of attempts, jobs whose worker stopped
+        renewing its lease.
+        """
+        stale = "status = %s AND locked_at < CURRENT_TIMESTAMP - INTERVAL %s SECOND"
+        self.db_service.execute_query(
+            f"""
+            UPDATE jobs
+            SET status = %s, stage = 'recovered', locked_by = NULL
+            WHERE {stale} AND attempts < max_attempts
+            """,
+            (QUEUED, RUNNING, self.lease_timeout)
+        )
+        self.db_service.execute_query(
+            f"""
+            UPDATE jobs
+            SET status = %s, stage = %s, error = 'Worker lost while running the job',
+                locked_by = NULL, finished_at = CURRENT_TIMESTAMP
+            WHERE {stale}
+            """,
+            (FAILED, FAILED, RUNNING, self.lease_timeout)
+        )
+
+    def _run_job(self, job_id, kind, payload, attempt, max_attempts):
+        handler, _, done_stage, _ = self._handlers[kind]
+        context = JobContext(self, job_id, attempt, max_attempts)
+        try:
+            result = handler(payload, context)
+        except Exception as e:
+            logger.error(f"Job {job_id} ({kind}) attempt {attempt}/{max_attempts} failed: {e}")
+            logger.debug(traceback.format_exc())
+            self._fail(job_id, str(e), attempt, max_attempts)
+        else:
+            self._finish(job_id, result, done_stage)
+
+    def _worker(self, queue=DEFAULT_QUEUE):
+        while not self._stop.is_set():
+            try:
+                job = self._claim(queue)
+            except Exception as e:
+                logger.error(f"Error claiming job: {e}")
+                job = None
+            if job:
+                self._running.add(job[0])
+                try:
+                    self._run_job(*job)
+                except Exception as e:
+                    # Si no se pudo guardar el resultado, el lease caduca y recover_stale lo recoge
+                    logger.error(f"Error recording the outcome of job {job[0]}: {e}")
+                finally:
+                    self._running.discard(job[0])
+                continue
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.lease_timeout / 3):
+            try:
+                running = tuple(self._running)
+                if running:
+                    placeholders = ", ".join(["%s"] * len(running))
+                    self.db_service.execute_query(
+                        f"""
+                        UPDATE jobs SET locked_at = CURRENT_TIMESTAMP
+                        WHERE status = %s AND locked_by = %s AND id IN ({placeholders})
+                        """,
+                        (RUNNING, self.instance_id, *running)
+                    )
+                self.recover_stale()
+            except Exception as e:
+                logger.error(f"Job heartbeat failed: {e}")
+
+    def start(self):
+        if self._threads:
+            return
+        self.recover_stale()
+        self._stop.clear()
+        targets = [(self._heartbeat, (), "job-heartbeat")]
+        for queue, workers in self.queues.items():
+            targets += [(self._worker, (queue,), f"job-{queue}-{i}") for i in range(workers)]
+        for target, args, name in targets:
+            thread = threading.Thread(target=target, args=args, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+
+@lru_cache()
+def get_job_service() -> JobService:
+    return JobService(
+        get_db_service(),
+        workers=settings.JOB_WORKERS,
+        poll_interval=settings.JOB_POLL_INTERVAL,
+        lease_timeout=settings.JOB_LEASE_TIMEOUT,
+        retry_backoff=settings.JOB_RETRY_BACKOFF,
+        queues={PROXMOX_QUEUE: settings.PROXMOX_JOB_WORKERS}
+    )
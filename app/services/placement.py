@@ -0,0 +1,188 @@
+import logging
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+
+from app.core.config import get_settings
+from app.services.proxmox_cluster import get_cluster_state
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+# Límites de clonaciones simultáneas por nodo y por storage, compartidos por todo el proceso
+# Per-node and per-storage limits of concurrent clones, shared by the whole process
+_slots = {}
+_slots_lock = threading.Lock()
+
+
+def _slot(key, limit):
+    with _slots_lock:
+        if key not in _slots:
+            _slots[key] = threading.BoundedSemaphore(limit)
+        return _slots[key]
+
+
+def node_slot(node):
+    return _slot(("node", node), settings.PROXMOX_NODE_CONCURRENCY)
+
+
+def storage_slot(node, storage, shared=False):
+    # Un storage compartido es el mismo para todos los nodos
+    return _slot(("storage", storage if shared else f"{node}/{storage}"), settings.PROXMOX_STORAGE_CONCURRENCY)
+
+
+class PlacementError(Exception):
+    pass
+
+
+def least_loaded(node, request):
+    # Más memoria libre y menos CPU en uso tras colocar la VM
+    return node["mem_free_after"] / node["maxmem"] + (1 - node["cpu"])
+
+
+def bin_packing(node, request):
+    # El hueco más ajustado que aún cabe, para dejar nodos enteros libres
+    return -node["mem_free_after"]
+
+
+def template_locality(node, request):
+    # Clonar en el nodo que tiene la plantilla evita copiar el disco por la red
+    return (1 if node["has_template"] else 0) * 10 + least_loaded(node, request)
+
+
+STRATEGIES = {
+    "least-loaded": least_loaded,
+    "bin-packing": bin_packing,
+    "template-locality": template_locality,
+}
+
+
+class PlacementScheduler:
+    """
+    Elige el nodo de una VM nueva a partir de la carga de CPU, la memoria y
+    el espacio en storage de cada nodo, leídos de la caché del clúster. Los
+    nodos que no tienen hueco se descartan y el resto se puntúa con una
+    estrategia de STRATEGIES. Lo ya asignado y aún no visible en el clúster
+    se reserva en memoria para no mandar una ráfaga entera al mismo nodo.
+
+    Picks the node for a new VM from each node's CPU load, memory and
+    storage headroom as read from the cluster cache. Nodes without room are
+    filtered out and the rest are scored by a strategy from STRATEGIES.
+    Placements not yet visible in the cluster are reserved in memory so a
+    burst of requests does not all land on the same node.
+    """
+
+    def __init__(self, cluster_state, strategy="least-loaded", storage="local-lvm", default_node=None):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown placement strategy: {strategy}")
+        self.cluster_state = cluster_state
+        self.strategy = strategy
+        self.storage = storage
+        self.default_node = default_node
+        self._reserved = {}
+        self._lock = threading.Lock()
+
+    def _template_node(self, template_id):
+        """
+        Nodo al que queda atada la VM: el de la plantilla, salvo que sus
+        discos estén en storage compartido.
+
+        Node the VM is tied to: the template's, unless its disks are on
+        shared storage.
+        """
+        template = self.cluster_state.get(template_id) if template_id else None
+        if not template or not template.get("node"):
+            return None
+        try:
+            if self.cluster_state.on_shared_storage(template_id):
+                return None
+        except Exception as e:
+            logger.error(f"Error reading storage of template {template_id}, keeping it on its node: {e}")
+        return template["node"]
+
+    def _candidates(self, template_id, memory, disksize, only_node=None):
+        template = self.cluster_state.get(template_id) if template_id else None
+        memory_bytes = memory * 1024 ** 2
+        disk_bytes = disksize * 1024 ** 3
+        candidates = {}
+        for name, node in self.cluster_state.nodes().items():
+            if only_node and name != only_node:
+                continue
+            if node.get("status") != "online" or not node.get("maxmem"):
+                continue
+            reserved_mem, reserved_disk = self._reserved.get(name, (0, 0))
+            mem_free_after = node["maxmem"] - node["mem"] - reserved_mem - memory_bytes
+            if mem_free_after < 0:
+                continue
+            storage = self.cluster_state.storage(name, self.storage)
+            if storage and storage.get("maxdisk"):
+                if storage["maxdisk"] - storage["disk"] - reserved_disk < disk_bytes:
+                    continue
+            candidates[name] = dict(
+                node,
+                cpu=node.get("cpu") or 0,
+                mem_free_after=mem_free_after,
+                has_template=bool(template and template.get("node") == name)
+            )
+        return candidates
+
+    def choose(self, template_id=None, cores=2, memory=2048, disksize=40, prefer=None):
+        request = {"template_id": template_id, "cores": cores, "memory": memory, "disksize": disksize}
+        if not self.cluster_state.fresh():
+            try:
+                self.cluster_state.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing cluster state for placement: {e}")
+        # Fuera del lock: la primera vez lee la config de la plantilla en Proxmox
+        only_node = self._template_node(template_id)
+        with self._lock:
+            candidates = self._candidates(template_id, memory, disksize, only_node)
+            # Si alguno de los nodos preferidos tiene hueco, sólo se puntúan esos
+            preferred = {name: node for name, node in candidates.items() if prefer and name in prefer}
+            candidates = preferred or candidates
+            if not candidates:
+                if not self.cluster_state.nodes() and self.default_node:
+                    return self.default_node
+                if only_node:
+                    raise PlacementError(
+                        f"Template {template_id} is on local storage and its node {only_node} "
+                        "has no room for this VM"
+                    )
+                raise PlacementError("No node has enough free memory and storage for this VM")
+            score = STRATEGIES[self.strategy]
+            node = max(candidates, key=lambda name: score(candidates[name], request))
+            reserved_mem, reserved_disk = self._reserved.get(node, (0, 0))
+            self._reserved[node] = (reserved_mem + memory * 1024 ** 2, reserved_disk + disksize * 1024 ** 3)
+        logger.info(f"Placing VM from template {template_id} on {node} ({self.strategy})")
+        return node
+
+    def release(self, node, memory=2048, disksize=40):
+        with self._lock:
+            if node not in self._reserved:
+                return
+            reserved_mem, reserved_disk = self._reserved[node]
+            reserved_mem -= memory * 1024 ** 2
+            reserved_disk -= disksize * 1024 ** 3
+            if reserved_mem <= 0 and reserved_disk <= 0:
+                del self._reserved[node]
+            else:
+                self._reserved[node] = (max(reserved_mem, 0), max(reserved_disk, 0))
+
+    @contextmanager
+    def placement(self, template_id=None, cores=2, memory=2048, disksize=40, prefer=None):
+        node = self.choose(template_id, cores, memory, disksize, prefer)
+        try:
+            yield node
+        finally:
+            self.release(node, memory, disksize)
+
+
+@lru_cache()
+def get_placement_scheduler() -> PlacementScheduler:
+    return PlacementScheduler(
+        get_cluster_state(),
+        strategy=settings.PROXMOX_PLACEMENT_STRATEGY,
+        storage=settings.PROXMOX_VM_STORAGE,
+        default_node=settings.PROXMOX_DEFAULT_NODE
+    )
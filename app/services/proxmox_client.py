@@ -0,0 +1,98 @@
+import logging
+import threading
+from functools import lru_cache
+
+from proxmoxer import ProxmoxAPI
+from requests.adapters import HTTPAdapter
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class ProxmoxClient:
+    """
+    Sesión de Proxmox compartida por todo el proceso: hace login una vez,
+    renueva el ticket y el token CSRF antes de que caduquen (2 h en PVE) y
+    reutiliza conexiones HTTP keep-alive a través de un pool dimensionado.
+
+    Process-wide Proxmox session: logs in once, renews the ticket and CSRF
+    token before they expire (2 h on PVE) and reuses keep-alive HTTP
+    connections through a sized connection pool.
+    """
+
+    def __init__(self, host, user, password, verify_ssl=False, timeout=30, pool_maxsize=10, renew_age=3000):
+        self.host = host
+        self.user = user
+        self.password = password
+        self.verify_ssl = verify_ssl
+        self.timeout = timeout
+        self.pool_maxsize = pool_maxsize
+        self.renew_age = renew_age
+        self._api = None
+        self._lock = threading.Lock()
+
+    @property
+    def api(self) -> ProxmoxAPI:
+        if self._api is None:
+            with self._lock:
+                if self._api is None:
+                    self._api = self._login()
+        return self._api
+
+    def _login(self) -> ProxmoxAPI:
+        api = ProxmoxAPI(
+            host=self.host,
+            user=self.user,
+            password=self.password,
+            verify_ssl=self.verify_ssl,
+            timeout=self.timeout
+        )
+        backend = getattr(api, "_backend", None)
+        auth = getattr(backend, "auth", None)
+        if auth is not None and hasattr(auth, "renew_age"):
+            # proxmoxer renueva el ticket en la primera petición que supere esta edad
+            auth.renew_age = self.renew_age
+        session = api._store["session"]
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+        def on_response(response, *args, **kwargs):
+            # Ticket caducado o revocado: la petición falla, la siguiente hace login de nuevo
+            if response.status_code == 401:
+                logger.warning(f"Proxmox answered 401 for {response.request.method} {response.url}, dropping session")
+                self.invalidate(api)
+            return response
+
+        session.hooks.setdefault("response", []).append(on_response)
+        logger.info(f"Logged in to Proxmox at {self.host} as {self.user}")
+        return api
+
+    def invalidate(self, api=None):
+        """
+        Descarta la sesión actual (p. ej. tras un 401) para forzar un login
+        nuevo. Con `api`, sólo si sigue siendo la actual, para no tirar una
+        sesión recién creada por una respuesta antigua.
+
+        Drops the current session (e.g. after a 401) to force a fresh login.
+        With `api`, only if it is still the current one, so a late response
+        does not drop a session that was just created.
+        """
+        with self._lock:
+            if api is None or self._api is api:
+                self._api = None
+
+
+@lru_cache()
+def get_proxmox_client() -> ProxmoxClient:
+    return ProxmoxClient(
+        host=settings.PROXMOX_HOST,
+        user=settings.PROXMOX_USER,
+        password=settings.PROXMOX_PASSWORD,
+        verify_ssl=settings.PROXMOX_VERIFY_SSL,
+        timeout=settings.PROXMOX_TIMEOUT,
+        pool_maxsize=settings.PROXMOX_POOL_MAXSIZE,
+        renew_age=settings.PROXMOX_TICKET_RENEW_AGE
+    )
@@ -0,0 +1,78 @@
+import logging
+from functools import lru_cache
+
+from proxmoxer.core import ResourceException
+
+from app.core.config import get_settings
+from app.models import CloneMode, template_id_for
+from app.services.proxmox_tasks import ProxmoxTaskError, wait_for_task
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+@lru_cache()
+def linked_clone_templates():
+    spec = settings.PROXMOX_LINKED_CLONE_TEMPLATES
+    return frozenset(template_id_for(name.strip()) for name in spec.split(",") if name.strip())
+
+
+def resolve_clone_mode(template_id, requested=None) -> str:
+    """
+    Modo de la petición, si no el configurado para la plantilla y, si no,
+    PROXMOX_CLONE_MODE.
+
+    The request's mode, else the one configured for the template, else
+    PROXMOX_CLONE_MODE.
+    """
+    if requested:
+        return CloneMode(requested).value
+    if template_id in linked_clone_templates():
+        return CloneMode.linked.value
+    return CloneMode(settings.PROXMOX_CLONE_MODE).value
+
+
+def remove_partial_vm(proxmox, node, vm_id, name):
+    # Un clon fallido puede dejar la VM creada a medias con el mismo VMID.
+    # Si el VMID ya era de otra VM (otro nombre), no se toca.
+    vm = proxmox.nodes(node).qemu(vm_id)
+    try:
+        config = vm.config.get()
+    except ResourceException:
+        return
+    if config.get("name") != name:
+        logger.warning(f"VM {vm_id} on {node} is not the failed clone {name}, leaving it in place")
+        return
+    logger.info(f"Removing partial VM {vm_id} on {node}")
+    wait_for_task(proxmox, vm.delete(purge=1))
+
+
+def clone_template(proxmox, cluster_state, template_id, vm_id, node, name, clone_mode, storage=None) -> str:
+    """
+    Clona la plantilla desde su propio nodo hacia `node` y devuelve el modo
+    que se usó de verdad. Un linked clone sólo es posible si el storage de
+    la plantilla admite snapshots (y, fuera de su nodo, es compartido); si
+    Proxmox lo rechaza o la tarea falla, se borra lo que haya quedado y se
+    repite como clon completo en `storage` (PROXMOX_VM_STORAGE por defecto).
+    Un timeout no se reintenta: la tarea puede seguir en marcha.
+
+    Clones the template from its own node onto `node` and returns the mode
+    actually used. A linked clone needs snapshot-capable template storage
+    (shared, when targeting another node); if Proxmox rejects it or the task
+    fails, whatever was left behind is removed and the clone is retried as a
+    full one on `storage` (PROXMOX_VM_STORAGE by default). A timeout is not
+    retried: the task may still be running.
+    """
+    storage = storage or settings.PROXMOX_VM_STORAGE
+    template = cluster_state.get(template_id)
+    source_node = template["node"] if template and template.get("node") else node
+    source = proxmox.nodes(source_node).qemu(template_id)
+    if clone_mode == CloneMode.linked.value:
+        try:
+            wait_for_task(proxmox, source.clone.post(newid=vm_id, target=node, name=name, full=0))
+            return CloneMode.linked.value
+        except (ProxmoxTaskError, ResourceException) as e:
+            logger.warning(f"Linked clone of template {template_id} failed, falling back to a full clone: {e}")
+            remove_partial_vm(proxmox, node, vm_id, name)
+    wait_for_task(proxmox, source.clone.post(newid=vm_id, target=node, name=name, full=1, storage=storage))
+    return CloneMode.full.value
@@ -0,0 +1,152 @@
+import logging
+import re
+import threading
+import time
+from functools import lru_cache
+
+from app.core.config import get_settings
+from app.services.proxmox_client import get_proxmox_client
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Campos de /cluster/resources que se exponen como estado en vivo
+LIVE_FIELDS = ("status", "node", "name", "cpu", "maxcpu", "mem", "maxmem", "uptime", "template")
+NODE_FIELDS = ("status", "cpu", "maxcpu", "mem", "maxmem", "disk", "maxdisk")
+STORAGE_FIELDS = ("status", "disk", "maxdisk", "shared")
+# Claves de la config de una VM que son discos / VM config keys that hold disks
+DISK_KEY = re.compile(r"^(ide|sata|scsi|virtio|efidisk|tpmstate)\d+$")
+
+
+class ClusterStateCache:
+    """
+    Índice en memoria, por vmid, del estado de todas las VMs del clúster,
+    junto con la carga de cada nodo y el espacio de cada storage. Un hilo en
+    segundo plano lo rellena con una sola llamada a /cluster/resources cada
+    pocos segundos, en lugar de un status.current por VM.
+
+    In-memory index, keyed by vmid, of the state of every VM in the
+    cluster, along with each node's load and each storage's free space. A
+    background thread fills it with a single /cluster/resources call every
+    few seconds instead of one status.current call per VM.
+    """
+
+    def __init__(self, proxmox_client, interval=5.0):
+        self.proxmox_client = proxmox_client
+        self.interval = interval
+        self._vms = {}
+        self._nodes = {}
+        self._storage = {}
+        self._template_storages = {}
+        self._refreshed_at = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh(self):
+        vms, nodes, storage = {}, {}, {}
+        for resource in self.proxmox_client.api.cluster.resources.get():
+            kind = resource.get("type")
+            if "vmid" in resource:
+                vms[int(resource["vmid"])] = {field: resource.get(field) for field in LIVE_FIELDS}
+            elif kind == "node":
+                nodes[resource["node"]] = {field: resource.get(field) for field in NODE_FIELDS}
+            elif kind == "storage":
+                storage[(resource["node"], resource["storage"])] = {
+                    field: resource.get(field) for field in STORAGE_FIELDS
+                }
+        with self._lock:
+            self._vms = vms
+            self._nodes = nodes
+            self._storage = storage
+            self._refreshed_at = time.monotonic()
+        return len(vms)
+
+    def fresh(self, max_age=None):
+        max_age = max_age if max_age is not None else self.interval * 3
+        with self._lock:
+            return self._refreshed_at is not None and time.monotonic() - self._refreshed_at <= max_age
+
+    def get(self, vmid):
+        with self._lock:
+            vm = self._vms.get(int(vmid))
+            return dict(vm) if vm else None
+
+    def vmids(self):
+        with self._lock:
+            return set(self._vms)
+
+    def nodes(self):
+        with self._lock:
+            return {name: dict(node) for name, node in self._nodes.items()}
+
+    def storage(self, node, storage):
+        with self._lock:
+            entry = self._storage.get((node, storage))
+            return dict(entry) if entry else None
+
+    def template_storages(self, vmid):
+        """
+        Storages de los discos de una plantilla, leídos de su config la
+        primera vez (las plantillas no cambian de disco).
+
+        Storages holding a template's disks, read from its config the first
+        time (templates do not move their disks).
+        """
+        vmid = int(vmid)
+        with self._lock:
+            cached = self._template_storages.get(vmid)
+        if cached is not None:
+            return cached
+        vm = self.get(vmid)
+        if not vm or not vm.get("node"):
+            return None
+        config = self.proxmox_client.api.nodes(vm["node"]).qemu(vmid).config.get()
+        storages = frozenset(
+            value.split(":", 1)[0] for key, value in config.items()
+            if DISK_KEY.match(key) and isinstance(value, str) and ":" in value and "media=cdrom" not in value
+        )
+        with self._lock:
+            self._template_storages[vmid] = storages
+        return storages
+
+    def on_shared_storage(self, vmid):
+        """
+        True si todos los discos de la plantilla están en storage compartido;
+        sólo entonces Proxmox acepta clonarla en otro nodo (target=).
+
+        True when every disk of the template is on shared storage; only then
+        does Proxmox accept cloning it onto another node (target=).
+        """
+        vm = self.get(vmid)
+        storages = self.template_storages(vmid)
+        if not vm or not storages:
+            return False
+        return all((self.storage(vm["node"], storage) or {}).get("shared") for storage in storages)
+
+    def age(self):
+        with self._lock:
+            return None if self._refreshed_at is None else time.monotonic() - self._refreshed_at
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing Proxmox cluster state: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="proxmox-cluster-state", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+@lru_cache()
+def get_cluster_state() -> ClusterStateCache:
+    return ClusterStateCache(get_proxmox_client(), interval=settings.PROXMOX_CLUSTER_POLL_INTERVAL)
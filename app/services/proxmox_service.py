@@ -1,75 +1,153 @@
-from proxmoxer import ProxmoxAPI
-import time
+import logging
 import re
 from app.core.config import get_settings
-from app.services.db_service import DatabaseService
+from app.services.db_service import get_db_service
+from app.services.proxmox_client import get_proxmox_client
+from app.services.vmid_allocator import get_vmid_allocator
+from app.services.proxmox_cluster import get_cluster_state
+from app.services.placement import get_placement_scheduler, node_slot, storage_slot
+from app.services.warm_pool import get_warm_pool
+from app.services.proxmox_clone import clone_template, remove_partial_vm, resolve_clone_mode
+from app.services.proxmox_tasks import wait_for_task, ProxmoxTaskError
+from app.core.concurrency import BatchWriter, run_concurrently, shared_limit
+from app.services.user_overview import invalidate_user_overview
 import mysql.connector  # Para capturar IntegrityError
 
+logger = logging.getLogger(__name__)
 settings = get_settings()
 
 class ProxmoxService:
     def __init__(self):
         self.settings = settings
         self.proxmox = None
-        self.db_service = DatabaseService(
-            host=settings.DB_HOST,
-            user=settings.DB_USER,
-            password=settings.DB_PASSWORD,
-            database=settings.DB_NAME
-        )
+        self.db_service = get_db_service()
+        self.vmid_allocator = get_vmid_allocator()
+        self.cluster_state = get_cluster_state()
+        self.scheduler = get_placement_scheduler()
+        self.warm_pool = get_warm_pool()
 
     def _connect(self):
-        if not self.proxmox:
-            self.proxmox = ProxmoxAPI(
-                host=self.settings.PROXMOX_HOST,
-                user=self.settings.PROXMOX_USER,
-                password=self.settings.PROXMOX_PASSWORD,
-                verify_ssl=getattr(self.settings, "PROXMOX_VERIFY_SSL", False),
-                timeout=30
-            )
+        # Siempre la sesión actual: el cliente la descarta tras un 401
+        self.proxmox = get_proxmox_client().api
+
+    def resolve_node(self, vm_id, recorded_node=None):
+        """
+        Nodo en el que vive la VM: el del clúster si está en la caché, si no
+        el registrado en proxmox_vms y, en último caso, el nodo por defecto.
+
+        Node the VM lives on: the cluster's view when cached, otherwise the
+        one recorded in proxmox_vms, and the default node as a last resort.
+        """
+        live = self.cluster_state.get(vm_id)
+        if live and live.get("node"):
+            return live["node"]
+        return recorded_node or self.settings.PROXMOX_DEFAULT_NODE
 
     def _sanitize_vm_name(self, vm_name):
         return re.sub(r'[^a-zA-Z0-9-]', '-', vm_name)[:32]
 
-    def clone_vm_atomic(self, userid: int, node: str, template_id: int, vm_name: str, os: str, cores=2, memory=2048, ssh_pub_key=None, max_retries=5):
+    def _configure_vm(self, node, vm_id, vm_name, os, cores, memory, ssh_pub_key):
+        if ssh_pub_key and any(x in os.lower() for x in ["ubuntu", "fedora", "redhat"]):
+            self.proxmox.nodes(node).qemu(vm_id).config.post(
+                sshkeys=ssh_pub_key.replace('\n', '')
+            )
+        self.proxmox.nodes(node).qemu(vm_id).config.post(
+            name=vm_name,
+            memory=memory,
+            cores=cores,
+            sockets=1,
+            net0="virtio,bridge=vmbr0",
+            ostype="l26"
+        )
+
+    def claim_warm_vm(self, userid: int, template_id: int, vm_name: str, os: str, cores=2, memory=2048, ssh_pub_key=None, progress=None, clone_mode=None, **_):
+        """
+        Toma una VM ya clonada del warm pool, la configura y la arranca.
+        Devuelve None si el pool de esa plantilla está vacío o la VM falla.
+
+        Takes an already cloned VM from the warm pool, configures it and
+        starts it. Returns None when the template's pool is empty or the VM
+        fails.
+        """
+        progress = progress or (lambda stage, percent=None: None)
+        safe_vm_name = self._sanitize_vm_name(vm_name)
+        try:
+            warm = self.warm_pool.claim(template_id, userid, safe_vm_name, os, clone_mode)
+        except Exception as e:
+            logger.error(f"Error claiming a warm VM for template {template_id}: {e}")
+            warm = None
+        if not warm:
+            return None
+        self._connect()
+        node, vm_id = warm["node"], warm["vm_id"]
+        try:
+            progress("configuring", 60)
+            self._configure_vm(node, vm_id, safe_vm_name, os, cores, memory, ssh_pub_key)
+            progress("starting", 80)
+            wait_for_task(self.proxmox, self.proxmox.nodes(node).qemu(vm_id).status.start.post())
+        except Exception as e:
+            logger.error(f"Warm VM {vm_id} on {node} failed, falling back to a clone: {e}")
+            self.db_service.delete_vm_by_id(vm_id)
+            self.warm_pool.destroy(node, vm_id)
+            return None
+        return {
+            "status": "success",
+            "vm_id": vm_id,
+            "vm_name": safe_vm_name,
+            "node": node,
+            "clone_mode": warm["clone_mode"],
+            "message": "VM taken from the warm pool and started successfully"
+        }
+
+    def clone_vm_atomic(self, userid: int, node: str, template_id: int, vm_name: str, os: str, cores=2, memory=2048, ssh_pub_key=None, max_retries=5, progress=None, use_warm_pool=True, clone_mode=None, vm_id=None):
+        progress = progress or (lambda stage, percent=None: None)
+        if use_warm_pool:
+            result = self.claim_warm_vm(userid, template_id, vm_name, os, cores, memory, ssh_pub_key, progress, clone_mode)
+            if result:
+                return result
         self._connect()
         safe_vm_name = self._sanitize_vm_name(vm_name)
+        clone_mode = resolve_clone_mode(template_id, clone_mode)
+        # Un VMID ya reservado (p. ej. en un lote) se usa en el primer intento
+        reserved, vm_id = vm_id, None
         attempt = 0
         while attempt < max_retries:
             attempt += 1
-            vm_id = self.get_free_vmid(node=node)
-            try:
-                self.db_service.log_proxmox_vm_creation(userid, vm_id, safe_vm_name, os)
-            except mysql.connector.errors.IntegrityError:
-                continue
+            if reserved is not None:
+                vm_id, reserved = reserved, None
+                self.db_service.set_vm_placement(vm_id, node, clone_mode)
+            else:
+                vm_id = self.vmid_allocator.allocate()
+                try:
+                    self.db_service.log_proxmox_vm_creation(userid, vm_id, safe_vm_name, os, node, clone_mode)
+                except mysql.connector.errors.IntegrityError:
+                    self.vmid_allocator.discard(vm_id)
+                    continue
+                except Exception:
+                    self.vmid_allocator.discard(vm_id)
+                    raise
+                self.vmid_allocator.confirm(vm_id)
             try:
-                self.proxmox.nodes(node).qemu(template_id).clone.post(
-                    newid=vm_id,
-                    target=node,
-                    name=safe_vm_name
+                progress("cloning", 10)
+                used_mode = clone_template(
+                    self.proxmox, self.cluster_state, template_id, vm_id, node, safe_vm_name, clone_mode
                 )
-                if ssh_pub_key and any(x in os.lower() for x in ["ubuntu", "fedora", "redhat"]):
-                    self.proxmox.nodes(node).qemu(vm_id).config.post(
-                        sshkeys=ssh_pub_key.replace('\n', '')
-                    )
-                self._wait_for_vm_ready(node, vm_id)
-                self.proxmox.nodes(node).qemu(vm_id).config.post(
-                    name=safe_vm_name,
-                    memory=memory,
-                    cores=cores,
-                    sockets=1,
-                    net0="virtio,bridge=vmbr0",
-                    ostype="l26"
-                )
-                self.proxmox.nodes(node).qemu(vm_id).status.start.post()
+                if used_mode != clone_mode:
+                    self.db_service.set_vm_placement(vm_id, node, used_mode)
+                progress("configuring", 60)
+                self._configure_vm(node, vm_id, safe_vm_name, os, cores, memory, ssh_pub_key)
+                progress("starting", 80)
+                wait_for_task(self.proxmox, self.proxmox.nodes(node).qemu(vm_id).status.start.post())
                 return {
                     "status": "success",
                     "vm_id": vm_id,
                     "vm_name": safe_vm_name,
+                    "node": node,
+                    "clone_mode": used_mode,
                     "message": "VM cloned and started successfully"
                 }
             except Exception as e:
-                self.db_service.delete_vm_by_id(vm_id)
+                self._discard_failed_vm(node, vm_id, safe_vm_name)
                 if attempt >= max_retries:
                     return {
                         "status": "error",
@@ -80,53 +158,153 @@ class ProxmoxService:
             "message": "Could not allocate a unique VMID after several attempts"
         }
 
-    def _wait_for_vm_ready(self, node, vm_id, max_attempts=12):
-        self._connect()
-        attempts = 0
-        while attempts < max_attempts:
+    def reserve_batch(self, specs, max_retries=3):
+        """
+        Reserva los VMIDs de un lote de una vez: allocate_many en memoria y
+        un único INSERT de todas las filas en proxmox_vms.
+
+        Reserves a batch's VMIDs in one go: allocate_many in memory and a
+        single INSERT of every row into proxmox_vms.
+        """
+        for _ in range(max_retries):
+            vm_ids = self.vmid_allocator.allocate_many(len(specs))
+            rows = [
+                (
+                    spec["userid"], vm_id, self._sanitize_vm_name(spec["vm_name"]), spec["os"], None,
+                    resolve_clone_mode(spec["template_id"], spec.get("clone_mode"))
+                )
+                for spec, vm_id in zip(specs, vm_ids)
+            ]
             try:
-                status = self.proxmox.nodes(node).qemu(vm_id).status.current.get()
-                if status['status'] in ['stopped', 'running']:
-                    return True
+                self.db_service.reserve_vms(rows)
+            except mysql.connector.errors.IntegrityError:
+                for vm_id in vm_ids:
+                    self.vmid_allocator.discard(vm_id)
+                self.vmid_allocator.resync()
+                continue
             except Exception:
-                pass
-            attempts += 1
-            time.sleep(5)
-        return False
+                for vm_id in vm_ids:
+                    self.vmid_allocator.discard(vm_id)
+                raise
+            for vm_id in vm_ids:
+                self.vmid_allocator.confirm(vm_id)
+            invalidate_user_overview(*{spec["userid"] for spec in specs})
+            return vm_ids
+        raise Exception("Could not reserve unique VMIDs for the batch")
+
+    def _discard_failed_vm(self, node, vm_id, name):
+        """
+        Deshace un intento fallido: borra la VM `name` que haya quedado en
+        `node` y la fila de proxmox_vms. El VMID no vuelve a la lista libre (la VM o
+        su tarea de clonado pueden seguir ahí); la próxima resync lo
+        recupera si de verdad quedó libre.
+
+        Rolls back a failed attempt: removes the VM `name` left on `node`
+        and the proxmox_vms row. The VMID does not go back to the free list (the VM
+        or its clone task may still be there); the next resync reclaims it
+        if it really is free.
+        """
+        try:
+            remove_partial_vm(self.proxmox, node, vm_id, name)
+        except Exception as e:
+            logger.error(f"Error removing failed VM {vm_id} on {node}: {e}")
+        self.db_service.delete_vm_by_id(vm_id)
+        self.vmid_allocator.discard(vm_id)
+
+    def release_batch(self, vm_ids):
+        self.db_service.delete_vms_by_id(vm_ids)
+        for vm_id in vm_ids:
+            self.vmid_allocator.release(vm_id)
+
+    def _clone_slots(self, node):
+        storage = self.cluster_state.storage(node, self.settings.PROXMOX_VM_STORAGE)
+        return node_slot(node), storage_slot(node, self.settings.PROXMOX_VM_STORAGE, bool(storage and storage.get("shared")))
 
-    def control_vm(self, vm_id, action, node="jormundongor"):
+    def run_provision_job(self, payload, job):
+        try:
+            return self._provision(payload, job)
+        except Exception:
+            # La fila reservada para el lote no debe quedarse en proxmox_vms; el
+            # VMID se descarta en vez de liberarse por si se llegó a clonar
+            if payload.get("vm_id"):
+                try:
+                    self.db_service.delete_vm_by_id(payload["vm_id"])
+                    self.vmid_allocator.discard(payload["vm_id"])
+                except Exception as e:
+                    logger.error(f"Error releasing reserved VMID {payload['vm_id']}: {e}")
+            raise
+        finally:
+            invalidate_user_overview(payload["userid"])
+
+    def _provision(self, payload, job):
+        job.progress("queued", 0)
+        result = self.claim_warm_vm(progress=job.progress, **payload)
+        if result:
+            if payload.get("vm_id"):
+                # El VMID reservado para el lote ya no hace falta
+                self.release_batch([payload["vm_id"]])
+            return result
+        payload = dict(payload, use_warm_pool=False)
+        if payload.get("node"):
+            node_limit, storage_limit = self._clone_slots(payload["node"])
+            with node_limit, storage_limit:
+                result = self.clone_vm_atomic(progress=job.progress, **payload)
+        else:
+            job.progress("placing", 5)
+            # Un linked clone tiene que quedarse junto a la plantilla
+            template = self.cluster_state.get(payload["template_id"])
+            linked = resolve_clone_mode(payload["template_id"], payload.get("clone_mode")) == "linked"
+            prefer = {template["node"]} if linked and template and template.get("node") else None
+            with self.scheduler.placement(
+                payload["template_id"], payload.get("cores", 2), payload.get("memory", 2048), prefer=prefer
+            ) as node:
+                node_limit, storage_limit = self._clone_slots(node)
+                with node_limit, storage_limit:
+                    result = self.clone_vm_atomic(progress=job.progress, **dict(payload, node=node))
+        if result["status"] != "success":
+            raise Exception(result["message"])
+        return result
+
+    def _apply_vm_action(self, node, vm_id, action):
+        """
+        Ejecuta la acción en Proxmox y devuelve el nuevo status de
+        proxmox_vms, sin tocar la base de datos.
+
+        Runs the action on Proxmox and returns the new proxmox_vms status,
+        without touching the database.
+        """
+        vm = self.proxmox.nodes(node).qemu(vm_id)
+        if action == "encender":
+            wait_for_task(self.proxmox, vm.status.start.post())
+            return "enabled"
+        if action == "apagar":
+            wait_for_task(self.proxmox, vm.status.stop.post())
+            return "disabled"
+        if action == "pausar":
+            wait_for_task(self.proxmox, vm.status.suspend.post())
+            return "disabled"
+        if action == "eliminar":
+            status_info = vm.status.current.get()
+            if status_info["status"] == "running":
+                try:
+                    wait_for_task(self.proxmox, vm.status.stop.post())
+                except (ProxmoxTaskError, TimeoutError) as e:
+                    raise Exception(f"Failed to stop VM before deletion: {str(e)}")
+            wait_for_task(self.proxmox, vm.delete())
+            return "disabled"
+        raise ValueError(f"Invalid action: {action}")
+
+    def control_vm(self, vm_id, action, node=None):
         self._connect()
         try:
-            if action == "encender":
-                self.proxmox.nodes(node).qemu(vm_id).status.start.post()
-                status = "enabled"
-            elif action == "apagar":
-                self.proxmox.nodes(node).qemu(vm_id).status.stop.post()
-                status = "disabled"
-            elif action == "pausar":
-                self.proxmox.nodes(node).qemu(vm_id).status.suspend.post()
-                status = "disabled"
-            elif action == "eliminar":
-                status_info = self.proxmox.nodes(node).qemu(vm_id).status.current.get()
-                if status_info["status"] == "running":
-                    self.proxmox.nodes(node).qemu(vm_id).status.stop.post()
-                    for _ in range(12):
-                        time.sleep(5)
-                        status_info = self.proxmox.nodes(node).qemu(vm_id).status.current.get()
-                        if status_info["status"] == "stopped":
-                            break
-                    else:
-                        return {
-                            "status": "error",
-                            "message": "Failed to stop VM before deletion."
-                        }
-                self.proxmox.nodes(node).qemu(vm_id).delete()
+            recorded_node, owner = self.db_service.get_vm_target(vm_id)
+            node = node or self.resolve_node(vm_id, recorded_node)
+            status = self._apply_vm_action(node, vm_id, action)
+            if action == "eliminar":
                 self.db_service.delete_vm_by_id(vm_id)
-                status = "disabled"
             else:
-                raise ValueError(f"Invalid action: {action}")
-            if action != "eliminar":
                 self.db_service.update_proxmox_vm_status(vm_id, status)
+            invalidate_user_overview(owner)
             return {
                 "status": "success",
                 "vm_id": vm_id,
@@ -139,17 +317,53 @@ class ProxmoxService:
                 "message": f"Error controlling VM: {str(e)}"
             }
 
-    def get_free_vmid(self, node="jormundongor", start=1000, end=9999):
+    def control_vms(self, vm_ids, action):
+        """
+        Aplica una acción a varias VMs: una sola consulta para resolver sus
+        nodos y acciones en paralelo, como mucho PROXMOX_CONTROL_CONCURRENCY
+        en todo el proceso. Las VMs terminadas se actualizan o se borran de
+        proxmox_vms en un único UPDATE o DELETE por tanda (BatchWriter),
+        aunque el cliente se desconecte. Va devolviendo el resultado de cada
+        VM.
+
+        Applies an action to several VMs: a single query to resolve their
+        nodes and actions run concurrently, at most
+        PROXMOX_CONTROL_CONCURRENCY across the whole process. Finished VMs
+        are updated in or deleted from proxmox_vms with a single UPDATE or
+        DELETE per round (BatchWriter), even if the client disconnects.
+        Yields each VM's result as it finishes.
+        """
         self._connect()
-        vms = self.proxmox.nodes(node).qemu.get()
-        used_ids_proxmox = {int(vm['vmid']) for vm in vms if 'vmid' in vm}
-        query = "SELECT vm_id FROM proxmox_vms"
-        used_ids_db = {row[0] for row in self.db_service.fetch_all(query)}
-        used_ids = used_ids_proxmox | used_ids_db
-        for vmid in range(start, end):
-            if vmid not in used_ids:
-                return vmid
-        raise Exception("No free VMID available")
+        recorded = self.db_service.get_vm_targets(vm_ids)
+        for vm_id in vm_ids:
+            if vm_id not in recorded:
+                yield {"id": vm_id, "status": "error", "message": "VM not found"}
+        targets = {vm_id: self.resolve_node(vm_id, node) for vm_id, (node, _) in recorded.items()}
+
+        def write(status, done):
+            if action == "eliminar":
+                self.db_service.delete_vms_by_id(done)
+            else:
+                self.db_service.set_proxmox_vms_status(done, status)
+            invalidate_user_overview(*{recorded[vm_id][1] for vm_id in done})
+
+        writer = BatchWriter(write, self.settings.BULK_CONTROL_FLUSH_INTERVAL, name="vm-control-writer")
+        for vm_id, _, error in run_concurrently(
+            targets,
+            lambda vm_id: self._apply_vm_action(targets[vm_id], vm_id, action),
+            workers=self.settings.PROXMOX_CONTROL_CONCURRENCY,
+            name="vm-control",
+            limit=shared_limit("proxmox-control", self.settings.PROXMOX_CONTROL_CONCURRENCY),
+            on_result=lambda vm_id, status, error: error or writer.add(status, vm_id),
+            on_done=writer.close
+        ):
+            if error:
+                yield {"id": vm_id, "status": "error", "message": str(error)}
+            else:
+                yield {"id": vm_id, "status": "success", "action": action}
+
+    def get_free_vmid(self, node=None, start=1000, end=9999):
+        return self.vmid_allocator.allocate()
 
     def delete_vm_by_id(self, vm_id):
         query = "DELETE FROM proxmox_vms WHERE vm_id = %s"
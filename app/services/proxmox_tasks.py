@@ -0,0 +1,67 @@
+import random
+import time
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+
+class ProxmoxTaskError(Exception):
+    def __init__(self, upid, exitstatus, log):
+        self.upid = upid
+        self.exitstatus = exitstatus
+        self.log = log
+        tail = " | ".join(log[-5:])
+        super().__init__(f"Proxmox task {upid} failed: {exitstatus} ({tail})")
+
+
+def node_from_upid(upid: str) -> str:
+    # UPID:{node}:{pid}:{pstart}:{starttime}:{type}:{id}:{user}:
+    return upid.split(":")[1]
+
+
+def get_task_log(proxmox, upid: str, node: str = None, limit: int = 50):
+    node = node or node_from_upid(upid)
+    lines = proxmox.nodes(node).tasks(upid).log.get(limit=limit)
+    return [line.get("t", "") for line in lines]
+
+
+def wait_for_task(proxmox, upid: str, node: str = None, timeout: float = None,
+                  initial_delay: float = None, max_delay: float = None, raise_on_error: bool = True):
+    """
+    Espera a que termine una tarea de Proxmox consultando
+    /nodes/{node}/tasks/{upid}/status con espera exponencial y jitter.
+    Devuelve el estado de salida y las líneas del log de la tarea.
+
+    Waits for a Proxmox task to finish by polling
+    /nodes/{node}/tasks/{upid}/status with exponential backoff and jitter.
+    Returns the exit status and the task log lines.
+    """
+    node = node or node_from_upid(upid)
+    timeout = settings.PROXMOX_TASK_TIMEOUT if timeout is None else timeout
+    delay = settings.PROXMOX_TASK_INITIAL_DELAY if initial_delay is None else initial_delay
+    max_delay = settings.PROXMOX_TASK_MAX_DELAY if max_delay is None else max_delay
+    started = time.monotonic()
+    deadline = started + timeout
+    task = proxmox.nodes(node).tasks(upid)
+    while True:
+        status = task.status.get()
+        if status.get("status") == "stopped":
+            break
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"Proxmox task {upid} still running after {timeout}s")
+        # Equal jitter: la mitad fija y la otra mitad aleatoria
+        time.sleep(min(remaining, delay / 2 + random.uniform(0, delay / 2)))
+        delay = min(max_delay, delay * 2)
+    exitstatus = status.get("exitstatus")
+    log = get_task_log(proxmox, upid, node)
+    if raise_on_error and exitstatus != "OK":
+        raise ProxmoxTaskError(upid, exitstatus, log)
+    return {
+        "upid": upid,
+        "node": node,
+        "exitstatus": exitstatus,
+        "duration": round(time.monotonic() - started, 3),
+        "log": log
+    }
@@ -0,0 +1,246 @@
+# SQL compartido entre DatabaseService y AsyncDatabaseService
+# SQL shared by DatabaseService and AsyncDatabaseService
+import json
+
+from app.core.config import get_settings
+
+settings = get_settings()
+
+# Las URLs se construyen en Python a partir del dominio, no con CONCAT en SQL
+WEBSITE_URL = "http://{}." + settings.SERVICE_DOMAIN
+FILEBROWSER_URL = "http://fb-{}." + settings.SERVICE_DOMAIN
+
+CREATE_USER = """
+INSERT INTO users (userid, username)
+VALUES (%s, %s)
+"""
+
+USER_BY_USERID = """
+SELECT userid, username, created_at
+FROM users
+WHERE userid = %s
+"""
+
+USER_BY_USERID_OR_USERNAME = """
+SELECT userid, username
+FROM users
+WHERE userid = %s OR username = %s
+"""
+
+SERVICES_BY_USERID = """
+SELECT ds.id, ds.webname, wt.name as webtype, ds.status
+FROM docker_services ds
+JOIN webtypes wt ON ds.webtype_id = wt.id
+WHERE ds.userid = %s
+"""
+
+VMS_BY_USERID = """
+SELECT id, vm_id, vm_name, os, status, node, clone_mode
+FROM proxmox_vms
+WHERE userid = %s
+"""
+
+INSERT_PROXMOX_VM = """
+INSERT INTO proxmox_vms (userid, vm_id, vm_name, os, status, node, clone_mode)
+VALUES (%s, %s, %s, %s, 'enabled', %s, %s)
+"""
+
+VM_TARGET_BY_ID = """
+SELECT node, userid FROM proxmox_vms WHERE vm_id = %s
+"""
+
+WEBTYPE_ID_BY_NAME = """
+SELECT id FROM webtypes WHERE name = %s
+"""
+
+DOCKER_SERVICE_BY_USER_AND_NAME = """
+SELECT id, webtype_id, status
+FROM docker_services
+WHERE userid = %s AND webname = %s
+"""
+
+API_KEY_BY_KEY = """
+SELECT id, userid, enabled, expires_at
+FROM api_keys
+WHERE api_key = %s
+"""
+
+JOB_COLUMNS = """
+id, kind, userid, status, stage, progress, result, error,
+attempts, max_attempts, created_at, updated_at, finished_at, batch_id
+"""
+
+JOB_BY_ID = f"""
+SELECT {JOB_COLUMNS}
+FROM jobs
+WHERE id = %s
+"""
+
+JOBS_BY_USERID = f"""
+SELECT {JOB_COLUMNS}
+FROM jobs
+WHERE userid = %s
+ORDER BY created_at DESC
+LIMIT %s
+"""
+
+JOBS_BY_BATCH = f"""
+SELECT {JOB_COLUMNS}
+FROM jobs
+WHERE batch_id = %s
+ORDER BY created_at, id
+"""
+
+
+def _page_query(select, id_column, after, limit, filters):
+    # Paginación por clave: WHERE id > cursor ORDER BY id, nunca OFFSET
+    where, params = [f"{id_column} > %s"], [after]
+    for clause, value in filters:
+        if value is not None:
+            where.append(clause)
+            params.append(value)
+    query = f"{select}\nWHERE {' AND '.join(where)}\nORDER BY {id_column}\nLIMIT %s"
+    return query, (*params, limit + 1)
+
+
+def services_page_query(after=0, limit=50, status=None, webtype=None, userid=None):
+    return _page_query(
+        """
+SELECT ds.id, ds.userid, ds.webname, wt.name, ds.status, ds.created_at
+FROM docker_services ds
+JOIN webtypes wt ON wt.id = ds.webtype_id""",
+        "ds.id",
+        after,
+        limit,
+        [
+            ("ds.status = %s", status),
+            ("ds.webtype_id = (SELECT id FROM webtypes WHERE name = %s)", webtype),
+            ("ds.userid = %s", userid),
+        ]
+    )
+
+
+def vms_page_query(after=0, limit=50, status=None, os=None, userid=None):
+    return _page_query(
+        """
+SELECT id, vm_id, userid, vm_name, os, status, node, clone_mode, created_at
+FROM proxmox_vms""",
+        "id",
+        after,
+        limit,
+        [
+            ("status = %s", status),
+            ("os = %s", os),
+            ("userid = %s", userid),
+        ]
+    )
+
+
+def page_from_rows(rows, limit, to_dict):
+    items = [to_dict(row) for row in rows[:limit]]
+    return {
+        "items": items,
+        "next_cursor": rows[limit - 1][0] if len(rows) > limit else None
+    }
+
+
+def service_list_row_to_dict(service):
+    return {
+        "id": service[0],
+        "userid": service[1],
+        "webname": service[2],
+        "webtype": service[3],
+        "status": service[4],
+        "created_at": service[5],
+        "urls": {
+            "website": WEBSITE_URL.format(service[2]),
+            "filebrowser": FILEBROWSER_URL.format(service[2])
+        }
+    }
+
+
+def vm_list_row_to_dict(vm):
+    return {
+        "id": vm[0],
+        "vm_id": vm[1],
+        "userid": vm[2],
+        "vm_name": vm[3],
+        "os": vm[4],
+        "status": vm[5],
+        "node": vm[6],
+        "clone_mode": vm[7],
+        "created_at": vm[8]
+    }
+
+
+def service_rows_to_dicts(services):
+    result = []
+    for service in services:
+        result.append({
+            "id": service[0],
+            "webname": service[1],
+            "webtype": service[2],
+            "status": service[3],
+            "urls": {
+                "website": WEBSITE_URL.format(service[1]),
+                "filebrowser": FILEBROWSER_URL.format(service[1])
+            }
+        })
+    return result
+
+
+def vm_rows_to_dicts(vms):
+    result = []
+    for vm in vms:
+        result.append({
+            "id": vm[0],
+            "vm_id": vm[1],
+            "vm_name": vm[2],
+            "os": vm[3],
+            "status": vm[4],
+            "node": vm[5],
+            "clone_mode": vm[6]
+        })
+    return result
+
+
+def overview_to_dict(user, services, vms):
+    return {
+        "userid": user[0],
+        "username": user[1],
+        "created_at": user[2],
+        "services": service_rows_to_dicts(services),
+        "vms": vm_rows_to_dicts(vms)
+    }
+
+
+def job_row_to_dict(job):
+    return {
+        "job_id": job[0],
+        "kind": job[1],
+        "userid": job[2],
+        "status": job[3],
+        "stage": job[4],
+        "progress": job[5],
+        "result": json.loads(job[6]) if job[6] else None,
+        "error": job[7],
+        "attempts": job[8],
+        "max_attempts": job[9],
+        "created_at": job[10],
+        "updated_at": job[11],
+        "finished_at": job[12],
+        "batch_id": job[13]
+    }
+
+
+def batch_status(batch_id, jobs):
+    counts = {}
+    for job in jobs:
+        counts[job["status"]] = counts.get(job["status"], 0) + 1
+    return {
+        "batch_id": batch_id,
+        "total": len(jobs),
+        "counts": counts,
+        "done": all(job["status"] in ("succeeded", "failed") for job in jobs),
+        "jobs": jobs
+    }
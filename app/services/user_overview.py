@@ -0,0 +1,48 @@
+from app.core.cache import TTLCache
+from app.core.config import get_settings
+from app.services.async_db_service import get_async_db_service
+from app.services.docker_reconciler import get_docker_reconciler
+from app.services.proxmox_cluster import get_cluster_state
+
+settings = get_settings()
+
+# Vista de usuario leída de MySQL, por userid. Se invalida al crear,
+# controlar o borrar servicios y VMs; el estado en vivo se superpone en
+# cada lectura, así que no caduca con él.
+# Per-userid overview read from MySQL. It is invalidated on create, control
+# and delete; live status is overlaid on every read, so it does not go stale
+# with it.
+overview_cache = TTLCache(
+    maxsize=settings.USER_OVERVIEW_CACHE_SIZE,
+    ttl=settings.USER_OVERVIEW_CACHE_TTL
+)
+
+
+def invalidate_user_overview(*userids):
+    for userid in userids:
+        if userid is not None:
+            overview_cache.pop(int(userid))
+
+
+def _with_live_status(overview):
+    docker_reconciler = get_docker_reconciler()
+    cluster_state = get_cluster_state()
+    services = []
+    for service in overview["services"]:
+        live = docker_reconciler.live_status(overview["userid"], service["webname"])
+        if live and service["status"] != "deleted":
+            service = dict(service, status=live["status"])
+        services.append(service)
+    vms = [dict(vm, live=cluster_state.get(vm["vm_id"])) for vm in overview["vms"]]
+    return dict(overview, services=services, vms=vms)
+
+
+async def get_user_overview(userid: int):
+    userid = int(userid)
+    overview = overview_cache.get(userid)
+    if overview is None:
+        overview = await get_async_db_service().get_user_overview(userid)
+        if overview is None:
+            return None
+        overview_cache.set(userid, overview)
+    return _with_live_status(overview)
@@ -0,0 +1,187 @@
+import bisect
+import logging
+import threading
+import time
+from functools import lru_cache
+
+from app.core.config import get_settings
+from app.services.db_service import get_db_service
+from app.services.proxmox_client import get_proxmox_client
+from app.services.proxmox_cluster import get_cluster_state
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class VmidAllocator:
+    """
+    Reparte VMIDs desde un conjunto de intervalos libres en memoria. El
+    conjunto se resincroniza con /cluster/nextid, /cluster/resources (o su
+    copia en memoria, si está al día), proxmox_vms y warm_vms; la reserva
+    atómica la hace el INSERT en proxmox_vms (UNIQUE vm_id), así que
+    asignar cuesta O(1) y un solo viaje a MySQL.
+
+    Hands out VMIDs from an in-memory set of free intervals. The set is
+    resynced from /cluster/nextid, /cluster/resources (or its in-memory
+    copy, when fresh), proxmox_vms and warm_vms; the atomic claim is the
+    INSERT into proxmox_vms (UNIQUE vm_id), so an allocation costs O(1)
+    plus a single MySQL round trip.
+    """
+
+    def __init__(self, db_service, proxmox_client, start=1000, end=9999, resync_interval=300, cluster_state=None):
+        self.db_service = db_service
+        self.proxmox_client = proxmox_client
+        self.cluster_state = cluster_state
+        self.start = start
+        self.end = end
+        self.resync_interval = resync_interval
+        # Intervalos libres [lo, hi] (inclusivos), ordenados y sin solapes.
+        # Los anteriores a _head ya se agotaron; se compactan de vez en cuando.
+        self._starts = []
+        self._ends = []
+        self._head = 0
+        self._pending = set()
+        self._synced_at = None
+        self._lock = threading.Lock()
+
+    def _used_vmids(self):
+        api = self.proxmox_client.api
+        if self.cluster_state is not None and self.cluster_state.fresh():
+            used = self.cluster_state.vmids()
+        else:
+            used = {int(vm["vmid"]) for vm in api.cluster.resources.get(type="vm") if "vmid" in vm}
+        # Los VMIDs del warm pool se reservan en warm_vms, no en proxmox_vms
+        rows = self.db_service.fetch_all(
+            """
+            SELECT vm_id FROM proxmox_vms WHERE vm_id BETWEEN %s AND %s
+            UNION
+            SELECT vm_id FROM warm_vms WHERE vm_id BETWEEN %s AND %s
+            """,
+            (self.start, self.end, self.start, self.end)
+        )
+        used.update(row[0] for row in rows)
+        # Todo lo que está por debajo de nextid ya está ocupado en el clúster
+        floor = max(self.start, int(api.cluster.nextid.get()))
+        return used, floor
+
+    def resync(self):
+        with self._lock:
+            self._resync()
+
+    def _resync(self):
+        used, floor = self._used_vmids()
+        used |= self._pending
+        starts, ends = [], []
+        lo = floor
+        for vmid in sorted(v for v in used if floor <= v <= self.end):
+            if vmid > lo:
+                starts.append(lo)
+                ends.append(vmid - 1)
+            lo = vmid + 1
+        if lo <= self.end:
+            starts.append(lo)
+            ends.append(self.end)
+        self._starts, self._ends, self._head = starts, ends, 0
+        self._synced_at = time.monotonic()
+        logger.info(f"VMID allocator resynced: {sum(e - s + 1 for s, e in zip(starts, ends))} free ids")
+
+    def _has_free(self):
+        return self._head < len(self._starts)
+
+    def _take(self):
+        if not self._has_free():
+            raise Exception("No free VMID available")
+        vmid = self._starts[self._head]
+        if vmid == self._ends[self._head]:
+            self._head += 1
+            if self._head >= 1024 and self._head * 2 >= len(self._starts):
+                del self._starts[:self._head]
+                del self._ends[:self._head]
+                self._head = 0
+        else:
+            self._starts[self._head] = vmid + 1
+        self._pending.add(vmid)
+        return vmid
+
+    def _stale(self):
+        return (
+            self._synced_at is None
+            or not self._has_free()
+            or time.monotonic() - self._synced_at > self.resync_interval
+        )
+
+    def allocate(self) -> int:
+        with self._lock:
+            if self._stale():
+                self._resync()
+            return self._take()
+
+    def allocate_many(self, count: int):
+        with self._lock:
+            if self._stale():
+                self._resync()
+            vmids = []
+            try:
+                for _ in range(count):
+                    vmids.append(self._take())
+            except Exception:
+                for vmid in vmids:
+                    self._release(vmid)
+                raise
+            return vmids
+
+    def confirm(self, vmid: int):
+        """
+        El VMID ya está registrado en proxmox_vms: deja de estar pendiente.
+
+        The VMID is now recorded in proxmox_vms, so it is no longer pending.
+        """
+        with self._lock:
+            self._pending.discard(vmid)
+
+    def discard(self, vmid: int):
+        """
+        El VMID resultó estar ocupado: se olvida hasta la próxima resync.
+
+        The VMID turned out to be taken: forget it until the next resync.
+        """
+        with self._lock:
+            self._pending.discard(vmid)
+
+    def release(self, vmid: int):
+        with self._lock:
+            self._release(vmid)
+
+    def _release(self, vmid):
+        self._pending.discard(vmid)
+        if not self.start <= vmid <= self.end:
+            return
+        head = self._head
+        i = bisect.bisect_right(self._starts, vmid, head)
+        if i > head and self._ends[i - 1] >= vmid:
+            return
+        merge_left = i > head and self._ends[i - 1] == vmid - 1
+        merge_right = i < len(self._starts) and self._starts[i] == vmid + 1
+        if merge_left and merge_right:
+            self._ends[i - 1] = self._ends[i]
+            del self._starts[i]
+            del self._ends[i]
+        elif merge_left:
+            self._ends[i - 1] = vmid
+        elif merge_right:
+            self._starts[i] = vmid
+        else:
+            self._starts.insert(i, vmid)
+            self._ends.insert(i, vmid)
+
+
+@lru_cache()
+def get_vmid_allocator() -> VmidAllocator:
+    return VmidAllocator(
+        get_db_service(),
+        get_proxmox_client(),
+        start=settings.VMID_RANGE_START,
+        end=settings.VMID_RANGE_END,
+        resync_interval=settings.VMID_RESYNC_INTERVAL,
+        cluster_state=get_cluster_state()
+    )
@@ -0,0 +1,214 @@
+import logging
+import threading
+from functools import lru_cache
+
+import mysql.connector
+
+from app.core.config import get_settings
+from app.models import template_id_for
+from app.services import queries
+from app.services.db_service import get_db_service
+from app.services.proxmox_client import get_proxmox_client
+from app.services.proxmox_cluster import get_cluster_state
+from app.services.placement import get_placement_scheduler, node_slot
+from app.services.proxmox_tasks import wait_for_task
+from app.services.proxmox_clone import clone_template, resolve_clone_mode
+from app.services.vmid_allocator import get_vmid_allocator
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+# Sólo un proceso rellena el pool a la vez
+REFILL_LOCK = "cloudfaster_warm_pool_refill"
+
+
+def parse_pool_sizes(spec):
+    """
+    "WINDOWS_11=2,WINDOWS_SERVER_2022=1" -> {template_id: tamaño/size}
+    """
+    sizes = {}
+    for item in filter(None, (part.strip() for part in (spec or "").split(","))):
+        name, _, count = item.partition("=")
+        sizes[template_id_for(name.strip())] = int(count)
+    return sizes
+
+
+class WarmPool:
+    """
+    Mantiene N VMs paradas y ya clonadas por plantilla. Reclamar una es un
+    DELETE en warm_vms y un INSERT en proxmox_vms dentro de la misma
+    transacción (SELECT ... FOR UPDATE SKIP LOCKED), así que dos peticiones
+    nunca se llevan la misma VM. Un hilo en segundo plano repone el pool.
+
+    Keeps N stopped, already cloned VMs per template. Claiming one is a
+    DELETE from warm_vms plus an INSERT into proxmox_vms in the same
+    transaction (SELECT ... FOR UPDATE SKIP LOCKED), so two requests never
+    get the same VM. A background thread refills the pool.
+    """
+
+    def __init__(self, db_service, proxmox_client, vmid_allocator, scheduler, cluster_state,
+                 sizes=None, refill_interval=60, disksize=40, stale_after=1800):
+        self.db_service = db_service
+        self.proxmox_client = proxmox_client
+        self.vmid_allocator = vmid_allocator
+        self.scheduler = scheduler
+        self.cluster_state = cluster_state
+        self.sizes = dict(sizes or {})
+        self.refill_interval = refill_interval
+        self.disksize = disksize
+        self.stale_after = stale_after
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def claim(self, template_id, userid, vm_name, os, clone_mode=None):
+        if not self.sizes.get(template_id):
+            return None
+        with self.db_service.transaction() as cursor:
+            cursor.execute(
+                """
+                SELECT id, vm_id, node, clone_mode FROM warm_vms
+                WHERE template_id = %s AND status = 'ready'
+                AND (%s IS NULL OR clone_mode = %s)
+                ORDER BY id
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+                """,
+                (template_id, clone_mode, clone_mode)
+            )
+            row = cursor.fetchone()
+            if not row:
+                self._wake.set()
+                return None
+            warm_id, vm_id, node, clone_mode = row
+            cursor.execute("DELETE FROM warm_vms WHERE id = %s", (warm_id,))
+            cursor.execute(queries.INSERT_PROXMOX_VM, (userid, vm_id, vm_name, os, node, clone_mode))
+        self._wake.set()
+        logger.info(f"Claimed warm VM {vm_id} on {node} for template {template_id}")
+        return {"vm_id": vm_id, "node": node, "clone_mode": clone_mode}
+
+    def destroy(self, node, vm_id):
+        api = self.proxmox_client.api
+        try:
+            vm = api.nodes(node).qemu(vm_id)
+            if vm.status.current.get().get("status") == "running":
+                wait_for_task(api, vm.status.stop.post())
+            wait_for_task(api, vm.delete())
+        except Exception as e:
+            logger.error(f"Error destroying VM {vm_id} on {node}: {e}")
+
+    def _fill_one(self, template_id):
+        clone_mode = resolve_clone_mode(template_id)
+        template = self.cluster_state.get(template_id)
+        prefer = {template["node"]} if clone_mode == "linked" and template and template.get("node") else None
+        with self.scheduler.placement(template_id, cores=1, memory=0, disksize=self.disksize, prefer=prefer) as node:
+            vm_id = self.vmid_allocator.allocate()
+            try:
+                warm_id = self.db_service.execute_query(
+                    "INSERT INTO warm_vms (template_id, vm_id, node) VALUES (%s, %s, %s)",
+                    (template_id, vm_id, node)
+                )
+            except mysql.connector.errors.IntegrityError:
+                self.vmid_allocator.discard(vm_id)
+                return False
+            except Exception:
+                self.vmid_allocator.discard(vm_id)
+                raise
+            self.vmid_allocator.confirm(vm_id)
+            try:
+                with node_slot(node):
+                    clone_mode = clone_template(
+                        self.proxmox_client.api, self.cluster_state, template_id, vm_id, node,
+                        f"warm-{template_id}-{vm_id}", clone_mode
+                    )
+            except Exception as e:
+                logger.error(f"Error cloning warm VM {vm_id} from template {template_id}: {e}")
+                self.db_service.execute_query("DELETE FROM warm_vms WHERE id = %s", (warm_id,))
+                self.destroy(node, vm_id)
+                return False
+        self.db_service.execute_query(
+            "UPDATE warm_vms SET status = 'ready', clone_mode = %s WHERE id = %s",
+            (clone_mode, warm_id)
+        )
+        logger.info(f"Warm VM {vm_id} ready on {node} for template {template_id}")
+        return True
+
+    def _reap(self):
+        # Clones que se quedaron a medias (p. ej. el proceso murió durante la clonación)
+        rows = self.db_service.fetch_all(
+            """
+            SELECT id, vm_id, node FROM warm_vms
+            WHERE status = 'cloning' AND created_at < NOW() - INTERVAL %s SECOND
+            """,
+            (int(self.stale_after),)
+        )
+        for warm_id, vm_id, node in rows:
+            self.db_service.execute_query("DELETE FROM warm_vms WHERE id = %s", (warm_id,))
+            self.destroy(node, vm_id)
+
+    def counts(self):
+        if not self.sizes:
+            return {}
+        rows = self.db_service.fetch_all(
+            "SELECT template_id, status, COUNT(*) FROM warm_vms GROUP BY template_id, status"
+        )
+        counts = {template_id: {"target": size, "ready": 0, "cloning": 0} for template_id, size in self.sizes.items()}
+        for template_id, status, count in rows:
+            counts.setdefault(template_id, {"target": 0, "ready": 0, "cloning": 0})[status] = count
+        return counts
+
+    def refill(self):
+        # El lock dura todo el relleno (clones de minutos): no ocupa un hueco del pool
+        connection = self.db_service.dedicated_connection()
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT GET_LOCK(%s, 0)", (REFILL_LOCK,))
+            if not cursor.fetchone()[0]:
+                return
+            try:
+                self._reap()
+                for template_id, counts in self.counts().items():
+                    missing = self.sizes.get(template_id, 0) - counts["ready"] - counts["cloning"]
+                    for _ in range(max(missing, 0)):
+                        if self._stop.is_set() or not self._fill_one(template_id):
+                            break
+            finally:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", (REFILL_LOCK,))
+                cursor.fetchone()
+        finally:
+            cursor.close()
+            connection.close()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                self.refill()
+            except Exception as e:
+                logger.error(f"Error refilling warm pool: {e}")
+            self._wake.wait(self.refill_interval)
+
+    def start(self):
+        if not self.sizes or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="warm-pool", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+
+@lru_cache()
+def get_warm_pool() -> WarmPool:
+    return WarmPool(
+        get_db_service(),
+        get_proxmox_client(),
+        get_vmid_allocator(),
+        get_placement_scheduler(),
+        get_cluster_state(),
+        sizes=parse_pool_sizes(settings.WARM_POOL_SIZES),
+        refill_interval=settings.WARM_POOL_REFILL_INTERVAL,
+        stale_after=settings.PROXMOX_TASK_TIMEOUT * 2
+    )
@@ -0,0 +1,118 @@
+import logging
+import os
+import shutil
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from app.core.config import get_settings
+
+logger = logging.getLogger(__name__)
+settings = get_settings()
+
+
+class ZipExtractionError(RuntimeError):
+    pass
+
+
+class ZipExtractor:
+    """
+    Extrae zips de despliegue: valida rutas y límites (número de ficheros,
+    tamaño total descomprimido y ratio de compresión) en una sola pasada por
+    el índice central, sin descomprimir, y después extrae los miembros en
+    paralelo, cada hilo con su propio handle del zip y buffers grandes. El
+    CRC de cada miembro se comprueba al leerlo, así que no hace falta
+    testzip().
+
+    Extracts deployment zips: validates paths and limits (file count, total
+    uncompressed size and compression ratio) in a single pass over the
+    central directory without decompressing, then extracts members in
+    parallel, each thread with its own zip handle and large buffers. Each
+    member's CRC is checked while it is read, so testzip() is not needed.
+    """
+
+    def __init__(self, max_files=100000, max_total_size=5 * 1024 ** 3, max_ratio=200,
+                 workers=8, buffer_size=1024 * 1024):
+        self.max_files = max_files
+        self.max_total_size = max_total_size
+        self.max_ratio = max_ratio
+        self.workers = workers
+        self.buffer_size = buffer_size
+
+    def plan(self, zf: zipfile.ZipFile, dest_path):
+        """
+        Devuelve (directorios, ficheros) a crear, o lanza ZipExtractionError.
+
+        Returns the (directories, files) to create, or raises ZipExtractionError.
+        """
+        root = os.path.realpath(dest_path)
+        prefix = root + os.sep
+        directories, files = set(), []
+        total_size = 0
+        for info in zf.infolist():
+            target = os.path.normpath(os.path.join(root, info.filename))
+            if target != root and not target.startswith(prefix):
+                raise ZipExtractionError("Zip traversal detected!")
+            if info.is_dir():
+                directories.add(target)
+                continue
+            files.append((info, target))
+            if len(files) > self.max_files:
+                raise ZipExtractionError(f"Zip has more than {self.max_files} files")
+            total_size += info.file_size
+            if total_size > self.max_total_size:
+                raise ZipExtractionError(f"Zip expands to more than {self.max_total_size} bytes")
+            # El ratio sólo se vigila en miembros grandes; los pequeños no pueden ser una bomba
+            if (info.file_size > 1024 * 1024 and info.compress_size
+                    and info.file_size / info.compress_size > self.max_ratio):
+                raise ZipExtractionError(f"Suspicious compression ratio for {info.filename}")
+            directories.add(os.path.dirname(target))
+        return sorted(directories), files
+
+    def validate(self, zip_path, dest_path):
+        with zipfile.ZipFile(zip_path) as zf:
+            self.plan(zf, dest_path)
+
+    def _extract_batch(self, zip_path, batch):
+        written = 0
+        with zipfile.ZipFile(zip_path) as zf:
+            for info, target in batch:
+                with zf.open(info) as src, open(target, "wb", buffering=self.buffer_size) as dst:
+                    shutil.copyfileobj(src, dst, self.buffer_size)
+                    written += dst.tell()
+        return written
+
+    def extract(self, zip_path, dest_path):
+        started = time.perf_counter()
+        with zipfile.ZipFile(zip_path) as zf:
+            directories, files = self.plan(zf, dest_path)
+        for directory in directories:
+            os.makedirs(directory, exist_ok=True)
+        # Reparto de los ficheros más grandes primero, en round-robin
+        files.sort(key=lambda item: item[0].file_size, reverse=True)
+        workers = max(1, min(self.workers, len(files)))
+        batches = [files[i::workers] for i in range(workers)]
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="unzip") as pool:
+            written = sum(pool.map(lambda batch: self._extract_batch(zip_path, batch), batches))
+        elapsed = time.perf_counter() - started
+        stats = {
+            "files": len(files),
+            "bytes": written,
+            "seconds": round(elapsed, 3),
+            "files_per_second": round(len(files) / elapsed, 1) if elapsed else None,
+            "mb_per_second": round(written / 1024 ** 2 / elapsed, 2) if elapsed else None,
+        }
+        logger.info(f"Extracted {zip_path}: {stats}")
+        return stats
+
+
+@lru_cache()
+def get_zip_extractor() -> ZipExtractor:
+    return ZipExtractor(
+        max_files=settings.ZIP_MAX_FILES,
+        max_total_size=settings.ZIP_MAX_TOTAL_SIZE,
+        max_ratio=settings.ZIP_MAX_RATIO,
+        workers=settings.ZIP_EXTRACT_WORKERS,
+        buffer_size=settings.ZIP_WRITE_BUFFER
+    )
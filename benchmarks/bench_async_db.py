@@ -0,0 +1,102 @@
+"""
+Compara la latencia p50/p99 de consultas concurrentes entre el DatabaseService
+bloqueante (llamado desde corutinas, como hacían las rutas) y el
+AsyncDatabaseService.
+
+Compares p50/p99 latency of concurrent queries between the blocking
+DatabaseService (called from coroutines, as the routes used to) and the
+AsyncDatabaseService.
+
+Las peticiones llegan a un ritmo fijo y la latencia se mide desde su
+llegada, así que incluye el tiempo en cola y el bloqueo del event loop;
+además se mide el retraso del propio loop.
+
+Requests arrive at a fixed rate and latency is measured from arrival, so
+it includes queueing and event-loop blocking; the loop lag itself is also
+reported.
+
+Uso / usage (needs the MySQL configured in app/core/config.py):
+    python -m benchmarks.bench_async_db --concurrency 50 --requests 2000 --rate 1000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.services.db_service import get_db_service
+from app.services.async_db_service import get_async_db_service
+
+
+PROBE_INTERVAL = 0.01
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run(label, query_coro, concurrency, total, rate):
+    latencies, lags = [], []
+    semaphore = asyncio.Semaphore(concurrency)
+    finished = asyncio.Event()
+
+    async def probe():
+        # Retraso del event loop: cuánto tarda en despertar un sleep corto
+        while not finished.is_set():
+            expected = time.perf_counter() + PROBE_INTERVAL
+            await asyncio.sleep(PROBE_INTERVAL)
+            lags.append(max(0.0, time.perf_counter() - expected) * 1000)
+
+    async def one(arrival):
+        # El reloj empieza cuando llega la petición, no al conseguir el semáforo
+        async with semaphore:
+            await query_coro()
+        latencies.append((time.perf_counter() - arrival) * 1000)
+
+    prober = asyncio.create_task(probe())
+    started = time.perf_counter()
+    tasks = []
+    for i in range(total):
+        # Llegadas a ritmo fijo: si el loop está bloqueado, la espera cuenta como latencia
+        arrival = started + i / rate
+        delay = arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(one(arrival)))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    finished.set()
+    await prober
+    print(
+        f"{label:>6}: {total / elapsed:8.1f} req/s  "
+        f"p50={statistics.median(latencies):7.2f} ms  "
+        f"p99={percentile(latencies, 99):7.2f} ms  "
+        f"loop lag p99={percentile(lags or [0.0], 99):7.2f} ms max={max(lags or [0.0]):7.2f} ms"
+    )
+
+
+async def main(args):
+    query = "SELECT SLEEP(%s)"
+    params = (args.query_ms / 1000,)
+    sync_db = get_db_service()
+    async_db = get_async_db_service()
+
+    async def sync_query():
+        sync_db.fetch_one(query, params)
+
+    async def async_query():
+        await async_db.fetch_one(query, params)
+
+    await run("sync", sync_query, args.concurrency, args.requests, args.rate)
+    await run("async", async_query, args.concurrency, args.requests, args.rate)
+    await async_db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--query-ms", type=float, default=5.0)
+    parser.add_argument("--rate", type=float, default=1000.0, help="request arrivals per second")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,60 @@
+"""
+Compara clones completos y linked clones de una plantilla: tiempo hasta que
+termina la tarea de clonación y espacio ocupado en el storage por cada VM.
+Las VMs creadas se borran al final de cada medición.
+
+Compares full and linked clones of a template: time until the clone task
+finishes and storage space used by each VM. The VMs it creates are deleted
+after every measurement.
+
+Uso / usage (needs the Proxmox configured in app/core/config.py):
+    python -m benchmarks.bench_clone_modes --template 105 --runs 3
+"""
+import argparse
+import statistics
+import time
+
+from app.core.config import get_settings
+from app.services.proxmox_client import get_proxmox_client
+from app.services.proxmox_cluster import get_cluster_state
+from app.services.proxmox_clone import clone_template
+from app.services.proxmox_tasks import wait_for_task
+
+settings = get_settings()
+
+
+def storage_used(api, node, storage):
+    return api.nodes(node).storage(storage).status.get()["used"]
+
+
+def measure(api, cluster_state, template_id, node, storage, mode, runs):
+    seconds, used = [], []
+    for run in range(runs):
+        vm_id = int(api.cluster.nextid.get())
+        before = storage_used(api, node, storage)
+        started = time.perf_counter()
+        actual = clone_template(api, cluster_state, template_id, vm_id, node, f"bench-{mode}-{run}", mode, storage)
+        seconds.append(time.perf_counter() - started)
+        used.append((storage_used(api, node, storage) - before) / 1024 ** 2)
+        wait_for_task(api, api.nodes(node).qemu(vm_id).delete())
+        if actual != mode:
+            print(f"{mode:>6}: fell back to a {actual} clone")
+    print(f"{mode:>6}: mean={statistics.mean(seconds):7.1f} s  median={statistics.median(seconds):7.1f} s"
+          f"  disk={statistics.mean(used):9.1f} MiB/VM")
+    return statistics.mean(seconds)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--template", type=int, default=105)
+    parser.add_argument("--storage", default=settings.PROXMOX_VM_STORAGE)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    api = get_proxmox_client().api
+    cluster_state = get_cluster_state()
+    cluster_state.refresh()
+    template = cluster_state.get(args.template)
+    node = template["node"] if template else settings.PROXMOX_DEFAULT_NODE
+    full = measure(api, cluster_state, args.template, node, args.storage, "full", args.runs)
+    linked = measure(api, cluster_state, args.template, node, args.storage, "linked", args.runs)
+    print(f"saved per VM: {full - linked:.1f} s")
@@ -0,0 +1,42 @@
+"""
+Compara el coste por servicio de inicializar filebrowser.db con los dos
+contenedores `docker run --rm` (comportamiento anterior) frente a copiar y
+parchear la base de datos golden.
+
+Compares the per-service cost of initialising filebrowser.db with the two
+`docker run --rm` containers (previous behaviour) against copying and
+patching the golden database.
+
+Uso / usage (needs a local Docker daemon):
+    python -m benchmarks.bench_filebrowser_init --runs 5
+"""
+import argparse
+import pathlib
+import statistics
+import tempfile
+import time
+
+from app.services.filebrowser_seed import FilebrowserSeeder, init_filebrowser_db
+
+
+def measure(label, init, runs):
+    samples = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as tmp:
+            started = time.perf_counter()
+            init(pathlib.Path(tmp))
+            samples.append((time.perf_counter() - started) * 1000)
+    print(f"{label:>10}: mean={statistics.mean(samples):9.1f} ms  median={statistics.median(samples):9.1f} ms")
+    return statistics.mean(samples)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as cache_dir:
+        seeder = FilebrowserSeeder(cache_dir)
+        seeder.golden()  # la golden se genera una sola vez por host
+        containers = measure("containers", lambda path: init_filebrowser_db(path, "admin123456789"), args.runs)
+        golden = measure("golden", lambda path: seeder.seed(path, "admin123456789"), args.runs)
+    print(f"saved per create: {containers - golden:.1f} ms")
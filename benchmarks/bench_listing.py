@@ -0,0 +1,115 @@
+"""
+Mide los listados paginados de GET /services y GET /vms sobre tablas con un
+millón de filas: página por clave (WHERE id > cursor) frente a OFFSET a
+distintas profundidades, y las consultas con filtros. Usa una base de datos
+aparte que crea y rellena si está vacía.
+
+Times the paginated GET /services and GET /vms listings over tables with a
+million rows: keyset pages (WHERE id > cursor) against OFFSET at several
+depths, plus the filtered queries. It uses a separate database, created and
+seeded if empty.
+
+Uso / usage (needs the MySQL configured in app/core/config.py):
+    python -m benchmarks.bench_listing --rows 1000000 --runs 20
+"""
+import argparse
+import random
+import statistics
+import time
+
+import mysql.connector
+
+from app.core.config import get_settings
+from app.models import Sistema
+from app.services import queries
+from app.services.db_service import DatabaseService
+
+settings = get_settings()
+
+SERVICE_STATUSES = ("enabled", "disabled", "active", "stopped", "deleted")
+OSES = tuple(os.value for os in Sistema)
+
+
+def create_database(name):
+    connection = mysql.connector.connect(
+        host=settings.DB_HOST, user=settings.DB_USER, password=settings.DB_PASSWORD
+    )
+    cursor = connection.cursor()
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{name}`")
+    cursor.close()
+    connection.close()
+
+
+def seed(db, rows, users, batch):
+    if db.fetch_one("SELECT COUNT(*) FROM docker_services")[0] >= rows:
+        return
+    webtypes = [row[0] for row in db.fetch_all("SELECT id FROM webtypes")]
+    started = time.perf_counter()
+    for start in range(0, rows, batch):
+        ids = range(start, min(start + batch, rows))
+        db.execute_many(
+            "INSERT INTO docker_services (userid, webname, webtype_id, status) VALUES (%s, %s, %s, %s)",
+            [(i % users, f"web{i}", random.choice(webtypes), random.choice(SERVICE_STATUSES)) for i in ids]
+        )
+        db.execute_many(
+            "INSERT INTO proxmox_vms (userid, vm_id, vm_name, os, status, node) VALUES (%s, %s, %s, %s, %s, %s)",
+            [(i % users, 100000 + i, f"vm{i}", random.choice(OSES), random.choice(("enabled", "disabled")), "node1")
+             for i in ids]
+        )
+    print(f"seeded {rows} rows per table in {time.perf_counter() - started:.1f} s")
+
+
+def timed(db, query, params, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        db.fetch_all(query, params)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def cursor_at(db, table, position):
+    row = db.fetch_one(f"SELECT id FROM {table} ORDER BY id LIMIT 1 OFFSET %s", (position,))
+    return row[0] if row else 0
+
+
+def compare_depths(db, table, page_query, limit, rows, runs):
+    for position in (0, rows // 10, rows // 2, rows - limit):
+        after = cursor_at(db, table, position)
+        keyset_query, keyset_params = page_query(after, limit)
+        # Misma consulta con OFFSET en lugar del cursor / same query with OFFSET instead of the cursor
+        offset_query, offset_params = page_query(0, limit)
+        offset_query = offset_query.replace("LIMIT %s", "LIMIT %s OFFSET %s")
+        keyset = timed(db, keyset_query, keyset_params, runs)
+        offset = timed(db, offset_query, (*offset_params, position), runs)
+        print(f"{table:>16} @ {position:>8}: keyset={keyset:8.2f} ms  offset={offset:8.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--database", default="cloudfaster_bench")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--batch", type=int, default=10_000)
+    parser.add_argument("--limit", type=int, default=settings.LIST_PAGE_SIZE)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    create_database(args.database)
+    db = DatabaseService(settings.DB_HOST, settings.DB_USER, settings.DB_PASSWORD, args.database)
+    db.create_tables_if_not_exists()
+    seed(db, args.rows, args.users, args.batch)
+
+    compare_depths(db, "docker_services", queries.services_page_query, args.limit, args.rows, args.runs)
+    compare_depths(db, "proxmox_vms", queries.vms_page_query, args.limit, args.rows, args.runs)
+
+    middle = cursor_at(db, "docker_services", args.rows // 2)
+    for label, (query, params) in (
+        ("services status", queries.services_page_query(middle, args.limit, status="active")),
+        ("services webtype", queries.services_page_query(middle, args.limit, webtype="PHP")),
+        ("services userid", queries.services_page_query(0, args.limit, userid=args.users // 2)),
+        ("vms status", queries.vms_page_query(middle, args.limit, status="disabled")),
+        ("vms os", queries.vms_page_query(middle, args.limit, os=Sistema.UBUNTU24_SERVER.value)),
+        ("vms userid", queries.vms_page_query(0, args.limit, userid=args.users // 2)),
+    ):
+        print(f"{label:>16}: {timed(db, query, params, args.runs):8.2f} ms")
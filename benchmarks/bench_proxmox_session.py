@@ -0,0 +1,55 @@
+"""
+Mide la latencia por llamada a Proxmox creando un ProxmoxAPI nuevo en cada
+petición (comportamiento anterior) frente al cliente compartido.
+
+Measures per-call Proxmox latency when building a fresh ProxmoxAPI for every
+request (previous behaviour) versus the shared client.
+
+Uso / usage (needs the Proxmox configured in app/core/config.py):
+    python -m benchmarks.bench_proxmox_session --calls 50
+"""
+import argparse
+import statistics
+import time
+
+from proxmoxer import ProxmoxAPI
+
+from app.core.config import get_settings
+from app.services.proxmox_client import get_proxmox_client
+
+settings = get_settings()
+
+
+def fresh_call():
+    api = ProxmoxAPI(
+        host=settings.PROXMOX_HOST,
+        user=settings.PROXMOX_USER,
+        password=settings.PROXMOX_PASSWORD,
+        verify_ssl=settings.PROXMOX_VERIFY_SSL,
+        timeout=settings.PROXMOX_TIMEOUT
+    )
+    api.version.get()
+
+
+def shared_call():
+    get_proxmox_client().api.version.get()
+
+
+def measure(label, call, calls):
+    samples = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - started) * 1000)
+    print(f"{label:>7}: mean={statistics.mean(samples):7.1f} ms  median={statistics.median(samples):7.1f} ms")
+    return statistics.mean(samples)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=50)
+    args = parser.parse_args()
+    shared_call()  # login + TLS handshake fuera de la medición
+    fresh = measure("fresh", fresh_call, args.calls)
+    shared = measure("shared", shared_call, args.calls)
+    print(f"saved per call: {fresh - shared:.1f} ms")